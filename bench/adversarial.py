@@ -0,0 +1,74 @@
+#!/usr/bin/env python
+
+"""
+Time budget checks for pages built to make the conversion slow.
+
+Each case is a page of unclosed or badly nested <html>, <nowiki>, <pre>,
+<code> and HTML tags, or lines the list fix has to look at, about a
+megabyte long. Before the block and tag passes used scanners, pages like
+these took minutes or hours to convert; now each has to convert within its
+time budget. Exits with status 1 if any case goes over. Run it after a
+change to the patterns or scanners.
+"""
+
+import argparse
+import pathlib
+import sys
+import time
+
+REPO = pathlib.Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(REPO))
+from usemod_to_markdown import Converter
+
+CONFIG = {'RawHtml': 1, 'HtmlTags': 1, 'HtmlLinks': 1}
+
+def repeat_to(piece, size, tail=''):
+    return piece * (size // len(piece)) + tail
+
+# Page texts by case name, for a page of about `size` characters. Most end
+# with a closing tag of another kind, so that the passes' triggers don't
+# skip them.
+def adversarial_pages(size):
+    return {
+        'html-unclosed': repeat_to('<html>', size),
+        'html-closed-late': repeat_to('<html>x ', size, '</html>'),
+        'nowiki-unclosed': repeat_to('<nowiki>', size),
+        'pre-unclosed': repeat_to('<pre>', size, '</code>'),
+        'code-unclosed-pre-closed': repeat_to('<code><pre>x</pre>', size),
+        'pairs-unclosed': repeat_to('<b>', size, '</i>'),
+        'pairs-attributes': repeat_to('<b x>', size, '</i>'),
+        'pairs-attribute-gts': '<b x' + repeat_to('>', size, '</i>'),
+        'pairs-close-next-line': repeat_to('<b x>', size, '\n</b>'),
+        'pairs-mixed-case': repeat_to('<B x><strong y>', size, '</Strong >'),
+        'singles-no-gt': repeat_to('<br x ', size, '</b>'),
+        'html-link-unclosed': repeat_to('<A href="x">', size, '</b>'),
+        'html-link-no-gt': repeat_to('<A href="x" ', size, '</A>'),
+        'list-start-long-lines': repeat_to(repeat_to('a b ', 20000) + '\n', size, '\n* item'),
+        'mixed': repeat_to('<b x> <i y> <pre> <html> <nowiki> <code> <A b> <br z ', size, '</i>\n*'),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that adversarial pages convert within a time budget.')
+    parser.add_argument('--size', type=int, default=1000000, help='Page size in characters.')
+    parser.add_argument('--budget', type=float, default=5.0, help='Seconds allowed per page.')
+    parser.add_argument('cases', nargs='*', help='Cases to run (default: all).')
+    args = parser.parse_args()
+
+    converter = Converter(config=CONFIG, intermap={})
+    pages = adversarial_pages(args.size)
+    over = []
+    for name in args.cases or pages:
+        text = pages[name]
+        start = time.perf_counter()
+        converter.convert_text(text, 'AdversarialPage')
+        seconds = time.perf_counter() - start
+        status = 'ok' if seconds <= args.budget else 'OVER BUDGET'
+        print(f'{name:26} {len(text):9} chars {seconds:7.2f}s  {status}')
+        if seconds > args.budget:
+            over.append(name)
+    if over:
+        print(f'{len(over)} of {len(args.cases or pages)} cases over the {args.budget}s budget: {", ".join(over)}')
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+
+"""
+Throughput benchmarks for usemod-to-markdown.py.
+
+Each scenario generates a synthetic wiki with fakewiki.py and measures:
+
+* a whole conversion run of the script, reported as pages/sec and MB/sec of
+  page source;
+* Converter.convert_text on every page text, reported as mean, median and
+  95th percentile time per page.
+
+Scenarios vary page size, link density and the mix of lists, tables and
+headings. Compare runs before and after a change to see whether it made the
+converter faster or slower.
+"""
+
+import argparse
+import json
+import pathlib
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import fakewiki
+
+REPO = pathlib.Path(__file__).resolve().parent.parent
+SCRIPT = REPO / 'usemod-to-markdown.py'
+
+sys.path.insert(0, str(REPO))
+import usemod_to_markdown
+
+# Each scenario overrides some of the fakewiki defaults.
+SCENARIOS = {
+    'default': {},
+    'small-pages': {'page_size': 500},
+    'large-pages': {'page_size': 20000, 'pages': 30},
+    'link-sparse': {'link_density': 0.01},
+    'link-dense': {'link_density': 0.3},
+    'list-heavy': {'list_mix': 0.6, 'table_mix': 0.0, 'heading_mix': 0.05},
+    'table-heavy': {'table_mix': 0.6, 'list_mix': 0.0, 'heading_mix': 0.05},
+    'heading-heavy': {'heading_mix': 0.5, 'list_mix': 0.05, 'table_mix': 0.0},
+    'big-intermap': {'intermap_size': 500},
+}
+
+
+def page_files(data_dir):
+    return sorted(p for p in (data_dir / 'page').rglob('*') if p.is_file())
+
+
+def bench_whole_run(data_dir, output_dir, jobs, repeat):
+    # Runs the script the way users do, so startup and file output count.
+    command = [sys.executable, str(SCRIPT), str(data_dir), str(output_dir),
+               '--silent', '--overwrite', '--jobs', str(jobs)]
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def bench_pages(data_dir, repeat):
+    # Times convert_text alone on each page, keeping the best of `repeat`
+    # runs per page. Warnings are kept in the converter's page logs.
+    converter = usemod_to_markdown.Converter(
+        config=usemod_to_markdown.read_config(data_dir / 'config'),
+        intermap=usemod_to_markdown.read_intermap(data_dir),
+        supress_msgs=True)
+    times = []
+    for page_file in page_files(data_dir):
+        record = usemod_to_markdown.read_page_file(page_file)
+        parent_id = None if page_file.parent.parent.name == 'page' else page_file.parent.name
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            converter.convert_text(record.text, page_file.stem, parent_id)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        times.append(best)
+    return times
+
+
+def run_scenario(name, knobs, args):
+    with tempfile.TemporaryDirectory(prefix='usemod-bench-') as temp:
+        data_dir = pathlib.Path(temp) / 'wiki'
+        output_dir = pathlib.Path(temp) / 'out'
+        fakewiki.generate_wiki(data_dir, **knobs)
+        files = page_files(data_dir)
+        source_bytes = sum(p.stat().st_size for p in files)
+
+        run_time = bench_whole_run(data_dir, output_dir, args.jobs, args.repeat)
+        page_times = sorted(bench_pages(data_dir, args.repeat))
+
+    return {
+        'scenario': name,
+        'knobs': knobs,
+        'pages': len(files),
+        'source_mb': source_bytes / 1e6,
+        'run_seconds': run_time,
+        'pages_per_sec': len(files) / run_time,
+        'mb_per_sec': source_bytes / 1e6 / run_time,
+        'page_ms_mean': statistics.mean(page_times) * 1000,
+        'page_ms_median': statistics.median(page_times) * 1000,
+        'page_ms_p95': page_times[int(len(page_times) * 0.95)] * 1000,
+    }
+
+
+def print_results(results):
+    print(f'{"scenario":<14} {"pages":>6} {"MB":>6} {"pages/s":>8} {"MB/s":>6} '
+          f'{"mean ms":>8} {"median":>8} {"p95":>8}')
+    for r in results:
+        print(f'{r["scenario"]:<14} {r["pages"]:>6} {r["source_mb"]:>6.2f} {r["pages_per_sec"]:>8.1f} '
+              f'{r["mb_per_sec"]:>6.2f} {r["page_ms_mean"]:>8.2f} {r["page_ms_median"]:>8.2f} '
+              f'{r["page_ms_p95"]:>8.2f}')
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark usemod-to-markdown.py on synthetic wikis.')
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help=f'Scenarios to run (default: all). One of: {", ".join(SCENARIOS)}.')
+    parser.add_argument('--pages', type=int, help='Override the number of pages in every scenario.')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for the generated wikis.')
+    parser.add_argument('--jobs', type=int, default=1, help='Passed to the script for whole-run timing.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement; the best is kept.')
+    parser.add_argument('--json', type=pathlib.Path, help='Also write the results to this JSON file.')
+    args = parser.parse_args()
+    unknown = [name for name in args.scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f'unknown scenario: {", ".join(unknown)}')
+
+    results = []
+    for name in args.scenarios or SCENARIOS:
+        knobs = dict(fakewiki.DEFAULTS, seed=args.seed)
+        knobs.update(SCENARIOS[name])
+        if args.pages is not None:
+            knobs['pages'] = args.pages
+        results.append(run_scenario(name, knobs, args))
+        print(f'{name}: done', file=sys.stderr)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, 'w') as fh:
+            json.dump(results, fh, indent=2)
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+"""
+Generates a synthetic UseMod wiki data directory for benchmarking.
+
+The result has the layout the converter expects: page/<letter>/ holding
+FS1/FS2/FS3-encoded page files, subpage directories, an intermap file and a
+config file. With --revisions, keep/ holds older revisions of the pages. Content is random, but drawn from the markup UseMod wikis
+actually use, so it exercises every transformation pass. Generation is
+deterministic for a given seed.
+"""
+
+import argparse
+import pathlib
+import random
+
+FS = "\xb3"
+FS1 = FS + "1"
+FS2 = FS + "2"
+FS3 = FS + "3"
+
+WORDS = '''
+    the of and to in is was for on that with as by at from this be are or it
+    an not have which has but were been their more one all can its also other
+    wiki page project meeting schedule notes draft review budget design team
+    release version server client network storage report archive summary
+    '''.split()
+
+INTERMAP_SITES = ['UseMod', 'Wikipedia', 'Google', 'Meatball', 'CPAN', 'Dict',
+                  'IMDB', 'JargonFile', 'MathWorld', 'PythonInfo', 'RFC',
+                  'WikiWiki', 'Acronym', 'Foldoc', 'Freshmeat', 'SourceForge']
+
+URL_HOSTS = ['example.com', 'www.example.org', 'ftp.example.net', 'docs.python.org']
+
+
+def make_page_names(rng, count):
+    # CamelCase names that satisfy UseMod's LinkPattern, with a few free-link
+    # style names containing underscores.
+    names = set()
+    while len(names) < count:
+        parts = [rng.choice(WORDS).capitalize() for _ in range(rng.randint(2, 3))]
+        if rng.random() < 0.3:
+            name = '_'.join(parts)
+        else:
+            name = ''.join(parts)
+            if not any(c.islower() for c in name[1:]) or name[1:].islower():
+                continue
+        names.add(name)
+    return sorted(names)
+
+
+class TextGenerator:
+
+    def __init__(self, rng, page_names, sites, link_density, list_mix, table_mix, heading_mix):
+        self.rng = rng
+        self.page_names = page_names
+        self.sites = sites
+        self.link_density = link_density
+        self.list_mix = list_mix
+        self.table_mix = table_mix
+        self.heading_mix = heading_mix
+
+    def word(self):
+        return self.rng.choice(WORDS)
+
+    def link(self):
+        rng = self.rng
+        page = rng.choice(self.page_names)
+        title = page.replace('_', ' ')
+        kind = rng.randrange(14)
+        if kind == 0:
+            return f'[[{title}]]'
+        if kind == 1:
+            return f'[[{title}|{self.word()} {self.word()}]]'
+        if kind == 2:
+            return f'[[/{self.word().capitalize()}]]'
+        if kind == 3:
+            return '_'.join(p for p in title.split()) if '_' not in page else page.replace('_', '')
+        if kind == 4:
+            return f'{page.replace("_", "")}#{self.word()}'
+        if kind == 5:
+            return f'http://{rng.choice(URL_HOSTS)}/{self.word()}/{rng.randint(1, 999)}.html'
+        if kind == 6:
+            return f'[https://{rng.choice(URL_HOSTS)}/{self.word()} {self.word()} {self.word()}]'
+        if kind == 7:
+            return f'[ftp://{rng.choice(URL_HOSTS)}/pub/{self.word()}]'
+        if kind == 8:
+            return f'{rng.choice(self.sites)}:{self.word().capitalize()}{self.word().capitalize()}'
+        if kind == 9:
+            return f'[{rng.choice(self.sites)}:{self.word()}&{self.word()} {self.word()}]'
+        if kind == 10:
+            return f'[{rng.choice(self.sites)}:{self.word()}]'
+        if kind == 11:
+            return f'Unknown{self.word().capitalize()}:{self.word()}'
+        if kind == 12:
+            return f'mailto:{self.word()}@{rng.choice(URL_HOSTS)}'
+        return f'[[{title.lower()}]]'
+
+    def inline(self, n_words):
+        rng = self.rng
+        out = []
+        for _ in range(n_words):
+            r = rng.random()
+            if r < self.link_density:
+                out.append(self.link())
+            elif r < self.link_density + 0.03:
+                out.append(f"''{self.word()} {self.word()}''")
+            elif r < self.link_density + 0.05:
+                out.append(f"'''{self.word()}'''")
+            elif r < self.link_density + 0.055:
+                out.append(f"'''''{self.word()}'''''")
+            elif r < self.link_density + 0.06:
+                out.append(f'<b>{self.word()}</b>')
+            elif r < self.link_density + 0.065:
+                out.append(f'<nowiki>{self.word()} [[{self.word()}]] </nowiki>')
+            elif r < self.link_density + 0.07:
+                out.append(rng.choice(['&amp;', '&', '<', '>', '&copy;', '<br>', 'a < b', '"quoted"']))
+            else:
+                out.append(self.word())
+        text = ' '.join(out)
+        return text[0].upper() + text[1:] + '.'
+
+    def block(self):
+        rng = self.rng
+        r = rng.random()
+        if r < self.heading_mix:
+            depth = rng.randint(1, 4)
+            number = '# ' if rng.random() < 0.3 else ''
+            tail = rng.choice(['', '', ' trailing text'])
+            return [f'{"=" * depth} {number}{self.word().capitalize()} {self.word()} {"=" * depth}{tail}']
+        r -= self.heading_mix
+        if r < self.list_mix:
+            marker = rng.choice('*#')
+            lines = []
+            for _ in range(rng.randint(2, 6)):
+                depth = rng.choice([1, 1, 1, 2, 2, 3])
+                space = rng.choice(['', ' '])
+                lines.append(f'{marker * depth}{space}{self.inline(rng.randint(3, 10))}')
+            if rng.random() < 0.3:
+                lines.append('')
+                lines.append(f'{marker} {self.inline(4)}')
+            return lines
+        r -= self.list_mix
+        if r < self.table_mix:
+            cols = rng.randint(2, 5)
+            lines = []
+            if rng.random() < 0.5:
+                lines.append('||' + '||'.join(f"'''{self.word()}'''" for _ in range(cols)) + '||')
+            for _ in range(rng.randint(1, 5)):
+                lines.append('||' + '||'.join(self.inline(rng.randint(1, 3))[:-1] for _ in range(cols)) + '||')
+            return lines
+        r -= self.table_mix
+        kind = rng.randrange(12)
+        if kind == 0:
+            return [' ' + self.inline(6) for _ in range(rng.randint(1, 4))]
+        if kind == 1:
+            return [':' * rng.randint(1, 3) + self.inline(8)]
+        if kind == 2:
+            return [rng.choice(['----', '-----', 'text ---- more'])]
+        if kind == 3:
+            return ['<pre>', *(self.inline(5) for _ in range(3)), '</pre>']
+        if kind == 4:
+            return [f'<code>{self.inline(4)}</code>']
+        if kind == 5:
+            return ['<html><span class="x">raw & unquoted</span></html>']
+        if kind == 6:
+            return ['<toc>']
+        return [self.inline(rng.randint(10, 60))]
+
+    def page(self, size):
+        lines = []
+        length = 0
+        while length < size:
+            block = self.block()
+            lines.extend(block)
+            lines.append('')
+            length += sum(len(x) + 1 for x in block)
+        return '\n'.join(lines)
+
+
+AUTHORS = ['WikiUser', 'JaneDoe', 'JohnSmith', 'ExampleEditor', '']
+
+SUMMARIES = ['', '', 'typo', 'Added notes from the meeting', 'cleanup', 'Reverted spam',
+             'more links', 'Moved the schedule to its own page']
+
+
+def encode_section(text, ts, revision=1, author='WikiUser', summary=''):
+    # A text_default section, as in page files and keep files. Edits
+    # without a user name only have the IP address and host.
+    data = FS3.join(['text', text, 'minor', '0', 'newauthor', '1', 'summary', summary])
+    return FS2.join(['name', 'text_default', 'version', '1', 'revision', str(revision),
+                     'tscreate', str(ts), 'ts', str(ts), 'ip', '127.0.0.1',
+                     'host', 'localhost', 'id', '', 'username', author, 'data', data])
+
+
+def encode_page(text, ts, revision=1, author='WikiUser', summary=''):
+    section = encode_section(text, ts, revision, author, summary)
+    return FS1.join(['version', '3', 'revision', str(revision), 'cache_oldmajor', '',
+                     'cache_oldauthor', '', 'cache_diff_default_major', '',
+                     'cache_diff_default_minor', '', 'ts_create', str(ts), 'ts', str(ts),
+                     'text_default', section])
+
+
+def encode_keep_file(revisions):
+    # revisions are (text, ts, revision, author, summary), oldest first.
+    return ''.join(FS1 + encode_section(*revision) for revision in revisions)
+
+
+def older_revisions(rng, text, ts, count):
+    # Made-up earlier versions of a page: each one has a few of the next
+    # one's lines missing, and is from up to a week earlier. Returns
+    # (text, ts, revision, author, summary) for each, oldest first, and
+    # the current revision's number.
+    revisions = []
+    for _ in range(count):
+        lines = text.split('\n')
+        for _ in range(rng.randint(1, 3)):
+            if len(lines) > 1:
+                del lines[rng.randrange(len(lines))]
+        text = '\n'.join(lines)
+        ts -= rng.randint(60, 7 * 86400)
+        revisions.append([text, ts, 0, rng.choice(AUTHORS), rng.choice(SUMMARIES)])
+    revisions.reverse()
+    for n, revision in enumerate(revisions, 1):
+        revision[2] = n
+    return [tuple(revision) for revision in revisions], count + 1
+
+
+def letter_for(page_name):
+    c = page_name[0].upper()
+    return c if c.isalpha() else 'other'
+
+
+def make_intermap_sites(rng, count):
+    # The well-known sites first, then made-up ones, since real intermaps
+    # often have hundreds of entries.
+    sites = INTERMAP_SITES[:count]
+    while len(sites) < count:
+        site = rng.choice(WORDS).capitalize() + rng.choice(WORDS).capitalize() + str(len(sites))
+        sites.append(site)
+    return sites
+
+
+# Knobs accepted by generate_wiki, with their defaults. Mixes are the
+# fraction of blocks that are headings, lists or tables; everything else is
+# paragraphs and the rarer constructs. Link density is the fraction of words
+# that are links. Revisions is the mean number of older revisions kept per
+# page.
+DEFAULTS = {
+    'pages': 100,
+    'page_size': 3000,
+    'link_density': 0.06,
+    'list_mix': 0.15,
+    'table_mix': 0.05,
+    'heading_mix': 0.1,
+    'subpage_ratio': 0.2,
+    'intermap_size': 16,
+    'revisions': 0,
+    'seed': 0,
+}
+
+def generate_wiki(root, pages=100, page_size=3000, link_density=0.06, list_mix=0.15,
+                  table_mix=0.05, heading_mix=0.1, subpage_ratio=0.2, intermap_size=16, revisions=0,
+                  seed=0):
+    rng = random.Random(seed)
+    # Kept revisions come from their own generator, so that the pages are
+    # the same with or without them.
+    keep_rng = random.Random(f'{seed}-keep')
+    root = pathlib.Path(root)
+    names = make_page_names(rng, pages)
+    sites = make_intermap_sites(rng, intermap_size)
+    gen = TextGenerator(rng, names, sites, link_density, list_mix, table_mix, heading_mix)
+
+    (root / 'page').mkdir(parents=True, exist_ok=True)
+    with open(root / 'intermap', 'w') as fh:
+        for site in sites:
+            fh.write(f'{site} http://{site.lower()}.example.com/wiki?\n')
+    with open(root / 'config', 'w') as fh:
+        fh.write('$UseSubpage = 1;\n$FreeLinks = 1;\n$WikiLinks = 1;\n$BracketText = 1;\n'
+                 '$RawHtml = 1;\n$HtmlTags = 1;\n$UseHeadings = 1;\n')
+
+    def write_page(relative_path, text, ts):
+        revision = 1
+        if revisions:
+            kept, revision = older_revisions(keep_rng, text, ts, keep_rng.randint(0, 2 * revisions))
+            if kept:
+                keep_file = root / 'keep' / f'{relative_path}.kp'
+                keep_file.parent.mkdir(parents=True, exist_ok=True)
+                keep_file.write_bytes(encode_keep_file(kept).encode('cp1252'))
+        page_file = root / 'page' / f'{relative_path}.db'
+        page_file.write_bytes(encode_page(text, ts, revision).encode('cp1252'))
+
+    ts = 1000000000
+    for i, name in enumerate(names):
+        letter = letter_for(name)
+        (root / 'page' / letter).mkdir(exist_ok=True)
+        size = max(50, int(rng.gauss(page_size, page_size / 3)))
+        ts += rng.randint(60, 86400)
+        write_page(f'{letter}/{name}', gen.page(size), ts)
+        if rng.random() < subpage_ratio:
+            (root / 'page' / letter / name).mkdir(exist_ok=True)
+            for _ in range(rng.randint(1, 3)):
+                sub = gen.word().capitalize() + gen.word().capitalize()
+                ts += rng.randint(60, 86400)
+                write_page(f'{letter}/{name}/{sub}', gen.page(size // 2), ts)
+    return root
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a synthetic UseMod data directory.')
+    parser.add_argument('output_dir', type=pathlib.Path, help='Directory to create the wiki in.')
+    parser.add_argument('--pages', type=int, default=DEFAULTS['pages'], help='Number of top-level pages.')
+    parser.add_argument('--page-size', type=int, default=DEFAULTS['page_size'], help='Mean page size in characters.')
+    parser.add_argument('--link-density', type=float, default=DEFAULTS['link_density'], help='Fraction of words that are links.')
+    parser.add_argument('--list-mix', type=float, default=DEFAULTS['list_mix'], help='Fraction of blocks that are lists.')
+    parser.add_argument('--table-mix', type=float, default=DEFAULTS['table_mix'], help='Fraction of blocks that are tables.')
+    parser.add_argument('--heading-mix', type=float, default=DEFAULTS['heading_mix'], help='Fraction of blocks that are headings.')
+    parser.add_argument('--subpage-ratio', type=float, default=DEFAULTS['subpage_ratio'], help='Fraction of pages that have subpages.')
+    parser.add_argument('--intermap-size', type=int, default=DEFAULTS['intermap_size'], help='Number of intermap entries.')
+    parser.add_argument('--revisions', type=int, default=DEFAULTS['revisions'], help='Mean number of older revisions kept per page.')
+    parser.add_argument('--seed', type=int, default=DEFAULTS['seed'], help='Random seed.')
+    args = parser.parse_args()
+    knobs = {name: getattr(args, name) for name in DEFAULTS}
+    generate_wiki(args.output_dir, **knobs)
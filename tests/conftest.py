@@ -0,0 +1,30 @@
+import pathlib
+import sys
+
+import pytest
+
+from usemod_to_markdown import cli
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / 'bench'))
+import fakewiki
+
+@pytest.fixture
+def make_wiki(tmp_path):
+    # Generates a small synthetic wiki under tmp_path; keyword arguments go
+    # to fakewiki.generate_wiki.
+    def make(name='wiki', **knobs):
+        return fakewiki.generate_wiki(tmp_path / name, **{'pages': 12, 'page_size': 800, **knobs})
+    return make
+
+@pytest.fixture
+def run_cli(monkeypatch):
+    # Runs the command line with the given arguments.
+    def run(*args):
+        monkeypatch.setattr(sys, 'argv', ['usemod-to-markdown', *map(str, args)])
+        cli.main()
+    return run
+
+def read_tree(path):
+    # {relative path: bytes} for every file under path.
+    path = pathlib.Path(path)
+    return {file.relative_to(path).as_posix(): file.read_bytes() for file in sorted(path.rglob('*')) if file.is_file()}
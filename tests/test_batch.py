@@ -0,0 +1,24 @@
+import json
+
+import pytest
+
+from conftest import read_tree
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_wikis_convert_into_separate_outputs(make_wiki, run_cli, capsys, tmp_path, jobs):
+    alpha = make_wiki('alpha', seed=1)
+    beta = make_wiki('beta', seed=2, pages=8)
+    manifest = tmp_path / 'wikis.json'
+    manifest.write_text(json.dumps([
+        {'input': 'alpha', 'output': 'site/alpha', 'page_link_prefix': '/alpha/'},
+        {'name': 'second', 'input': 'beta', 'output': 'site/beta', 'warn_broken_links': True},
+    ]))
+    run_cli(manifest, '--batch', '--jobs', jobs)
+    out = capsys.readouterr().out
+    assert out.count('alpha: ') == 1 and out.count('second: ') == 1
+    # Each output is what converting its wiki alone gives.
+    run_cli(alpha, tmp_path / 'alpha_alone', '--page-link-prefix', '/alpha/')
+    run_cli(beta, tmp_path / 'beta_alone', '--warn-broken-links')
+    assert read_tree(tmp_path / 'site' / 'alpha') == read_tree(tmp_path / 'alpha_alone')
+    assert read_tree(tmp_path / 'site' / 'beta') == read_tree(tmp_path / 'beta_alone')
+    assert read_tree(tmp_path / 'site' / 'alpha') != read_tree(tmp_path / 'site' / 'beta')
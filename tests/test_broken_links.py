@@ -0,0 +1,61 @@
+import json
+
+import pytest
+
+import fakewiki
+
+PAGES = {
+    'A/Alpha': 'See [[Beta]], [[Missing Page]] and MissingName.',
+    'B/Beta': 'Back to [[Alpha]], [[Missing Page|missing]] and [[Gone]].',
+    'B/Beta/Child': 'Up to [[Beta]] and [[Missing Page]].',
+}
+
+@pytest.fixture
+def wiki(tmp_path):
+    root = tmp_path / 'wiki'
+    for path, text in PAGES.items():
+        page_file = root / 'page' / f'{path}.db'
+        page_file.parent.mkdir(parents=True, exist_ok=True)
+        page_file.write_bytes(fakewiki.encode_page(text, 1000000000).encode('cp1252'))
+    (root / 'intermap').write_text('')
+    (root / 'config').write_text('$FreeLinks = 1;\n$WikiLinks = 1;\n')
+    return root
+
+BROKEN_LINKS = [
+    {'page': 'Alpha', 'target': 'Missing_Page', 'link_text': 'Missing Page'},
+    {'page': 'Alpha', 'target': 'MissingName', 'link_text': 'MissingName'},
+    {'page': 'Beta', 'target': 'Missing_Page', 'link_text': 'missing'},
+    {'page': 'Beta', 'target': 'Gone', 'link_text': 'Gone'},
+    {'page': 'Beta/Child', 'target': 'Missing_Page', 'link_text': 'Missing Page'},
+]
+
+def by_page(links):
+    # Pages are converted in directory order; a page's links stay in order.
+    return sorted(links, key=lambda link: link['page'])
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_broken_link_report(wiki, run_cli, capsys, tmp_path, jobs):
+    report = tmp_path / 'broken.json'
+    run_cli(wiki, tmp_path / 'out', '--broken-link-report', report, '--warn-broken-links', '--jobs', jobs)
+    out = capsys.readouterr().out
+    data = json.loads(report.read_text())
+    assert data['pages_indexed'] == 3
+    assert by_page(data['broken_links']) == BROKEN_LINKS
+    assert data['missing_pages'] == {'Missing_Page': 3, 'Gone': 1, 'MissingName': 1}
+    assert list(data['missing_pages'])[0] == 'Missing_Page'
+    warnings = sorted(line for line in out.splitlines() if line.startswith('WARNING:'))
+    assert warnings == sorted(f'WARNING: {link["page"]} links to missing page {link["target"]}' for link in BROKEN_LINKS)
+    assert f'5 broken links, report written to {report}' in out
+
+@pytest.mark.parametrize('style, alpha, beta', [
+    ('link', 'See [Beta](../Beta/), [Missing Page](../Missing_Page/) and [MissingName](../MissingName/).\n',
+     'Back to [Alpha](../Alpha/), [missing](../Missing_Page/) and [Gone](../Gone/).\n'),
+    ('text', 'See [Beta](../Beta/), Missing Page and MissingName.\n',
+     'Back to [Alpha](../Alpha/), missing and Gone.\n'),
+    ('mark', 'See [Beta](../Beta/), Missing Page[?](../Missing_Page/) and MissingName[?](../MissingName/).\n',
+     'Back to [Alpha](../Alpha/), missing[?](../Missing_Page/) and Gone[?](../Gone/).\n'),
+])
+def test_broken_link_styles(wiki, run_cli, tmp_path, style, alpha, beta):
+    run_cli(wiki, tmp_path / 'out', '--broken-link-style', style)
+    assert (tmp_path / 'out' / 'Alpha.md').read_text().endswith(f'---\n\n{alpha}')
+    assert (tmp_path / 'out' / 'Beta.md').read_text().endswith(f'---\n\n{beta}')
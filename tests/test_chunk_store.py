@@ -0,0 +1,46 @@
+from usemod_to_markdown import Converter
+from usemod_to_markdown.converter import ChunkStore
+from usemod_to_markdown.pages import FS
+
+def restore_by_replace(chunks, txt):
+    # How markers were restored originally: the first occurrence of each,
+    # from the last stored chunk down to the first.
+    for i in reversed(range(len(chunks))):
+        txt = txt.replace(f'{FS}{i}{FS}', chunks[i], 1)
+    return txt
+
+def store_all(values):
+    store = ChunkStore()
+    markers = [store.store(value) for value in values]
+    return store, markers
+
+def test_restore_nested_markers():
+    store, markers = store_all(['inner', 'outer'])
+    store.chunks[1] = f'[{markers[0]}]'
+    assert store.restore(f'a {markers[1]} b') == 'a [inner] b'
+
+def test_restore_leaves_unknown_and_repeated_markers():
+    store, markers = store_all(['x'])
+    txt = f'{markers[0]} {markers[0]} {FS}7{FS} {FS}00{FS}'
+    assert store.restore(txt) == restore_by_replace(store.chunks, txt)
+
+def test_restore_after_marker_like_text():
+    # A marker-like run sharing its FS with a real marker must not hide it.
+    store, markers = store_all(['link'])
+    for txt in [f'x{FS}12{markers[0]}', f'{FS}{markers[0]}{FS}', f'{FS}9{FS}9{markers[0]}']:
+        assert store.restore(txt) == restore_by_replace(store.chunks, txt)
+
+def test_restore_markers_sharing_an_fs():
+    # Where replacing would find FS 1 FS across the first two markers.
+    store, markers = store_all(['A', 'B'])
+    txt = f'{markers[0]}1{markers[1]}'
+    assert store.restore(txt) == 'A1B'
+    assert restore_by_replace(store.chunks, txt) == f'{FS}0B1{FS}'
+
+def test_links_separated_by_a_digit():
+    converter = Converter(config={'FreeLinks': 1}, intermap={})
+    assert converter.convert_text('[[Foo]]1[[Bar]]', 'Page') == '[Foo](../Foo/)1[Bar](../Bar/)\n'
+
+def test_link_text_after_marker_like_text():
+    converter = Converter(config={'FreeLinks': 1}, intermap={})
+    assert converter.convert_text(f'x{FS}12[[Foo Bar|text]]', 'Page') == f'x{FS}12[text](../Foo_Bar/)\n'
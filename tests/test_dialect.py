@@ -0,0 +1,88 @@
+import re
+
+import pytest
+
+from usemod_to_markdown import Converter
+from usemod_to_markdown.dialect import literal_trie_pattern
+
+INTERMAP = {'Wiki': 'https://example.com/wiki/'}
+
+# A subpage using every kind of link and HTML tag the options affect.
+TEXT = (
+    'See [[free link]], [[Parent/Child page]] and [[Other|labelled]].\n'
+    'WikiName, WikiName#anchor, WikiName_2, /SubPage and ParentPage/ChildPage.\n'
+    'A http://example.com/x, a file:///etc/motd, [http://example.com/ text] and [ftp://example.com/f].\n'
+    'Wiki:Some_Page and [Wiki:Page known] and Unknown:Page.\n'
+    '<b>bold</b> <font color=red>red</font> <em>em</em> line<br>break <hr> <p>\n'
+)
+
+# UseMod options with the output of the original converter, whose patterns
+# were module globals rebuilt from the options.
+CASES = [
+    ({},
+     'See [free link](../../Free_Link/), [Parent/Child page](../../Parent/Child_Page/) and [labelled](../../Other/).\n'
+     'WikiName, WikiName#anchor, WikiName_2, /SubPage and ParentPage/ChildPage.\n'
+     'A <http://example.com/x>, a <file:///etc/motd>, [[text]](http://example.com/) and [1](ftp://example.com/f).\n'
+     '[Wiki:Some_Page](https://example.com/wiki/Some_Page) and [[known]](https://example.com/wiki/Page) and Unknown:Page.\n'
+     '<b>bold</b> <font color=red>red</font> *em* line<br>break <hr> <p>\n'),
+    ({'WikiLinks': 1},
+     'See [free link](../../Free_Link/), [Parent/Child page](../../Parent/Child_Page/) and [labelled](../../Other/).\n'
+     '[WikiName](../../WikiName/), [WikiName#anchor](../../WikiName#anchor/), [WikiName 2](../../WikiName_2/), /[SubPage](../../SubPage/) and [ParentPage](../../ParentPage/)/[ChildPage](../../ChildPage/).\n'
+     'A <http://example.com/x>, a <file:///etc/motd>, [[text]](http://example.com/) and [1](ftp://example.com/f).\n'
+     '[Wiki:Some_Page](https://example.com/wiki/Some_Page) and [[known]](https://example.com/wiki/Page) and Unknown:Page.\n'
+     '<b>bold</b> <font color=red>red</font> *em* line<br>break <hr> <p>\n'),
+    ({'WikiLinks': 1, 'SimpleLinks': 1},
+     'See [free link](../../Free_Link/), [Parent/Child page](../../Parent/Child_Page/) and [labelled](../../Other/).\n'
+     '[WikiName](../../WikiName/), [WikiName#anchor](../../WikiName#anchor/), [WikiName](../../WikiName/)_2, /[SubPage](../../SubPage/) and [ParentPage](../../ParentPage/)/[ChildPage](../../ChildPage/).\n'
+     'A <http://example.com/x>, a <file:///etc/motd>, [[text]](http://example.com/) and [1](ftp://example.com/f).\n'
+     '[Wiki:Some_Page](https://example.com/wiki/Some_Page) and [[known]](https://example.com/wiki/Page) and Unknown:Page.\n'
+     '<b>bold</b> <font color=red>red</font> *em* line<br>break <hr> <p>\n'),
+    ({'UseSubpage': 0},
+     'See [free link](../../Free_Link/), [[Parent/Child page]] and [labelled](../../Other/).\n'
+     'WikiName, WikiName#anchor, WikiName_2, /SubPage and ParentPage/ChildPage.\n'
+     'A <http://example.com/x>, a <file:///etc/motd>, [[text]](http://example.com/) and [1](ftp://example.com/f).\n'
+     '[Wiki:Some_Page](https://example.com/wiki/Some_Page) and [[known]](https://example.com/wiki/Page) and Unknown:Page.\n'
+     '<b>bold</b> <font color=red>red</font> *em* line<br>break <hr> <p>\n'),
+    ({'FreeLinks': 0, 'NetworkFile': 0, 'BracketText': 0},
+     'See [[free link]], [[Parent/Child page]] and [[Other|labelled]].\n'
+     'WikiName, WikiName#anchor, WikiName_2, /SubPage and ParentPage/ChildPage.\n'
+     'A <http://example.com/x>, a file:///etc/motd, [<http://example.com/> text] and [1](ftp://example.com/f).\n'
+     '[Wiki:Some_Page](https://example.com/wiki/Some_Page) and [[Wiki:Page](https://example.com/wiki/Page) known] and Unknown:Page.\n'
+     '<b>bold</b> <font color=red>red</font> *em* line<br>break <hr> <p>\n'),
+    ({'HtmlTags': 0, 'WikiLinks': 1},
+     'See [free link](../../Free_Link/), [Parent/Child page](../../Parent/Child_Page/) and [labelled](../../Other/).\n'
+     '[WikiName](../../WikiName/), [WikiName#anchor](../../WikiName#anchor/), [WikiName 2](../../WikiName_2/), /[SubPage](../../SubPage/) and [ParentPage](../../ParentPage/)/[ChildPage](../../ChildPage/).\n'
+     'A <http://example.com/x>, a <file:///etc/motd>, [[text]](http://example.com/) and [1](ftp://example.com/f).\n'
+     '[Wiki:Some_Page](https://example.com/wiki/Some_Page) and [[known]](https://example.com/wiki/Page) and Unknown:Page.\n'
+     '<b>bold</b> &lt;font color=red&gt;red&lt;/font&gt; *em* line<br>break &lt;hr&gt; &lt;p&gt;\n'),
+]
+
+def converter(config):
+    return Converter(config=config, intermap=INTERMAP, page_links_relative=True)
+
+@pytest.mark.parametrize('config, expected', CASES)
+def test_patterns_match_original(config, expected):
+    assert converter(config).convert_text(TEXT, 'Page', 'ParentPage') == expected
+
+def test_converters_with_different_options_coexist():
+    # Each converter has patterns of its own, so converting with one
+    # doesn't change what another does.
+    converters = [(converter(config), expected) for config, expected in CASES]
+    for _ in range(2):
+        for each, expected in converters:
+            assert each.convert_text(TEXT, 'Page', 'ParentPage') == expected
+
+def test_dialect_is_rebuilt_from_settings():
+    original = converter({'WikiLinks': 1, 'SimpleLinks': 1})
+    copy = Converter(**original.settings())
+    assert copy.dialect is not original.dialect
+    assert copy.dialect.inline_link_passes == original.dialect.inline_link_passes
+    assert copy.dialect.inline_links.pattern == original.dialect.inline_links.pattern
+
+def test_literal_trie_pattern_matches_exactly_the_words():
+    words = ['Wiki', 'WikiPedia', 'Meatball', 'Meta', 'M', 'C++']
+    pattern = re.compile(literal_trie_pattern(words))
+    for word in words:
+        assert pattern.fullmatch(word)
+    for other in ['Wik', 'WikiP', 'Me', 'MetaWiki', 'C+', '']:
+        assert not pattern.fullmatch(other)
@@ -0,0 +1,64 @@
+import pytest
+import yaml
+
+from usemod_to_markdown.output import format_front_matter
+
+titles = [
+    'HomePage',
+    'Notes As Storage',
+    'Parent/SubPage',
+    # Starting with indicators.
+    '-Dash', '?Question', ':Colon', ',Comma', '[Bracket]', '{Brace}', '#Hash', '&Anchor', '*Alias',
+    '!Tag', '|Pipe', '>Fold', "'Quote", '"Double', '%Percent', '@At', '`Tick', '.Dot',
+    # Looking like another type.
+    'true', 'False', 'yes', 'No', 'on', 'null', 'Null', '~', '1', '-2', '1.5', '1e3', '0x1F', '0o17',
+    '.inf', '.NaN', '2001-09-25', '2001-09-25T20:43:38', '12:30:00',
+    # Long or non-ASCII.
+    'A' * 90, ' '.join(['Word'] * 20), 'Café', 'Ünïcödé Page', 'Tab\there',
+    # Containing ': ' or ' #', or ending in ':'.
+    'Key: Value', 'Page #2', 'Ends with:', 'Trailing ', ' Leading',
+]
+
+backlinks = [
+    ['HomePage'],
+    ['Notes_As_Storage', 'Parent/SubPage', 'true', '1.5', '-Dash'],
+    ['A' * 90, 'Café', 'Key: Value'],
+]
+
+def front_matters():
+    for title in titles:
+        yield {'title': title, 'date': '2001-09-25T20:43:38'}
+        yield {'title': title, 'date': '2001-09-25T20:43:38', 'wiki_parent': title}
+    for links in backlinks:
+        yield {'title': 'Page', 'date': '2001-09-25T20:43:38', 'backlinks': links}
+        yield {'title': 'Parent/Page', 'date': '2001-09-25T20:43:38', 'wiki_parent': 'Parent',
+               'backlinks': links}
+
+@pytest.mark.parametrize('frontmatter', list(front_matters()))
+def test_builtin_matches_pyyaml(frontmatter):
+    text = format_front_matter(frontmatter)
+    assert text == yaml.dump(frontmatter, Dumper=yaml.Dumper, default_flow_style=False)
+    assert yaml.safe_load(text) == frontmatter
+
+@pytest.mark.parametrize('frontmatter', list(front_matters()))
+def test_python_dumper(frontmatter):
+    text = format_front_matter(frontmatter, 'python')
+    assert text == yaml.dump(frontmatter, Dumper=yaml.Dumper, default_flow_style=False)
+    assert yaml.safe_load(text) == frontmatter
+
+@pytest.mark.skipif(not yaml.__with_libyaml__, reason="PyYAML's C dumper is not available")
+@pytest.mark.parametrize('frontmatter', list(front_matters()))
+def test_c_dumper(frontmatter):
+    text = format_front_matter(frontmatter, 'c')
+    assert text == yaml.dump(frontmatter, Dumper=yaml.CDumper, default_flow_style=False)
+    assert yaml.safe_load(text) == frontmatter
+
+def test_builtin_writes_common_cases_itself(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError('handed to PyYAML')
+    monkeypatch.setattr(yaml, 'dump', fail)
+    frontmatter = {'title': 'Parent/Page', 'date': '2001-09-25T20:43:38', 'wiki_parent': 'true',
+                   'backlinks': ['HomePage', 'Parent/Other', '1.5']}
+    assert format_front_matter(frontmatter) == (
+        "backlinks:\n- HomePage\n- Parent/Other\n- '1.5'\n"
+        "date: '2001-09-25T20:43:38'\ntitle: Parent/Page\nwiki_parent: 'true'\n")
@@ -0,0 +1,30 @@
+import shutil
+import subprocess
+
+import pytest
+
+from usemod_to_markdown.pages import iter_page_files, read_page_revisions
+
+from conftest import read_tree
+
+pytestmark = pytest.mark.skipif(shutil.which('git') is None, reason='needs git')
+
+def git(repo, *args, **kwargs):
+    return subprocess.run(['git', *args], cwd=repo, check=True, capture_output=True, **kwargs).stdout
+
+def test_fast_import_has_a_commit_per_revision(make_wiki, run_cli, tmp_path):
+    wiki = make_wiki(revisions=3)
+    revisions = sum(len(read_page_revisions(page_file)) for page_file in iter_page_files(wiki))
+    assert revisions > 2 * len(list(iter_page_files(wiki)))
+    run_cli(wiki, tmp_path / 'history.fi', '--output-format', 'git')
+    repo = tmp_path / 'repo'
+    repo.mkdir()
+    git(repo, 'init', '-q')
+    with open(tmp_path / 'history.fi', 'rb') as stream:
+        git(repo, 'fast-import', '--quiet', stdin=stream)
+    assert int(git(repo, 'rev-list', '--count', 'master')) == revisions
+    # The last commits leave every page at its current revision.
+    run_cli(wiki, tmp_path / 'current')
+    git(repo, 'checkout', '-q', 'master')
+    tree = read_tree(repo)
+    assert {path: data for path, data in tree.items() if not path.startswith('.git')} == read_tree(tmp_path / 'current')
@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+import fakewiki
+from usemod_to_markdown import Converter, read_intermap
+from usemod_to_markdown.incremental import manifest_name, settings_fingerprint
+from usemod_to_markdown.pages import count_page_files, iter_page_files, post_path
+
+@pytest.fixture
+def wiki(make_wiki):
+    return make_wiki()
+
+@pytest.fixture
+def convert(wiki, run_cli, capsys):
+    # Runs an incremental conversion and returns its summary line.
+    output = wiki.parent / 'out'
+    def run():
+        capsys.readouterr()
+        run_cli(wiki, output, '--incremental', '--progress', 'files')
+        return [line for line in capsys.readouterr().out.splitlines() if line.startswith('Incremental run:')][0]
+    run.output = output
+    return run
+
+def page_files(wiki):
+    return sorted(iter_page_files(wiki))
+
+def summary(converted, unchanged, removed):
+    return f'Incremental run: {converted} converted, {unchanged} unchanged, {removed} removed'
+
+def test_unchanged_pages_are_skipped(wiki, convert):
+    pages = count_page_files(wiki)
+    assert convert() == summary(pages, 0, 0)
+    mtimes = {path: path.stat().st_mtime_ns for path in convert.output.rglob('*.md')}
+    assert convert() == summary(0, pages, 0)
+    assert {path: path.stat().st_mtime_ns for path in convert.output.rglob('*.md')} == mtimes
+
+def test_touched_page_with_the_same_content_is_skipped(wiki, convert):
+    pages = count_page_files(wiki)
+    convert()
+    page_file = page_files(wiki)[0]
+    stat = page_file.stat()
+    os.utime(page_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert convert() == summary(0, pages, 0)
+
+def test_edited_page_is_reconverted(wiki, convert):
+    pages = count_page_files(wiki)
+    convert()
+    page_file = page_files(wiki)[0]
+    page_file.write_bytes(fakewiki.encode_page('Edited text', 2000000000).encode('cp1252'))
+    assert convert() == summary(1, pages - 1, 0)
+    assert (convert.output / post_path(page_file)).read_text(encoding='utf-8').endswith('\nEdited text\n')
+
+def test_deleted_page_output_is_removed(wiki, convert):
+    pages = count_page_files(wiki)
+    convert()
+    page_file = page_files(wiki)[0]
+    output = convert.output / post_path(page_file)
+    assert output.exists()
+    page_file.unlink()
+    assert convert() == summary(0, pages - 1, 1)
+    assert not output.exists()
+    manifest = json.loads((convert.output / manifest_name).read_text(encoding='utf-8'))
+    assert len(manifest['pages']) == pages - 1
+
+def test_missing_output_is_reconverted(wiki, convert):
+    pages = count_page_files(wiki)
+    convert()
+    (convert.output / post_path(page_files(wiki)[0])).unlink()
+    assert convert() == summary(1, pages - 1, 0)
+
+@pytest.mark.parametrize('file, line', [('config', '$BracketWiki = 1;\n'), ('intermap', 'NewSite http://new.example.com/\n')])
+def test_changed_config_or_intermap_reconverts_everything(wiki, convert, file, line):
+    pages = count_page_files(wiki)
+    convert()
+    with open(wiki / file, 'a') as fh:
+        fh.write(line)
+    assert convert() == summary(pages, 0, 0)
+    assert convert() == summary(0, pages, 0)
+
+def test_fingerprint_covers_options_and_yaml_dumper(wiki):
+    intermap = read_intermap(wiki)
+    converter = Converter(intermap=intermap)
+    fingerprint = settings_fingerprint(converter)
+    assert settings_fingerprint(Converter(intermap=intermap)) == fingerprint
+    assert settings_fingerprint(Converter(intermap=intermap, supress_msgs=True, profile_top=5)) == fingerprint
+    assert settings_fingerprint(Converter(intermap=intermap, page_link_suffix='.html')) != fingerprint
+    assert settings_fingerprint(Converter(intermap={**intermap, 'Other': 'x'})) != fingerprint
+    assert settings_fingerprint(Converter(config={'WikiLinks': True}, intermap=intermap)) != fingerprint
+    assert settings_fingerprint(converter, 'python') != fingerprint
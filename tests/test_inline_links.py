@@ -0,0 +1,116 @@
+import random
+
+import pytest
+
+import fakewiki
+from usemod_to_markdown import Converter
+from usemod_to_markdown.converter import inline_link_interlink_passes
+from usemod_to_markdown.incremental import settings_fingerprint
+
+CONFIG = {'FreeLinks': 1, 'WikiLinks': 1, 'HtmlTags': 1}
+INTERMAP = {'Wiki': 'https://example.com/wiki/'}
+
+# Pages with every kind of inline link, including ones the scan gives up on.
+PAGES = [
+    'See [[Free Link]], [[Free Link|with text]] and [[Free Link#anchor]].',
+    'A [https://example.com/ bracket URL] and [https://example.com/] alone.',
+    'Interlinks: Wiki:SomePage, [Wiki:SomePage text], [Unknown:Page text] and Unknown:Page.',
+    'Naked https://example.com/path?q=1, and a WikiName, SubPage/Child and /Child.',
+    'Anchored WikiName#Anchor and [#Anchor] and [WikiName#Anchor text].',
+    'A URL https://example.com/[[Free Link]] running into a link.',
+    'Wiki:Page#Anchor and https://example.com/Wiki:Page and WikiName:Wiki',
+]
+
+def converters(**options):
+    return [Converter(config=CONFIG, intermap=INTERMAP, inline_link_scanner=scanner, **options)
+            for scanner in (True, False)]
+
+def test_scanner_matches_link_passes():
+    scanner, passes = converters(page_index=['FreeLink', 'WikiName'], warn_broken_links=True,
+                                 on_message=lambda msg: None)
+    for text in PAGES:
+        assert scanner.convert_text(text, 'Page') == passes.convert_text(text, 'Page')
+    assert scanner.broken_links == passes.broken_links
+
+def test_profile_keeps_link_pass_matches():
+    scanner, passes = converters(profile_top=1)
+    for text in PAGES:
+        scanner.convert_text(text, 'Page')
+        passes.convert_text(text, 'Page')
+    # The passes also count interlinks to unknown sites, left as they are.
+    for name in scanner.dialect.inline_link_passes:
+        _, _, matches, size_change = passes.profiler.passes[name]
+        if size_change:
+            assert scanner.profiler.passes[name][3] == size_change
+        if name not in inline_link_interlink_passes:
+            assert scanner.profiler.passes[name][2] == matches
+    assert 'inline_links' in scanner.profiler.passes
+    assert 'inline_links' not in passes.profiler.passes
+
+def test_option_reaches_workers_and_fingerprint():
+    scanner, passes = converters()
+    assert Converter(**passes.settings()).inline_link_scanner is False
+    assert settings_fingerprint(scanner) != settings_fingerprint(passes)
+
+# Interlinks to sites missing from the intermap, next to known ones, with the
+# output of the original converter: an unknown site still consumes its text,
+# so nothing inside it is linked as an interlink.
+UNKNOWN_SITE_CASES = [
+    ('Unknown:Page next to Wiki:Page.',
+     'Unknown:Page next to [Wiki:Page](https://example.com/wiki/Page).\n'),
+    ('Wiki:Page next to Unknown:Page.',
+     '[Wiki:Page](https://example.com/wiki/Page) next to Unknown:Page.\n'),
+    ('Unknown:Wiki:Page and Wiki:Unknown:Page',
+     'Unknown:Wiki:Page and [Wiki:Unknown:Page](https://example.com/wiki/Unknown:Page)\n'),
+    ('Wikipedia:Page and MetaWiki:Page beside Meta:Page',
+     'Wikipedia:Page and [MetaWiki](../MetaWiki/):Page beside [Meta:Page](https://meta.example.com/?Page)\n'),
+    ('[Unknown:Page unknown text] then [Wiki:Page known text]',
+     '[Unknown:Page unknown text] then [[known text]](https://example.com/wiki/Page)\n'),
+    ('Unknown:WikiName and WikiName beside Wiki:WikiName',
+     'Unknown:[WikiName](../WikiName/) and [WikiName](../WikiName/) beside [Wiki:WikiName](https://example.com/wiki/WikiName)\n'),
+    ('Unknown:[[Free Link]] and Wiki:[[Free Link]]',
+     'Unknown:[Free Link](../Free_Link/) and Wiki:[Free Link](../Free_Link/)\n'),
+]
+
+@pytest.mark.parametrize('text, expected', UNKNOWN_SITE_CASES)
+@pytest.mark.parametrize('scanner', [True, False])
+def test_unknown_sites_match_original(text, expected, scanner):
+    intermap = {**INTERMAP, 'Meta': 'https://meta.example.com/?'}
+    converter = Converter(config={'FreeLinks': 1, 'WikiLinks': 1}, intermap=intermap, inline_link_scanner=scanner)
+    assert converter.convert_text(text, 'Page') == expected
+
+# Generated pages: fakewiki's link-dense pages, and runs of link fragments
+# put together at random, which the scan often has to give up on.
+CONFIGS = [
+    {'FreeLinks': 1, 'WikiLinks': 1, 'BracketText': 1},
+    {'FreeLinks': 1, 'WikiLinks': 1, 'BracketText': 1, 'BracketWiki': 1},
+    {'FreeLinks': 0, 'WikiLinks': 1, 'BracketText': 0, 'SimpleLinks': 1},
+    {'FreeLinks': 1, 'WikiLinks': 0, 'UseSubpage': 0},
+]
+
+FRAGMENTS = [
+    '[', ']', '[[', ']]', '|', ' ', ' ', '\n', ':', '/', '#', '"', '""', 'x', 'Wiki', 'Wiki:', 'Other:',
+    'WikiName', 'SubPage', '/Child', 'Page#anchor', 'http://example.com/', 'mailto:a@b.c', 'https:',
+    '[[Free Link]]', '[Wiki:Page text]', '[http://example.com/ text]', 'Wiki:Page', 'UnknownSite:Page',
+    'CamelCase/Sub', '&amp;', ').', '0', '1', '_', '-',
+]
+
+def generated_pages(seed):
+    rng = random.Random(seed)
+    names = fakewiki.make_page_names(rng, 30)
+    generator = fakewiki.TextGenerator(rng, names, list(INTERMAP) + fakewiki.INTERMAP_SITES[:4], 0.3, 0.1, 0.05, 0.05)
+    pages = [generator.page(1500) for _ in range(60)]
+    pages.extend(''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 30))) for _ in range(1500))
+    return names, pages
+
+@pytest.mark.parametrize('config', CONFIGS)
+def test_scanner_matches_link_passes_on_generated_pages(config):
+    names, pages = generated_pages(18)
+    intermap = {**INTERMAP, **{site: f'https://{site.lower()}.example.com/' for site in fakewiki.INTERMAP_SITES[:2]}}
+    scanner, passes = [Converter(config=config, intermap=intermap, inline_link_scanner=scanner,
+                                 page_index=names[::2], on_message=lambda msg: None)
+                       for scanner in (True, False)]
+    for n, text in enumerate(pages):
+        parent_id = 'ParentPage' if n % 3 == 0 else None
+        assert scanner.convert_text(text, 'Page', parent_id) == passes.convert_text(text, 'Page', parent_id), text
+    assert scanner.broken_links == passes.broken_links
@@ -0,0 +1,18 @@
+from conftest import read_tree
+
+def warnings(out):
+    return [line for line in out.splitlines() if line.startswith('WARNING:')]
+
+def test_pooled_output_matches_serial(make_wiki, run_cli, capsys, tmp_path):
+    wiki = make_wiki(pages=30, subpage_ratio=0.4)
+    run_cli(wiki, tmp_path / 'serial', '--warn-broken-links', '--progress', 'files')
+    serial_warnings = warnings(capsys.readouterr().out)
+    run_cli(wiki, tmp_path / 'pooled', '--warn-broken-links', '--progress', 'files', '--jobs', '2')
+    pooled_out = capsys.readouterr().out
+    serial = read_tree(tmp_path / 'serial')
+    assert len(serial) > 30
+    assert read_tree(tmp_path / 'pooled') == serial
+    # Messages come out in page order, as they do serially.
+    assert serial_warnings
+    assert warnings(pooled_out) == serial_warnings
+    assert 'Worker 1:' in pooled_out
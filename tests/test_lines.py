@@ -0,0 +1,74 @@
+import collections
+
+import pytest
+
+from usemod_to_markdown import Converter
+from usemod_to_markdown.lines import LineState, usemod_lines_to_markdown
+
+# Line inputs with the output of the original usemod_lines_to_markdown, with
+# and without UseHeadings where that makes a difference.
+CASES = [
+    ('* one\n** two\n***three\n* back\nplain after',
+     '* one\n  * two\n    *three\n* back\nplain after\n'),
+    ('# one\n# two\n## nested\n# three\ntext\n# again\n#restart',
+     '1. one\n2. two\n  3. nested\n4. three\ntext\n1. again\n2.restart\n'),
+    ('#a\n\n#b\n##c\n*d\n#e',
+     '1.a\n\n1.b\n  2.c\n*d\n1.e\n'),
+    (":one\n::two\n:::three ''em''\n: spaced",
+     '>one\n>>two\n>>>three <em>em</em>\n> spaced\n'),
+    ("||a||b||\n||c||d||\ntext\n||'''H1'''||'''H2'''||\n||x||y||\n|| empty ||",
+     '\n|-|-|\n|a|b|\n|c|d|\ntext\n|<strong>H1</strong>|<strong>H2</strong>|\n'
+     '|-------------------|-------------------|\n|x|y|\n| empty |\n'),
+    ("||'''a'''||<b>b</b>||\n||'''c'''||d||",
+     '|<strong>a</strong>|<b>b</b>|\n|------------------|--------|\n|<strong>c</strong>|d|\n'),
+    ("''italic'' and '''bold''' and '''''both'''''\n''''four'''' quotes\nunclosed ''em\n|pipe ''x''",
+     "<em>italic</em> and <strong>bold</strong> and <em><strong>both</strong></em>\n"
+     "'<strong>four</strong>' quotes\nunclosed ''em\n|pipe <em>x</em>\n"),
+    ('', ''),
+    ('\n\n||unterminated\n|single|\n*\n#\n:\n=\n x\r\ny',
+     '\n\n||unterminated\n|single|\n*\n1.\n>\n=\n     x\ny\n'),
+]
+
+HEADING_CASES = [
+    ('= Top =\n== # Numbered ==\n=== # Deeper === trailing\n== # Next ==\n  = Indented =\n==NoSpace==\n'
+     '====== # Six ======= rest',
+     '# Top\n\n\n## 1. Numbered\n\n\n### 1.1. Deeper\n\n trailing\n## 2. Next\n\n\n# Indented\n\n\n'
+     '==NoSpace==\n###### 2.1.1.1.1. Six\n\n rest\n',
+     '= Top =\n== # Numbered ==\n=== # Deeper === trailing\n== # Next ==\n      = Indented =\n'
+     '==NoSpace==\n====== # Six ======= rest\n'),
+    (" code line\n\tTabbed\n   = not a heading =\n '''bold''' in code",
+     '     code line\n    \tTabbed\n# not a heading\n\n\n     <strong>bold</strong> in code\n',
+     '     code line\n    \tTabbed\n       = not a heading =\n     <strong>bold</strong> in code\n'),
+    ("* item ''em''\n# num '''b'''\n||t||\n= H =\n:q\n plain mono\n\n",
+     '* item <em>em</em>\n1. num <strong>b</strong>\n\n|-|\n|t|\n# H\n\n\n>q\n     plain mono\n\n',
+     '* item <em>em</em>\n1. num <strong>b</strong>\n\n|-|\n|t|\n= H =\n>q\n     plain mono\n\n'),
+]
+
+def convert_lines(text, use_headings=True):
+    dialect = Converter(intermap={}).dialect
+    return usemod_lines_to_markdown(text, LineState(dialect, False, use_headings, collections.Counter()))
+
+@pytest.mark.parametrize('text, expected', CASES)
+def test_lines_match_original(text, expected):
+    assert convert_lines(text, True) == expected
+    assert convert_lines(text, False) == expected
+
+@pytest.mark.parametrize('text, with_headings, without_headings', HEADING_CASES)
+def test_heading_lines_match_original(text, with_headings, without_headings):
+    assert convert_lines(text, True) == with_headings
+    assert convert_lines(text, False) == without_headings
+
+@pytest.mark.parametrize('text, expected, warned', [
+    ('# one\n# two\n\n# three', '1. one\n2. two\n\n1. three\n', True),
+    ('# one\n\n\n#two', '1. one\n\n\n1.two\n', True),
+    ('# one\ntext\n# two', '1. one\ntext\n1. two\n', False),
+    ('* a\n\n* b', '* a\n<br><br>\n* b\n', False),
+])
+def test_adjacent_numbered_lists_warning(text, expected, warned):
+    converter = Converter(intermap={})
+    log = converter.new_log()
+    assert converter.convert_text(text, 'Page', None, log) == expected
+    assert log.warnings == warned
+    if warned:
+        assert log.messages == ['WARNING: Page contains adjacent numbered lists separated by blank lines '
+                                'which will misbehave in Markdown.']
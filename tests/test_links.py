@@ -0,0 +1,47 @@
+import json
+
+import pytest
+import yaml
+
+import fakewiki
+
+# Alpha links to Beta twice, to itself and to a missing page; Beta and Gamma
+# link back to Alpha, and nothing links to Gamma.
+PAGES = {
+    'Alpha': 'See [[Beta]], [[Beta|again]], [[Alpha]] and [[Missing Page]].',
+    'Beta': 'Back to [[Alpha]].',
+    'Gamma': 'Also [[Alpha]].',
+}
+
+@pytest.fixture
+def wiki(tmp_path):
+    root = tmp_path / 'wiki'
+    for name, text in PAGES.items():
+        page_file = root / 'page' / name[0] / f'{name}.db'
+        page_file.parent.mkdir(parents=True)
+        page_file.write_bytes(fakewiki.encode_page(text, 1000000000).encode('cp1252'))
+    (root / 'intermap').write_text('')
+    (root / 'config').write_text('$FreeLinks = 1;\n')
+    return root
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_backlinks_and_orphans(wiki, run_cli, tmp_path, jobs):
+    run_cli(wiki, tmp_path / 'out', '--backlinks', tmp_path / 'backlinks.json', '--orphan-report',
+            tmp_path / 'orphans.json', '--link-graph', tmp_path / 'graph.tsv', '--link-graph-format', 'edges',
+            '--jobs', jobs)
+    # Pages are listed in the order they were converted, which is the order
+    # the directories are read in.
+    backlinks = json.loads((tmp_path / 'backlinks.json').read_text())
+    assert {page: sorted(sources) for page, sources in backlinks.items()} == {'Alpha': ['Beta', 'Gamma'], 'Beta': ['Alpha']}
+    assert json.loads((tmp_path / 'orphans.json').read_text()) == {
+        'pages': 3, 'orphans': [{'page': 'Gamma', 'path': 'Gamma.md'}]}
+    assert sorted((tmp_path / 'graph.tsv').read_text().splitlines()) == [
+        'Alpha\tBeta', 'Alpha\tMissing_Page', 'Beta\tAlpha', 'Gamma\tAlpha']
+
+def test_backlinks_front_matter(wiki, run_cli, tmp_path):
+    run_cli(wiki, tmp_path / 'out', '--backlinks-front-matter')
+    def front_matter(name):
+        return yaml.safe_load((tmp_path / 'out' / f'{name}.md').read_text().split('---\n')[1])
+    assert sorted(front_matter('Alpha')['backlinks']) == ['Beta', 'Gamma']
+    assert front_matter('Beta')['backlinks'] == ['Alpha']
+    assert 'backlinks' not in front_matter('Gamma')
@@ -0,0 +1,133 @@
+import datetime
+import json
+import os
+import sqlite3
+import tarfile
+import zipfile
+
+import pytest
+import yaml
+
+from usemod_to_markdown import Converter, output
+from usemod_to_markdown.output import DirectorySink, Post, digest_cache_name
+
+from conftest import read_tree
+
+def test_if_changed_needs_overwrite(tmp_path):
+    with pytest.raises(ValueError):
+        DirectorySink(tmp_path, overwrite=False, if_changed=True)
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_unchanged_outputs_keep_their_mtimes(make_wiki, run_cli, capsys, tmp_path, jobs):
+    wiki = make_wiki()
+    out = tmp_path / 'out'
+    run_cli(wiki, out, '--write-if-changed', '--jobs', jobs)
+    tree = read_tree(out)
+    mtimes = {path: path.stat().st_mtime_ns for path in out.rglob('*.md')}
+    digests = json.loads((out / digest_cache_name).read_text(encoding='utf-8'))
+    assert sorted(digests) == sorted(str(path.relative_to(out)) for path in mtimes)
+    capsys.readouterr()
+    run_cli(wiki, out, '--write-if-changed', '--jobs', jobs)
+    assert f'0 written, {len(mtimes)} unchanged' in capsys.readouterr().out
+    assert {path: path.stat().st_mtime_ns for path in out.rglob('*.md')} == mtimes
+    assert read_tree(out) == tree
+
+def post(markdown):
+    return Post('Page.md', {'title': 'Page', 'date': '2001-01-01'}, markdown, '978307200')
+
+def write(path, markdown, reads):
+    # Writes a post with a fresh sink, as a new run would, and returns what
+    # happened to it.
+    sink = DirectorySink(path, overwrite=True, if_changed=True)
+    log = Converter(intermap={}).new_log()
+    sink.write(post(markdown), log)
+    sink.add_log(log)
+    sink.close()
+    return list(log.outputs), reads[:]
+
+def test_digest_cache_avoids_reading_outputs(tmp_path, monkeypatch):
+    reads = []
+    file_holds = output.file_holds
+    def counting_file_holds(path, data):
+        if path.exists():
+            reads.append(path.name)
+        return file_holds(path, data)
+    monkeypatch.setattr(output, 'file_holds', counting_file_holds)
+    assert write(tmp_path, 'text\n', reads) == (['written'], [])
+    # Unchanged and changed outputs are both told from the cache.
+    assert write(tmp_path, 'text\n', reads) == (['unchanged'], [])
+    assert write(tmp_path, 'next\n', reads) == (['written'], [])
+    # A file changed behind the sink's back is read.
+    page = tmp_path / 'Page.md'
+    stat = page.stat()
+    page.write_bytes(page.read_bytes().replace(b'next', b'edit'))
+    os.utime(page, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert write(tmp_path, 'next\n', reads) == (['written'], ['Page.md'])
+    # As is one missing from the cache.
+    (tmp_path / digest_cache_name).unlink()
+    assert write(tmp_path, 'next\n', reads) == (['unchanged'], ['Page.md', 'Page.md'])
+    assert write(tmp_path, 'next\n', reads) == (['unchanged'], ['Page.md', 'Page.md'])
+
+@pytest.fixture
+def converted(make_wiki, run_cli, tmp_path):
+    # A wiki and its directory output, as {path: bytes}.
+    wiki = make_wiki(subpage_ratio=0.5)
+    run_cli(wiki, tmp_path / 'dir')
+    return wiki, read_tree(tmp_path / 'dir')
+
+def split_post(data):
+    # (front matter, Markdown) of an output file.
+    _, front_matter, markdown = data.decode('utf-8').split('---\n', 2)
+    return yaml.safe_load(front_matter), markdown[1:]
+
+@pytest.mark.parametrize('name', ['out.tar', 'out.tar.gz', 'out.tgz', 'out.tar.bz2', 'out.tar.xz'])
+def test_tar_holds_the_directory_output(converted, run_cli, tmp_path, name):
+    wiki, tree = converted
+    run_cli(wiki, tmp_path / name, '--output-format', 'tar')
+    with tarfile.open(tmp_path / name) as archive:
+        members = archive.getmembers()
+        assert {member.name: archive.extractfile(member).read() for member in members} == tree
+        for member in members:
+            front_matter, _ = split_post(tree[member.name])
+            assert member.mtime == datetime.datetime.fromisoformat(front_matter['date']).timestamp() and member.mode == 0o644
+
+def test_zip_holds_the_directory_output(converted, run_cli, tmp_path):
+    wiki, tree = converted
+    run_cli(wiki, tmp_path / 'out.zip', '--output-format', 'zip')
+    with zipfile.ZipFile(tmp_path / 'out.zip') as archive:
+        assert archive.testzip() is None
+        assert {name: archive.read(name) for name in archive.namelist()} == tree
+
+def records(tree):
+    # What the SQLite and JSON Lines sinks should hold for a directory output.
+    result = {}
+    for path, data in tree.items():
+        front_matter, markdown = split_post(data)
+        result[path] = {'path': path, 'title': front_matter['title'], 'date': front_matter['date'],
+                        'wiki_parent': front_matter.get('wiki_parent'), 'markdown': markdown}
+    return result
+
+def test_sqlite_holds_a_row_per_page(converted, run_cli, tmp_path):
+    wiki, tree = converted
+    # An existing table is replaced.
+    for _ in range(2):
+        run_cli(wiki, tmp_path / 'out.sqlite', '--output-format', 'sqlite', '--overwrite')
+    db = sqlite3.connect(tmp_path / 'out.sqlite')
+    db.row_factory = sqlite3.Row
+    try:
+        rows = {row['path']: dict(row) for row in db.execute('SELECT * FROM pages')}
+    finally:
+        db.close()
+    assert rows == records(tree)
+    assert any(row['wiki_parent'] for row in rows.values())
+
+def test_jsonl_holds_a_line_per_page(converted, run_cli, capsys, tmp_path):
+    wiki, tree = converted
+    run_cli(wiki, tmp_path / 'out.jsonl', '--output-format', 'jsonl')
+    lines = (tmp_path / 'out.jsonl').read_text(encoding='utf-8').splitlines()
+    assert {record['path']: record for record in map(json.loads, lines)} == records(tree)
+    # Without an output file, the lines go to stdout.
+    capsys.readouterr()
+    run_cli(wiki, '--output-format', 'jsonl', '--silent')
+    out = capsys.readouterr().out.splitlines()
+    assert [line for line in out if line.startswith('{')] == lines
@@ -0,0 +1,128 @@
+import mmap
+import random
+
+import pytest
+
+import fakewiki
+from usemod_to_markdown import Converter, pages
+from usemod_to_markdown.pages import FS, FS1, FS2, FS3, PageFormatError, parse_page_record, read_page_file
+
+def data_to_dictionary(buf, fs):
+    # How the original converter read records: split the whole text and
+    # pair up keys and values.
+    s = buf.split(fs)
+    keys = s[::2]
+    vals = s[1::2]
+    assert len(keys) == len(vals)
+    return dict(list(zip(keys, vals)))
+
+def original_page_record(data):
+    # The original converter read the file as text; newline='' keeps its
+    # line endings, which the line handlers treat alike.
+    page = data_to_dictionary(data.decode('cp1252'), FS1)
+    section = data_to_dictionary(page['text_default'], FS2)
+    return data_to_dictionary(section['data'], FS3)['text'], section['ts']
+
+def shuffled_record(rng, fields, fs):
+    # A record with the given fields in random order, some extra ones, and
+    # now and then a key given twice with the real value last.
+    fields = list(fields.items())
+    fields.extend((f'extra{n}', rng.choice(['', 'x', FS + 'y', '0'])) for n in range(rng.randint(0, 3)))
+    rng.shuffle(fields)
+    if rng.random() < 0.3:
+        key, value = rng.choice(fields)
+        fields.insert(0, (key, 'stale'))
+    return fs.join(f'{key}{fs}{value}' for key, value in fields)
+
+def generated_records(seed):
+    rng = random.Random(seed)
+    names = fakewiki.make_page_names(rng, 20)
+    generator = fakewiki.TextGenerator(rng, names, fakewiki.INTERMAP_SITES[:4], 0.1, 0.2, 0.1, 0.1)
+    records = []
+    for n in range(300):
+        text = generator.page(rng.choice([0, 50, 2000]))
+        text = rng.choice([text, text.replace('\n', '\r\n'), text + FS + 'x', 'é€' + text])
+        ts = str(rng.choice([1000000000, 1234567890.5]))
+        if n % 2:
+            records.append(fakewiki.encode_page(text, ts).encode('cp1252'))
+        else:
+            data = shuffled_record(rng, {'text': text, 'minor': '0'}, FS3)
+            section = shuffled_record(rng, {'ts': ts, 'data': data, 'name': 'text_default'}, FS2)
+            records.append(shuffled_record(rng, {'text_default': section, 'version': '3'}, FS1).encode('cp1252'))
+    return records
+
+def test_parser_matches_original_records():
+    for data in generated_records(6):
+        expected = original_page_record(data)
+        assert tuple(parse_page_record(data)) == expected
+        assert tuple(parse_page_record(bytearray(data))) == expected
+
+@pytest.mark.parametrize('threshold', [0, pages.page_mmap_threshold])
+def test_read_page_file_matches_original(tmp_path, monkeypatch, threshold):
+    monkeypatch.setattr(pages, 'page_mmap_threshold', threshold)
+    page_file = tmp_path / 'Page.db'
+    for data in generated_records(7)[:50]:
+        page_file.write_bytes(data)
+        assert tuple(read_page_file(page_file)) == original_page_record(data)
+
+def test_mmap_is_parsed_like_bytes(tmp_path):
+    data = generated_records(8)[1]
+    page_file = tmp_path / 'Page.db'
+    page_file.write_bytes(data)
+    with open(page_file, 'rb') as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        assert parse_page_record(buf) == parse_page_record(data)
+
+def test_crlf_page_converts_like_the_original(tmp_path):
+    page_file = tmp_path / 'page' / 'A' / 'AlphaPage.db'
+    page_file.parent.mkdir(parents=True)
+    text = "First line\r\nsecond ''em''\r\n* item\r\n* item2\r\n\r\n||a||b||\r\n old\rmac\r\n = H =\r\nend"
+    page_file.write_bytes(fakewiki.encode_page(text, 1000000000).encode('cp1252'))
+    post = Converter(intermap={}).convert_page_file(page_file)
+    assert post.markdown == ('First line\nsecond *em*\n\n* item\n* item2\n\n\n|-|-|\n|a|b|\n     old\nmac\n'
+                             '# H\n\n\nend\n')
+
+@pytest.mark.parametrize('data, problem', [
+    ('', 'page record has a key without a value'),
+    (f'version{FS1}3', 'page record has no text_default field'),
+    (f'text_default{FS1}ts{FS2}1{FS2}data', 'text_default section record has a key without a value'),
+    (f'text_default{FS1}ts{FS2}1', 'text_default section record has no data field'),
+    (f'text_default{FS1}ts{FS2}1{FS2}data{FS2}minor{FS3}0', 'data record has no text field'),
+    (f'text_default{FS1}data{FS2}text{FS3}x', 'text_default section record has no ts field'),
+    (f'text_default{FS1}ts{FS2}soon{FS2}data{FS2}text{FS3}x', "invalid timestamp 'soon'"),
+])
+def test_malformed_records(data, problem):
+    with pytest.raises(PageFormatError) as e:
+        parse_page_record(data.encode('cp1252'), 'Page.db')
+    assert e.value.problem == problem
+    assert str(e.value) == f'Malformed UseMod page file Page.db: {problem}'
+
+def original_walk(input_dir, use_subpages):
+    # How the original converter walked the page directory.
+    files = []
+    for letter_dir in (input_dir / 'page').resolve().iterdir():
+        if letter_dir.is_dir():
+            for page_item in letter_dir.iterdir():
+                if page_item.is_file():
+                    files.append(page_item)
+                elif page_item.is_dir() & use_subpages:
+                    files.extend(page_item.iterdir())
+    return files
+
+@pytest.mark.parametrize('use_subpages', [True, False])
+def test_walk_matches_original(make_wiki, use_subpages):
+    wiki = make_wiki(pages=60, subpage_ratio=0.5)
+    # Things the walk must step over or take as they come: a stray file in
+    # page/, a letter directory for non-letters, an empty parent page.
+    (wiki / 'page' / 'stray.txt').write_text('')
+    (wiki / 'page' / 'other').mkdir(exist_ok=True)
+    (wiki / 'page' / 'other' / '2024Page.db').write_bytes(fakewiki.encode_page('Text', 1700000000).encode('cp1252'))
+    (wiki / 'page' / 'E' / 'EmptyParent').mkdir(parents=True)
+    expected = original_walk(wiki, use_subpages)
+    assert any(file.parent.parent.name != 'page' for file in expected) == use_subpages
+    entries = list(pages.iter_pages(wiki, use_subpages))
+    assert sorted(entry.path for entry in entries) == sorted(expected)
+    assert sorted(pages.iter_page_files(wiki, use_subpages)) == sorted(expected)
+    assert pages.count_page_files(wiki, use_subpages) == len(expected)
+    for entry in entries:
+        assert entry.page_id == entry.path.stem
+        assert entry.parent_id == pages.page_parent_id(entry.path)
@@ -0,0 +1,59 @@
+import json
+
+from usemod_to_markdown.pages import count_page_files
+from usemod_to_markdown.profiling import Profiler
+
+from conftest import read_tree
+
+# Passes that each page either runs or skips by trigger.
+PAGE_PASSES = ['raw_html', 'nowiki', 'pre', 'html_pairs', 'html_singles', 'toc', 'html_amp', 'html_lt',
+               'html_gt', 'horizontal_rule', 'list_start', 'adjacent_lists', 'adjacent_numbered_lists',
+               'em_tag', 'strong_tag', 'inline_links', 'lines', 'restore']
+
+def counts(report):
+    # The parts of a report that don't depend on timing.
+    return {item['name']: (item['calls'], item['matches'], item['size_change'], item['skipped'])
+            for item in report['passes']}
+
+def test_profile_report(make_wiki, run_cli, tmp_path):
+    wiki = make_wiki(pages=30)
+    pages = count_page_files(wiki)
+    run_cli(wiki, tmp_path / 'plain')
+    run_cli(wiki, tmp_path / 'serial', '--profile', tmp_path / 'serial.json', '--profile-top', 3)
+    run_cli(wiki, tmp_path / 'pooled', '--profile', tmp_path / 'pooled.json', '--profile-top', 3, '--jobs', 2)
+    serial = json.loads((tmp_path / 'serial.json').read_text())
+    pooled = json.loads((tmp_path / 'pooled.json').read_text())
+    # Profiling doesn't change the output.
+    assert read_tree(tmp_path / 'serial') == read_tree(tmp_path / 'plain')
+    assert read_tree(tmp_path / 'pooled') == read_tree(tmp_path / 'plain')
+    for report in (serial, pooled):
+        assert report['pages'] == pages
+        passes = {item['name']: item for item in report['passes']}
+        for name in PAGE_PASSES:
+            assert passes[name]['calls'] + passes[name]['skipped'] == pages, name
+        assert [item['seconds'] for item in report['passes']] == sorted(
+            (item['seconds'] for item in report['passes']), reverse=True)
+        slowest = report['slowest_pages']
+        assert len(slowest) == 3
+        assert [page['seconds'] for page in slowest] == sorted((page['seconds'] for page in slowest), reverse=True)
+    # The workers' profiles add up to the serial one.
+    assert counts(pooled) == counts(serial)
+    assert pooled['skipped_only'] == serial['skipped_only']
+
+def test_merge_adds_up():
+    records = [('a', 0.5, 3, 10), ('b', 0.25, None, -4), ('a', 0.125, 1, 2), ('c', 1.0, 0, 0)]
+    pages = [('P1', 0.5, 100), ('P2', 2.0, 50), ('P3', 1.0, 10), ('P4', 0.25, 5)]
+    whole = Profiler(2)
+    parts = [Profiler(2), Profiler(2)]
+    for n, record in enumerate(records):
+        whole.record_pass(*record)
+        parts[n % 2].record_pass(*record)
+    for n, page in enumerate(pages):
+        whole.record_page(*page)
+        parts[n % 2].record_page(*page)
+    merged = Profiler(2)
+    for part in parts:
+        merged.merge(json.loads(json.dumps(part.data())))
+    assert merged.report({'b': 1, 'd': 2}) == whole.report({'b': 1, 'd': 2})
+    assert [page['page'] for page in whole.report({})['slowest_pages']] == ['P2', 'P3']
+    assert whole.report({'d': 2})['skipped_only'] == {'d': 2}
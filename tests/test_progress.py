@@ -0,0 +1,98 @@
+import io
+import re
+
+import pytest
+
+from usemod_to_markdown import progress
+from usemod_to_markdown.pages import iter_page_files
+from usemod_to_markdown.progress import Progress, format_duration
+
+class Terminal(io.StringIO):
+    def isatty(self):
+        return True
+
+@pytest.fixture
+def clock(monkeypatch):
+    # A perf_counter that only moves when told to.
+    now = [100.0]
+    monkeypatch.setattr(progress.time, 'perf_counter', lambda: now[0])
+    def advance(seconds):
+        now[0] += seconds
+    return advance
+
+def test_summary_lines(clock):
+    stream = io.StringIO()
+    report = Progress(stream=stream, interval=5)
+    report.begin(40)
+    for _ in range(4):
+        clock(1)
+        report.page_done()
+    clock(1)
+    report.page_done()
+    for _ in range(5):
+        clock(1)
+        report.page_done()
+    report.finish()
+    assert stream.getvalue().splitlines() == [
+        '5/40 pages, 1.0 pages/s, ETA 35s',
+        '10/40 pages, 1.0 pages/s, ETA 30s',
+        '10 pages converted in 10s, 1.0 pages/s',
+    ]
+
+def test_summary_without_total(clock):
+    stream = io.StringIO()
+    report = Progress(stream=stream, interval=0)
+    clock(0.5)
+    report.page_done()
+    assert stream.getvalue() == '1 pages, 2.0 pages/s\n'
+
+def test_terminal_line_is_rewritten(clock):
+    stream = Terminal()
+    report = Progress(stream=stream)
+    assert report.interval == 0.5
+    report.begin(3)
+    clock(1)
+    report.page_done()
+    report.print('A message')
+    clock(1)
+    report.page_done()
+    report.finish()
+    assert stream.getvalue() == ('\r1/3 pages, 1.0 pages/s, ETA 2s\x1b[K'
+                                 '\r\x1b[KA message\n'
+                                 '\r2/3 pages, 1.0 pages/s, ETA 1s\x1b[K'
+                                 '\r2 pages converted in 2s, 1.0 pages/s\x1b[K\n')
+
+def test_nothing_shown_without_pages():
+    stream = Terminal()
+    Progress(stream=stream).finish()
+    assert stream.getvalue() == ''
+
+def test_files_style():
+    stream = io.StringIO()
+    report = Progress('files', stream=stream)
+    report.start_page('page/A/APage.db')
+    report.page_done()
+    report.finish()
+    assert stream.getvalue() == 'Converting file page/A/APage.db\n'
+
+@pytest.mark.parametrize('seconds, text', [(0, '0s'), (59.4, '59s'), (59.6, '1m00s'), (754, '12m34s'),
+                                           (3600, '1h00m'), (7 * 3600 + 65, '7h01m')])
+def test_format_duration(seconds, text):
+    assert format_duration(seconds) == text
+
+@pytest.mark.parametrize('style', ['line', 'files'])
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_cli_progress(make_wiki, run_cli, capsys, tmp_path, style, jobs):
+    wiki = make_wiki()
+    run_cli(wiki, tmp_path / 'out', '--progress', style, '--jobs', jobs)
+    lines = capsys.readouterr().out.splitlines()
+    page_files = list(iter_page_files(wiki))
+    if style == 'files':
+        assert sorted(line for line in lines if line.startswith('Converting file ')) == \
+            sorted(f'Converting file {page_file}' for page_file in page_files)
+    else:
+        # Captured output isn't a terminal, so with the 10 second interval
+        # only the final line is shown.
+        summaries = [line for line in lines if ' pages' in line and 'pages/s' in line]
+        assert len(summaries) == 1
+        assert re.fullmatch(rf'{len(page_files)} pages converted in \d+s, [\d.]+ pages/s', summaries[0])
@@ -0,0 +1,74 @@
+import pathlib
+import random
+import re
+import sys
+import time
+
+import pytest
+
+from usemod_to_markdown import Converter
+from usemod_to_markdown.dialect import html_pairs_pattern, html_single_pattern
+from usemod_to_markdown.scanners import Scanner
+
+sys.path.insert(0, str(pathlib.Path(__file__).resolve().parent.parent / 'bench'))
+from adversarial import CONFIG, adversarial_pages
+
+# The patterns the scanners and the list fix replaced.
+ORIGINAL_PATTERNS = {
+    'raw_html': re.compile(r'<html>((.|\n)*?)</html>'),
+    'nowiki': re.compile(r'&lt;nowiki&gt;((.|\n)*?)&lt;/nowiki&gt;'),
+    'pre': re.compile(r'&lt;(pre|code)&gt;((.|\n)*?)&lt;/\1&gt;'),
+    'html_link': re.compile(r'&lt;A(\s.+?)&gt;(.*?)&lt;/A&gt;', re.I),
+    'list_start': re.compile(r'^(?!\*)(.*\S.*)\n\*', re.MULTILINE),
+}
+ORIGINAL_HTML_TAGS = dict(
+    ORIGINAL_PATTERNS,
+    html_pairs=re.compile(rf'&lt;({html_pairs_pattern})(\s.*?)?&gt;(.*?)&lt;/\1&gt;', re.I),
+    html_singles=re.compile(rf'&lt;({html_single_pattern})(\s.*?)?/?&gt;', re.I))
+ORIGINAL_NO_HTML_TAGS = dict(
+    ORIGINAL_PATTERNS,
+    html_pairs=re.compile(r'&lt;(b|i|strong|em)(\s.*?)?&gt;(.*?)&lt;/\1&gt;', re.I))
+
+# The block patterns had an extra group for (.|\n), which nothing used.
+USED_GROUPS = {'raw_html': 1, 'nowiki': 1, 'pre': 2}
+TEMPLATES = {'html_pairs': r'<\1\2>\3</\1>', 'html_singles': r'<\1\2>', 'list_start': r'\1\n\n*'}
+
+FRAGMENTS = [
+    '&lt;', '&gt;', '&LT;', '&Gt;', '&lt;/', 'b', 'B', 'i', 'em', 'strong', 'big', 'br', 'p', 'P', 'a', 'A',
+    ' ', ' ', '\n', '\t', '/', 'x', 'pre', 'code', 'html', '<html>', '</html>', 'nowiki', '&lt;nowiki&gt;',
+    '&lt;/nowiki&gt;', '&lt;pre&gt;', '&lt;/pre&gt;', '&lt;code&gt;', '&lt;/code&gt;', '&lt;b&gt;', '&lt;/b&gt;',
+    '&lt;/B&gt;', '&lt;A href="x"&gt;', '&lt;/a&gt;', '*', '\n*', 'ſ', 's', 'S', 'K', 'k', 'K', 'blockquote',
+    'h1', '&lt;A ', '&lt;A &gt;', '&lt;b &gt;', '&lt;s&gt;', '&lt;/ſ&gt;', '&lt;ſ&gt;', '&lt;/s&gt;', '&lt;/S&gt;',
+    '&lt;strike ', '&lt;/ſtrike&gt;', '&lt;br/&gt;', '&lt;br /&gt;', '=', '"',
+]
+
+def corpus(count=3000, seed=22):
+    rng = random.Random(seed)
+    return [''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(0, 40))) for _ in range(count)]
+
+def group_replacement(name):
+    groups = USED_GROUPS.get(name)
+    return lambda m: f'[{m.groups()[:groups]}|{m[0]}]'
+
+@pytest.mark.parametrize('config, originals', [({'HtmlTags': 1}, ORIGINAL_HTML_TAGS),
+                                               ({'HtmlTags': 0}, ORIGINAL_NO_HTML_TAGS)])
+def test_scanners_match_original_patterns(config, originals):
+    dialect = Converter(config=config, intermap={}).dialect
+    for text in corpus():
+        for name, original in originals.items():
+            new = getattr(dialect, name)
+            for repl in (group_replacement(name), TEMPLATES.get(name)):
+                if repl is not None:
+                    assert new.subn(repl, text) == original.subn(repl, text), (name, text)
+
+def test_scanner_is_abstract():
+    with pytest.raises(TypeError):
+        Scanner(re.compile('x'))
+
+@pytest.mark.parametrize('name, text', sorted(adversarial_pages(100000).items()))
+def test_adversarial_page_within_budget(name, text):
+    # bench/adversarial.py checks pages ten times the size against 5s.
+    converter = Converter(config=CONFIG, intermap={})
+    start = time.perf_counter()
+    converter.convert_text(text, 'AdversarialPage')
+    assert time.perf_counter() - start < 2.0
@@ -0,0 +1,64 @@
+import json
+import sqlite3
+
+import pytest
+
+import fakewiki
+from usemod_to_markdown.cli import search_indexes
+from usemod_to_markdown.pages import iter_page_files, post_path
+from usemod_to_markdown.search import JsonSearchIndex
+
+TEXT = 'Notes on the zyzzyva beetle, see [http://example.com/hiddenterm the zyzzyva site].'
+
+@pytest.fixture
+def known_page(make_wiki):
+    # A wiki with a page holding a known term, and the page's output path.
+    wiki = make_wiki()
+    page_file = sorted(iter_page_files(wiki))[3]
+    page_file.write_bytes(fakewiki.encode_page(TEXT, 1000000000).encode('cp1252'))
+    return wiki, post_path(page_file)
+
+def json_search(index, term):
+    # Looks a term up as a search script would.
+    documents = json.loads((index / 'documents.json').read_text(encoding='utf-8'))
+    prefix_length = json.loads((index / 'index.json').read_text(encoding='utf-8'))['prefix_length']
+    shard = index / 'terms' / f'{term[:prefix_length]}.json'
+    if not shard.exists():
+        return []
+    postings = json.loads(shard.read_text(encoding='utf-8')).get(term, [])
+    return [(documents[doc]['path'], count) for doc, count in postings]
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_json_index_finds_a_known_term(known_page, run_cli, tmp_path, jobs):
+    wiki, page_path = known_page
+    run_cli(wiki, tmp_path / 'out', '--search-index', tmp_path / 'index', '--jobs', jobs)
+    assert json_search(tmp_path / 'index', 'zyzzyva') == [(page_path, 2)]
+    # Link targets aren't indexed.
+    assert json_search(tmp_path / 'index', 'hiddenterm') == []
+
+class SpillingJsonSearchIndex(JsonSearchIndex):
+    # Spills its postings to a run every few pages.
+
+    def __init__(self, path):
+        super().__init__(path, max_postings=50)
+
+def test_json_index_spilled_to_runs_is_the_same(known_page, run_cli, tmp_path, monkeypatch):
+    wiki, page_path = known_page
+    run_cli(wiki, tmp_path / 'out', '--search-index', tmp_path / 'index')
+    monkeypatch.setitem(search_indexes, 'json', SpillingJsonSearchIndex)
+    run_cli(wiki, tmp_path / 'out2', '--search-index', tmp_path / 'spilled')
+    for path in (tmp_path / 'index').rglob('*.json'):
+        assert (tmp_path / 'spilled' / path.relative_to(tmp_path / 'index')).read_bytes() == path.read_bytes()
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_sqlite_index_finds_a_known_term(known_page, run_cli, tmp_path, jobs):
+    wiki, page_path = known_page
+    index = tmp_path / 'search.db'
+    run_cli(wiki, tmp_path / 'out', '--search-index', index, '--search-index-format', 'sqlite', '--jobs', jobs)
+    db = sqlite3.connect(index)
+    try:
+        assert db.execute("SELECT path, title FROM search WHERE search MATCH 'zyzzyva'").fetchall() == [
+            (page_path, page_path[:-3].split('/')[-1])]
+        assert db.execute("SELECT path FROM search WHERE search MATCH 'hiddenterm'").fetchall() == []
+    finally:
+        db.close()
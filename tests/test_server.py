@@ -0,0 +1,60 @@
+import http.client
+import threading
+
+import pytest
+
+from usemod_to_markdown import Converter
+from usemod_to_markdown.dialect import Dialect
+from usemod_to_markdown.server import ConversionServer, PageCache
+
+def start_server(converter, tmp_path):
+    (tmp_path / 'page').mkdir()
+    cache = PageCache(converter, 4)
+    server = ConversionServer(('127.0.0.1', 0), converter, tmp_path, cache)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+@pytest.fixture
+def server(tmp_path):
+    converter = Converter(intermap={}, page_index=['Page'], warn_broken_links=True, supress_msgs=True,
+                          on_message=lambda msg: None)
+    server = start_server(converter, tmp_path)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def failing_server(tmp_path):
+    # RawHtml without HTML in the output makes every page an error.
+    converter = Converter(config={'RawHtml': 1}, intermap={}, html_allowed=False, supress_msgs=True)
+    server = start_server(converter, tmp_path)
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def post(server, text, page_id='Page'):
+    connection = http.client.HTTPConnection('127.0.0.1', server.server_port)
+    connection.request('POST', f'/convert?page_id={page_id}', text.encode('utf-8'))
+    response = connection.getresponse()
+    return response.status, response.read().decode('utf-8')
+
+def test_convert_keeps_no_totals(server):
+    converter = server.converter
+    for n in range(3):
+        status, _ = post(server, f'[[Missing {n}]]')
+        assert status == 200
+    assert converter.broken_links == [] and converter.warnings == 0 and not converter.pass_skips
+    assert server.cache.stats()['warnings'] == 3
+
+def test_name_caches_are_bounded(server, monkeypatch):
+    monkeypatch.setattr(Dialect, 'name_cache_limit', 10)
+    for n in range(5):
+        post(server, ' '.join(f'[[Page {n} {m}]]' for m in range(20)))
+        assert server.converter.dialect.cache_size() <= 10
+
+def test_conversion_error_is_a_500(failing_server):
+    for n in range(2):
+        status, body = post(failing_server, '<html>raw</html>')
+        assert status == 500
+        assert 'ValueError: Raw HTML block encountered' in body
@@ -0,0 +1,38 @@
+import json
+import time
+
+import pytest
+
+from usemod_to_markdown import Converter
+from usemod_to_markdown.pages import iter_page_files, post_path
+from usemod_to_markdown.supervise import exit_status_errors, exit_status_timeouts, timeouts_supported
+
+from conftest import read_tree
+
+@pytest.mark.skipif(not timeouts_supported(), reason='needs interval timers')
+def test_failing_pages_are_quarantined(make_wiki, run_cli, capsys, tmp_path, monkeypatch):
+    wiki = make_wiki()
+    run_cli(wiki, tmp_path / 'plain')
+    failing, slow = sorted(iter_page_files(wiki))[2:4]
+    convert_page_record = Converter.convert_page_record
+    def misbehaving_convert_page_record(self, page_file, record, log):
+        if page_file == failing:
+            raise RuntimeError('conversion failed')
+        if page_file == slow:
+            time.sleep(5)
+        return convert_page_record(self, page_file, record, log)
+    monkeypatch.setattr(Converter, 'convert_page_record', misbehaving_convert_page_record)
+    report = tmp_path / 'quarantine.json'
+    with pytest.raises(SystemExit) as exit:
+        run_cli(wiki, tmp_path / 'out', '--page-timeout', '0.2', '--quarantine-report', report)
+    assert exit.value.code == exit_status_errors + exit_status_timeouts
+    assert '2 pages quarantined: 1 failed with errors, 1 timed out' in capsys.readouterr().out
+    pages = json.loads(report.read_text(encoding='utf-8'))['pages']
+    assert sorted((page['file'], page['stage'], page['kind'], page['error']) for page in pages) == sorted([
+        (str(failing), 'convert', 'error', 'RuntimeError: conversion failed'),
+        (str(slow), 'convert', 'timeout', 'Took longer than 0.2s')])
+    # Every other page was converted as usual.
+    expected = read_tree(tmp_path / 'plain')
+    for page_file in (failing, slow):
+        del expected[post_path(page_file)]
+    assert read_tree(tmp_path / 'out') == expected
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+import fakewiki
+from usemod_to_markdown import Converter, converter
+
+CONFIGS = [
+    {'FreeLinks': 1, 'WikiLinks': 1, 'BracketText': 1, 'HtmlTags': 1, 'RawHtml': 1, 'HtmlLinks': 1},
+    {'FreeLinks': 1, 'WikiLinks': 1, 'BracketText': 1, 'BracketWiki': 1, 'HtmlTags': 0},
+    {'FreeLinks': 0, 'WikiLinks': 1, 'BracketText': 0, 'SimpleLinks': 1, 'RawHtml': 0},
+]
+INTERMAP = {'Wiki': 'https://example.com/wiki/'}
+
+# Pieces of the markup the triggers look for, whole and cut short.
+FRAGMENTS = [
+    '<html>', '</html>', '<html', '&', '&amp;', '&lt;', '<', '>', '<nowiki>', '</nowiki>', '<nowiki',
+    '<pre>', '</pre>', '<code>', '</code>', '<b>', '</b>', '<br>', '<br/>', '<br', '<hr>', '<p>', '<font x=1>',
+    '</font>', '<A href="http://example.com/">', '</A>', '[[', ']]', '[', ']', 'Free Link', '|', 'Wiki:Page',
+    'http://example.com/', ':', 'WikiName', '#', 'anchor', '----', '---', '\n', '\n*', '\n#', '* ', '# ', '\n\n',
+    "''", "'''", '<em>', '<strong>', '<toc>', '\xb3', '\xb30\xb3', ' ', 'x', '||', '= H =',
+]
+
+def generated_pages(seed):
+    rng = random.Random(seed)
+    names = fakewiki.make_page_names(rng, 30)
+    generator = fakewiki.TextGenerator(rng, names, list(INTERMAP), 0.2, 0.15, 0.05, 0.1)
+    pages = [generator.page(rng.choice([100, 1500])) for _ in range(60)]
+    pages.extend(''.join(rng.choice(FRAGMENTS) for _ in range(rng.randint(1, 25))) for _ in range(1500))
+    return names, pages
+
+@pytest.mark.parametrize('config', CONFIGS)
+@pytest.mark.parametrize('scanner', [True, False])
+def test_skipping_passes_by_trigger_changes_nothing(monkeypatch, config, scanner):
+    names, pages = generated_pages(10)
+    def convert_all():
+        each = Converter(config=config, intermap=INTERMAP, inline_link_scanner=scanner, page_index=names[::2],
+                         on_message=lambda msg: None)
+        return [each.convert_text(text, 'Page', 'ParentPage' if n % 3 == 0 else None)
+                for n, text in enumerate(pages)], each
+    filtered, with_triggers = convert_all()
+    assert sum(with_triggers.pass_skips.values()) > len(pages)
+    # Every pass runs on every page.
+    monkeypatch.setattr(converter, 'pass_triggers', {})
+    unfiltered, without_triggers = convert_all()
+    assert set(without_triggers.pass_skips) <= {'line_emphasis'}
+    for text, expected, actual in zip(pages, unfiltered, filtered):
+        assert actual == expected, text
+    assert with_triggers.broken_links == without_triggers.broken_links
+    assert with_triggers.warnings == without_triggers.warnings
+
+def test_pages_cover_every_trigger():
+    # Between them, the configs and pages both run and skip every pass
+    # that has triggers, so the test above checks all of them.
+    names, pages = generated_pages(10)
+    skipped = set()
+    run = set()
+    for config in CONFIGS:
+        each = Converter(config=config, intermap=INTERMAP, inline_link_scanner=False, profile_top=1)
+        for text in pages:
+            each.convert_text(text, 'Page')
+        skipped |= set(each.pass_skips)
+        run |= set(each.profiler.passes)
+    assert set(converter.pass_triggers) <= skipped & run
@@ -0,0 +1,137 @@
+import os
+
+import pytest
+
+import fakewiki
+from usemod_to_markdown import Converter, read_config, read_intermap
+from usemod_to_markdown.cli import convert_wiki
+from usemod_to_markdown.output import DirectorySink
+from usemod_to_markdown.pages import post_path
+from usemod_to_markdown.watch import InotifyWatcher, PollingWatcher, WikiWatcher
+
+from conftest import read_tree
+
+@pytest.fixture
+def make_watcher(make_wiki, tmp_path):
+    # Builds a WikiWatcher over a generated wiki, after its first full
+    # conversion, the way --watch does.
+    watchers = []
+    def make(check_links=False):
+        wiki = make_wiki()
+        sink = DirectorySink(tmp_path / 'out', overwrite=True)
+        def load_converter():
+            return Converter(config=read_config(wiki / 'config'), intermap=read_intermap(wiki), supress_msgs=True)
+        def convert_all(converter):
+            convert_wiki(converter, wiki, sink, check_links=check_links)
+        watcher = WikiWatcher(wiki, sink, load_converter, convert_all, wiki / 'config', check_links)
+        watcher.rebuild()
+        watchers.append(watcher)
+        return watcher
+    yield make
+    for watcher in watchers:
+        watcher.watcher.close()
+
+def edit(page_file, text):
+    page_file.write_bytes(fakewiki.encode_page(text, 2000000000).encode('cp1252'))
+
+def output(watcher, page_file):
+    return watcher.sink.path / post_path(page_file)
+
+def mtimes(watcher):
+    return {path: path.stat().st_mtime_ns for path in watcher.sink.path.rglob('*.md')}
+
+def test_edited_page_is_reconverted(make_watcher):
+    watcher = make_watcher()
+    page_file = sorted(watcher.pages)[0]
+    before = mtimes(watcher)
+    edit(page_file, "Now ''edited''")
+    watcher.update({page_file})
+    assert output(watcher, page_file).read_text().endswith('\n\nNow *edited*\n')
+    # No other output was written.
+    after = mtimes(watcher)
+    del before[output(watcher, page_file)], after[output(watcher, page_file)]
+    assert after == before
+
+def test_deleted_page_output_is_removed(make_watcher):
+    watcher = make_watcher()
+    subpages = [page_file for page_file in watcher.pages if page_file.parent.parent != watcher.page_dir]
+    page_file = next(page_file for page_file in sorted(subpages) if len(list(page_file.parent.iterdir())) == 1)
+    page_file.unlink()
+    watcher.update({page_file})
+    assert page_file not in watcher.pages
+    assert not output(watcher, page_file).exists()
+    # The subpage's directory went with its last page.
+    assert not output(watcher, page_file).parent.exists()
+
+def test_new_directory_and_page_are_converted(make_watcher):
+    watcher = make_watcher()
+    page_file = watcher.input_dir / 'page' / 'Q' / 'QuitePage.db'
+    page_file.parent.mkdir()
+    edit(page_file, 'A new page')
+    # Only the directory is reported, as when the page is written before
+    # the directory is watched.
+    watcher.update({page_file.parent.resolve()})
+    assert page_file.resolve() in watcher.pages
+    assert output(watcher, page_file).read_text().endswith('\n\nA new page\n')
+    assert page_file.parent.resolve() in watcher.watched_dirs
+
+def test_added_page_with_link_checking_rebuilds(make_watcher):
+    watcher = make_watcher(check_links=True)
+    converter = watcher.converter
+    page_file = sorted(watcher.pages)[0].parent / 'ZanyPage.db'
+    edit(page_file, 'Linked from nowhere')
+    watcher.update({page_file})
+    assert watcher.converter is not converter
+    assert 'ZanyPage' in watcher.converter.page_index
+
+def test_config_change_rebuilds(make_watcher):
+    watcher = make_watcher()
+    page_file = sorted(watcher.pages)[0]
+    edit(page_file, 'A WikiName here')
+    watcher.update({page_file})
+    assert output(watcher, page_file).read_text().endswith('\n\nA [WikiName](../WikiName/) here\n')
+    with open(watcher.input_dir / 'config', 'a') as fh:
+        fh.write('$WikiLinks = 0;\n$FreeLinks = 0;\n')
+    before = read_tree(watcher.sink.path)
+    watcher.update({(watcher.input_dir / 'config').resolve()})
+    assert not watcher.converter.FreeLinks
+    assert output(watcher, page_file).read_text().endswith('\n\nA WikiName here\n')
+    after = read_tree(watcher.sink.path)
+    assert after.keys() == before.keys() and after != before
+
+def test_broken_links_are_reset_between_updates(make_watcher):
+    watcher = make_watcher(check_links=True)
+    page_file = sorted(watcher.pages)[0]
+    assert watcher.converter.broken_links
+    for n in range(3):
+        edit(page_file, f'Links to [[Missing Page {n}]] and [[Also Missing {n}]]')
+        watcher.update({page_file})
+        assert [link['target'] for link in watcher.converter.broken_links] == [f'Missing_Page_{n}', f'Also_Missing_{n}']
+
+def watchers():
+    kinds = [PollingWatcher(0.01)]
+    try:
+        kinds.append(InotifyWatcher())
+    except OSError:
+        pass
+    return kinds
+
+@pytest.mark.parametrize('watcher', watchers(), ids=lambda watcher: type(watcher).__name__)
+def test_watchers_report_changed_files(tmp_path, watcher):
+    page = tmp_path / 'Page.db'
+    page.write_bytes(b'old')
+    try:
+        watcher.add(tmp_path)
+        assert watcher.wait(0.05) == set()
+        page.write_bytes(b'new text')
+        stat = page.stat()
+        os.utime(page, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        (tmp_path / 'Other.db').write_bytes(b'')
+        changed = set()
+        for _ in range(10):
+            changed |= watcher.wait(0.05)
+        assert changed == {tmp_path / 'Page.db', tmp_path / 'Other.db'}
+        page.unlink()
+        assert watcher.wait(1) == {tmp_path / 'Page.db'}
+    finally:
+        watcher.close()
@@ -0,0 +1,14 @@
+"""
+Converts UseMod wiki pages to Markdown.
+
+The Converter does the conversion in-process; cli.main() is the
+usemod-to-markdown command line.
+"""
+
+from .converter import Converter, PageLog, read_config, read_intermap, usemod_config_defaults
+from .links import LinkGraph, PageLinks
+from .output import (Post, format_post, DirectorySink, StreamSink, TarSink, ZipSink, SqliteSink,
+                     JsonLinesSink)
+from .pages import (PageEntry, PageFormatError, PageRevision, iter_page_files, iter_pages, read_page_file,
+                    read_page_revisions)
+from .search import JsonSearchIndex, SqliteSearchIndex
@@ -0,0 +1,639 @@
+"""
+The usemod-to-markdown command line.
+"""
+
+import argparse
+import collections
+import json
+import multiprocessing
+import os
+import pathlib
+import sys
+import time
+
+import yaml
+
+from .converter import Converter, infer_page_links_relative, read_config, read_intermap
+from .history import export_history
+from .incremental import Manifest, settings_fingerprint
+from .links import LinkGraph, link_graph_writers
+from .output import DirectorySink, DiscardSink, JsonLinesSink, StreamSink, file_sinks
+from .pages import count_page_files, iter_page_files
+from .progress import Progress
+from .search import search_indexes
+from .server import serve
+from .supervise import Supervisor, format_failure, timeouts_supported
+from .watch import WikiWatcher
+
+def convert_wiki(converter, input_dir, sink, jobs=1, incremental=False, check_links=False, progress=None,
+                 supervisor=None):
+
+    if check_links:
+        page_index = converter.index_pages(input_dir)
+        if not converter.supress_msgs: print(f'Indexed {len(page_index)} pages')
+
+    pages = iter_page_files(input_dir, converter.UseSubpage)
+    manifest = None
+    if incremental:
+        # The manifest lives alongside the outputs, so this needs a
+        # DirectorySink.
+        manifest = Manifest(input_dir, sink.path, settings_fingerprint(converter, sink.yaml_dumper))
+        pages = manifest.changed_pages(pages, converter.broken_links)
+
+    if progress is not None:
+        # How many pages an incremental run converts is only known at the
+        # end.
+        progress.begin(None if incremental else count_page_files(input_dir, converter.UseSubpage))
+    page_count = 0
+    pages = ((0, page_file) for page_file in pages)
+    for _, page_file, timestamp, page_broken_links, _ in convert_pages([converter], [sink], pages, jobs, progress,
+                                                                       supervisor):
+        page_count = page_count + 1
+        if manifest is not None and timestamp is not None:
+            manifest.record(page_file, timestamp, page_broken_links)
+    if progress is not None:
+        progress.finish()
+
+    if not converter.supress_msgs and page_count:
+        print(f'Passes skipped by trigger, of {page_count} pages:')
+        for name, count in sorted(converter.pass_skips.items()):
+            print(f'  {name}: {count}')
+        print(f'Outputs: {format_output_counts(converter.outputs)}')
+
+    if manifest is not None:
+        manifest.remove_deleted_pages(converter.supress_msgs)
+        manifest.save()
+        if not converter.supress_msgs:
+            print(f'Incremental run: {manifest.converted} converted, {manifest.unchanged} unchanged, {manifest.removed} removed')
+
+def convert_pages(converters, sinks, pages, jobs, progress=None, supervisor=None, report_messages=True):
+    # Converts pages, given as (wiki, page file) where wiki indexes
+    # converters and sinks, yielding (wiki, page file, the page's UseMod
+    # timestamp or None if it was not written, its broken links, seconds
+    # spent) in page order. With a supervisor, pages that fail are recorded
+    # in it and yielded as not written, without broken links, and their logs
+    # are left out of the converters' totals. Without report_messages, the
+    # messages in the pages' logs and the worker summaries aren't printed.
+    report = print if progress is None else progress.print
+    if jobs == 1:
+        for wiki, page_file in pages:
+            if progress is not None: progress.start_page(page_file)
+            converter = converters[wiki]
+            log = converter.new_log()
+            start = time.perf_counter()
+            post, timestamp, failure = convert_page(converter, sinks[wiki], page_file, log, supervisor)
+            seconds = time.perf_counter() - start
+            if failure is None:
+                converter.add_log(log)
+            else:
+                supervisor.record(failure, wiki)
+            sinks[wiki].add_log(log)
+            if progress is not None: progress.page_done()
+            yield wiki, page_file, timestamp, log.broken_links if failure is None else [], seconds
+        return
+
+    # Workers build their own converters from the parent's settings, since
+    # they may not inherit them (e.g. with the 'spawn' start method). imap()
+    # returns results in page order, so messages come out as they would
+    # serially. Workers write to the sinks themselves if they allow that,
+    # otherwise they hand their posts back to be written here.
+    settings = [converter.settings() for converter in converters]
+    worker_sinks = [sink if sink.parallel_safe else None for sink in sinks]
+    worker_stats = {}
+    with multiprocessing.Pool(jobs, initializer=init_worker, initargs=(settings, worker_sinks, supervisor)) as pool:
+        for result in pool.imap(convert_page_job, pages, chunksize=8):
+            log = result.log
+            timestamp = result.timestamp
+            failure = result.failure
+            if result.post is not None:
+                written, failure = write_page(sinks[result.wiki], result.post, log, result.page_file, supervisor)
+                if not written:
+                    timestamp = None
+            if progress is not None: progress.start_page(result.page_file)
+            if report_messages:
+                for msg in log.messages:
+                    report(msg)
+            if progress is not None: progress.page_done()
+            stats = worker_stats.setdefault(result.pid, {'pages': 0, 'warnings': 0, 'seconds': 0.0})
+            stats['pages'] += 1
+            stats['warnings'] += log.warnings
+            stats['seconds'] += result.seconds
+            if failure is None:
+                converters[result.wiki].add_log(log)
+            else:
+                supervisor.record(failure, result.wiki)
+            sinks[result.wiki].add_log(log)
+            yield result.wiki, result.page_file, timestamp, log.broken_links if failure is None else [], result.seconds
+
+    if report_messages and not converters[0].supress_msgs:
+        for n, stats in enumerate(worker_stats.values(), 1):
+            report(f'Worker {n}: {stats["pages"]} pages, {stats["warnings"]} warnings, {stats["seconds"]:.2f}s')
+
+def convert_page(converter, sink, page_file, log, supervisor=None):
+    # Converts a page and writes it to sink, or if sink is None leaves that
+    # to the caller. Returns (the post, the page's timestamp or None if it
+    # was not written, None), or with a supervisor (None, None, PageFailure)
+    # if the page failed. Failures are reported in the log.
+    if supervisor is None:
+        post = converter.convert_page_file(page_file, log)
+    else:
+        post, failure = supervisor.convert_page(converter, page_file, log)
+        if failure is not None:
+            log.report(format_failure(failure))
+            return None, None, failure
+    if sink is None:
+        return post, post.timestamp, None
+    written, failure = write_page(sink, post, log, page_file, supervisor)
+    return post, post.timestamp if written else None, failure
+
+def write_page(sink, post, log, page_file, supervisor=None):
+    # Returns whether the post was written, and with a supervisor the
+    # PageFailure if writing it failed.
+    if supervisor is None:
+        return sink.write(post, log), None
+    written, failure = supervisor.write_page(sink, post, log, page_file)
+    if failure is not None:
+        log.report(format_failure(failure))
+    return written, failure
+
+# The converters and sinks of a worker process, one per wiki, and the
+# supervisor if any, set up by init_worker.
+worker_converters = None
+worker_sinks = None
+worker_supervisor = None
+
+def init_worker(settings, sinks, supervisor):
+    global worker_converters
+    global worker_sinks
+    global worker_supervisor
+    worker_converters = [Converter(**wiki_settings) for wiki_settings in settings]
+    worker_sinks = sinks
+    worker_supervisor = supervisor
+
+PageJobResult = collections.namedtuple('PageJobResult', 'wiki page_file timestamp post pid seconds log failure')
+
+def convert_page_job(job):
+    # Runs in a worker process. Returns the page's timestamp, log and
+    # failure if any, along with the worker's pid and the time spent.
+    # Without a sink the post is returned too, for the parent to write.
+    wiki, page_file = job
+    converter = worker_converters[wiki]
+    sink = worker_sinks[wiki]
+    log = converter.new_log()
+    start = time.perf_counter()
+    post, timestamp, failure = convert_page(converter, sink, page_file, log, worker_supervisor)
+    if sink is not None:
+        post = None
+    return PageJobResult(wiki, page_file, timestamp, post, os.getpid(), time.perf_counter() - start, log, failure)
+
+def collect_link_graph(converter, input_dir, jobs=1, supervisor=None):
+    # The first pass of --backlinks-front-matter: converts every page of the
+    # wiki without writing it, and returns the link graph. The converter
+    # should have no on_message, as the pages' messages are left to the
+    # second pass. Pages that fail with a supervisor are skipped, to be
+    # quarantined by the second pass.
+    converter.link_graph = LinkGraph()
+    pages = ((0, page_file) for page_file in iter_page_files(input_dir, converter.UseSubpage))
+    quiet_supervisor = None if supervisor is None else Supervisor(supervisor.time_limit)
+    for _ in convert_pages([converter], [DiscardSink()], pages, jobs, supervisor=quiet_supervisor,
+                           report_messages=False):
+        pass
+    return converter.link_graph
+
+def write_link_outputs(link_graph, args, home_page):
+    # Writes the backlinks, orphan report and graph export asked for on the
+    # command line.
+    if args.backlinks:
+        link_graph.write_backlinks(args.backlinks)
+        if not args.silent: print(f'Backlinks written to {args.backlinks}')
+    if args.orphan_report:
+        orphans = link_graph.write_orphan_report(args.orphan_report, home_page)
+        if not args.silent: print(f'{len(orphans)} orphan pages, report written to {args.orphan_report}')
+    if args.link_graph:
+        link_graph_writers[args.link_graph_format](link_graph, args.link_graph)
+        if not args.silent: print(f'Link graph of {len(link_graph.sources)} links written to {args.link_graph}')
+
+def format_output_counts(outputs):
+    return f'{outputs["written"]} written, {outputs["unchanged"]} unchanged, {outputs["skipped"]} skipped'
+
+def finish_supervised_run(supervisor, report_path, wiki_names=None):
+    # Writes the quarantine report if asked for, and exits with a status
+    # saying what kinds of failures there were, if any. The failures are
+    # printed even with --silent, like warnings.
+    failures = len(supervisor.failures)
+    if report_path:
+        supervisor.write_report(report_path, wiki_names)
+    if failures:
+        counts = supervisor.counts()
+        print(f'{failures} pages quarantined: {counts["error"]} failed with errors, {counts["timeout"]} timed out')
+        for wiki, failure in supervisor.failures:
+            prefix = '' if wiki_names is None else f'{wiki_names[wiki]}: '
+            print(f'  {prefix}{failure.page_file} ({failure.stage}): {failure.error}')
+        if report_path:
+            print(f'Quarantine report written to {report_path}')
+        sys.exit(supervisor.exit_status())
+
+def write_broken_link_report(path, converter):
+    broken_links = converter.broken_links
+    missing_pages = collections.Counter(link['target'] for link in broken_links)
+    report = {
+        'pages_indexed': len(converter.page_index),
+        'broken_links': broken_links,
+        'missing_pages': dict(missing_pages.most_common()),
+    }
+    with open(path, 'w', encoding='utf-8') as fh:
+        json.dump(report, fh, indent=2)
+
+# Batch mode
+#
+# With --batch, the input is a JSON manifest of wikis to convert in one
+# run: a list with an object per wiki, giving its data directory ("input")
+# and output ("output"), and optionally any of batch_wiki_options, named
+# like the command line options. Paths are relative to the manifest.
+# Options a wiki doesn't set come from the command line. Every wiki gets its
+# own converter, built from its own config and intermap, and the pages of
+# all of them go through one worker pool.
+
+batch_wiki_options = ['name', 'config_file', 'output_format', 'overwrite', 'write_if_changed', 'incremental',
+                      'page_link_prefix', 'page_link_suffix', 'page_links', 'warn_broken_links',
+                      'broken_link_style', 'broken_link_report', 'yaml_dumper', 'search_index',
+                      'search_index_format']
+batch_output_formats = ['dir', 'tar', 'zip', 'sqlite', 'jsonl']
+batch_path_options = ['config_file', 'broken_link_report', 'search_index']
+
+# A wiki being converted in batch mode: its options as an
+# argparse.Namespace like the command line's, and its page count and time.
+class BatchWiki:
+
+    def __init__(self, options):
+        self.options = options
+        self.name = options.name
+        self.input = options.input
+        self.converter = None
+        self.sink = None
+        self.manifest = None
+        self.pages = 0
+        self.seconds = 0.0
+
+def read_batch_manifest(path, args):
+    # Returns a BatchWiki for each wiki in the manifest, exiting with a
+    # message if it is invalid.
+    with open(path, encoding='utf-8') as fh:
+        entries = json.load(fh)
+    if not isinstance(entries, list):
+        sys.exit(f'Batch manifest {path} must hold a list of wikis.')
+    base = path.parent
+    wikis = []
+    for n, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict) or 'input' not in entry or 'output' not in entry:
+            sys.exit(f'Wiki {n} in batch manifest {path} needs an input and an output.')
+        unknown = set(entry) - set(batch_wiki_options) - {'input', 'output'}
+        if unknown:
+            sys.exit(f'Unknown options for wiki {n} in batch manifest {path}: {", ".join(sorted(unknown))}')
+        options = argparse.Namespace(**vars(args))
+        options.name = None
+        for key, value in entry.items():
+            setattr(options, key, value)
+        options.input = (base / entry['input']).resolve()
+        options.output_dir = base / entry['output']
+        for key in batch_path_options:
+            if entry.get(key):
+                setattr(options, key, base / entry[key])
+        if options.name is None:
+            options.name = options.input.name
+        if not (options.input / 'page').is_dir():
+            sys.exit(f'UseMod page directory not found for wiki {options.name}: {options.input}')
+        if options.output_format not in batch_output_formats:
+            sys.exit(f'Output format {options.output_format!r} of wiki {options.name} is not one of {", ".join(batch_output_formats)}.')
+        if options.incremental and options.output_format != 'dir':
+            sys.exit(f'An output directory is required for incremental conversion of wiki {options.name}.')
+        if options.broken_link_style not in (None, 'link', 'text', 'mark'):
+            sys.exit(f'Unknown broken link style {options.broken_link_style!r} for wiki {options.name}.')
+        if options.search_index_format not in search_indexes:
+            sys.exit(f'Unknown search index format {options.search_index_format!r} for wiki {options.name}.')
+        if options.search_index and options.incremental:
+            sys.exit(f'A search index can not be built by an incremental conversion, as for wiki {options.name}.')
+        wikis.append(BatchWiki(options))
+    return wikis
+
+def convert_batch(wikis, jobs=1, progress=None, supervisor=None):
+    # Converts the wikis from read_batch_manifest, then prints a summary of
+    # each.
+    for wiki in wikis:
+        options = wiki.options
+        config_file = pathlib.Path(options.config_file) if options.config_file else wiki.input / 'config'
+        wiki.converter = make_converter(options, read_config(config_file.resolve()), read_intermap(wiki.input),
+                                        None if progress is None else progress.print)
+        if options.warn_broken_links or options.broken_link_style or options.broken_link_report:
+            wiki.converter.index_pages(wiki.input)
+        wiki.sink = open_sink(options.output_format, options.output_dir,
+                              options.overwrite or options.write_if_changed or options.incremental,
+                              options.write_if_changed)
+        wiki.sink.yaml_dumper = options.yaml_dumper
+        if options.incremental:
+            wiki.manifest = Manifest(wiki.input, wiki.sink.path, settings_fingerprint(wiki.converter, wiki.sink.yaml_dumper))
+        if options.search_index:
+            wiki.converter.search_index = open_search_index(options.search_index, options.search_index_format,
+                                                            options.overwrite, options.output_dir)
+
+    def batch_pages():
+        for n, wiki in enumerate(wikis):
+            pages = iter_page_files(wiki.input, wiki.converter.UseSubpage)
+            if wiki.manifest is not None:
+                pages = wiki.manifest.changed_pages(pages, wiki.converter.broken_links)
+            for page_file in pages:
+                yield n, page_file
+
+    if progress is not None:
+        total = None
+        if not any(wiki.manifest for wiki in wikis):
+            total = sum(count_page_files(wiki.input, wiki.converter.UseSubpage) for wiki in wikis)
+        progress.begin(total)
+    converters = [wiki.converter for wiki in wikis]
+    sinks = [wiki.sink for wiki in wikis]
+    try:
+        for n, page_file, timestamp, page_broken_links, seconds in convert_pages(converters, sinks, batch_pages(), jobs,
+                                                                                 progress, supervisor):
+            wiki = wikis[n]
+            wiki.pages = wiki.pages + 1
+            wiki.seconds = wiki.seconds + seconds
+            if wiki.manifest is not None and timestamp is not None:
+                wiki.manifest.record(page_file, timestamp, page_broken_links)
+    finally:
+        for sink in sinks:
+            sink.close()
+    if progress is not None:
+        progress.finish()
+
+    supress_msgs = wikis[0].options.silent
+    for n, wiki in enumerate(wikis):
+        converter = wiki.converter
+        summary = (f'{wiki.name}: {wiki.pages} pages in {wiki.seconds:.2f}s, {converter.warnings} warnings, '
+                   f'{len(converter.broken_links)} broken links, outputs {format_output_counts(converter.outputs)}')
+        if supervisor is not None:
+            summary = f'{summary}, {sum(1 for failed, _ in supervisor.failures if failed == n)} quarantined'
+        if wiki.manifest is not None:
+            wiki.manifest.remove_deleted_pages(supress_msgs)
+            wiki.manifest.save()
+            summary = f'{summary}, {wiki.manifest.unchanged} unchanged, {wiki.manifest.removed} removed'
+        if wiki.options.broken_link_report:
+            write_broken_link_report(wiki.options.broken_link_report, converter)
+        if converter.search_index is not None:
+            converter.search_index.close()
+        if not supress_msgs: print(summary)
+
+def make_converter(options, config, intermap, on_message=None, page_links_relative=None, record_links=False,
+                   backlinks=None):
+    # A converter for the command line options, or a batch wiki's. The page
+    # link style is inferred from the prefix unless given. With a search
+    # index, the converter makes the search entries for it, but the index
+    # itself is opened separately, as is the link graph with record_links.
+    if page_links_relative is None and options.page_links:
+        page_links_relative = options.page_links == 'rel'
+    search_entries = None
+    if options.search_index:
+        search_entries = search_indexes[options.search_index_format].entry_kind
+    return Converter(
+        config=config,
+        intermap=intermap,
+        page_link_prefix=options.page_link_prefix,
+        page_link_suffix=options.page_link_suffix,
+        page_links_relative=page_links_relative,
+        warn_broken_links=options.warn_broken_links,
+        broken_link_style=options.broken_link_style or 'link',
+        profile_top=options.profile_top if options.profile else None,
+        supress_msgs=options.silent,
+        debug_format=options.debug,
+        on_message=on_message,
+        search_entries=search_entries,
+        record_links=record_links,
+        backlinks=backlinks,
+        inline_link_scanner=not options.link_passes)
+
+def open_sink(output_format, output, overwrite, if_changed=False):
+    # The sink writing to an output directory or file. if_changed only
+    # applies to directories.
+    if output_format == 'dir':
+        output.mkdir(parents=True, exist_ok=True)
+        return DirectorySink(output, overwrite, if_changed)
+    if output.exists() and not overwrite:
+        sys.exit(f'Output file exists, will not overwrite: {output}')
+    return file_sinks[output_format](output)
+
+def open_search_index(path, index_format, overwrite, output=None):
+    # The search index to build at path, in the format given by
+    # --search-index-format. It can't share a file with the output.
+    path = pathlib.Path(path)
+    if output is not None and path.resolve() == pathlib.Path(output).resolve():
+        sys.exit(f'The search index needs a file or directory of its own, not the output: {path}')
+    existing = path / 'index.json' if index_format == 'json' else path
+    if existing.exists() and not overwrite:
+        sys.exit(f'Search index exists, will not overwrite: {path}')
+    return search_indexes[index_format](path)
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Convert UseMod wiki pages to Markdown.',
+        epilog="""
+            Converting a single file does not provide reliable conversion, and
+            is mostly useful for debugging.""")
+    parser.add_argument('input', type=pathlib.Path, help='UseMod data directory, a single UseMod page file, or with --batch a manifest of wikis.')
+    parser.add_argument('output_dir', type=pathlib.Path, help='Output directory, created if missing, or the output file for --output-format tar, zip or sqlite, or for jsonl and git (default: stdout). Required with directory input except for jsonl, disallowed with single-file input.', nargs='?')
+    parser.add_argument('--debug', help='Generate debug output.', action='store_true')
+    parser.add_argument('--silent', help='Suppress progress messages.', action='store_true')
+    parser.add_argument('--progress', choices=['line', 'files'], default='line', help='Show progress as a summary line with pages done, pages/sec and time remaining, updated at most every half second on a terminal and every 10 seconds otherwise (the default), or as a line for every file converted.')
+    parser.add_argument('--overwrite', help='Overwrite existing output file(s).', action='store_true')
+    parser.add_argument('--write-if-changed', help='Overwrite existing output files, but leave those that already hold what would be written alone, so that their modification times stay the same. Only for directory output. Implies --overwrite.', action='store_true')
+    parser.add_argument('--page-link-suffix', help='Suffix for all page link URLs.', default='/')
+    parser.add_argument('--page-link-prefix', help='Prefix for all page link URLs.', default='../')
+    parser.add_argument('--page-links', help='Indicates if page links will be absolute or relative. If relative, implicit sibling links from sub-pages get an extra "../" prefix.', choices=['rel','abs'])
+    parser.add_argument('--config-file', help='Overrides location of UseMod config file, or provides it for a single-file conversion.')
+    parser.add_argument('--incremental', help='Only convert pages whose source changed since the last incremental run, or all pages if the options, config or intermap changed. Outputs of deleted pages are removed. Implies --overwrite.', action='store_true')
+    parser.add_argument('--warn-broken-links', help='Warn about links to pages that do not exist in the wiki.', action='store_true')
+    parser.add_argument('--broken-link-style', choices=['link', 'text', 'mark'], help='How to render links to missing pages: as normal links (the default), as plain text, or as text followed by a "?" link, like UseMod does.')
+    parser.add_argument('--broken-link-report', type=pathlib.Path, metavar='FILE', help='Write a JSON report of links to missing pages to FILE.')
+    parser.add_argument('--profile', type=pathlib.Path, metavar='FILE', help='Write a JSON report of time, match count and size change per transformation pass, and the slowest pages, to FILE.')
+    parser.add_argument('--link-passes', help='Convert links by running each link pass over the page in turn, instead of finding them all in one scan. The output is the same, but slower; with --profile, the time of each link pass is then reported.', action='store_true')
+    parser.add_argument('--profile-top', type=int, default=10, metavar='N', help='Number of slowest pages listed in the profile report.')
+    parser.add_argument('--output-format', choices=['dir', 'tar', 'zip', 'sqlite', 'jsonl', 'git'], default='dir', help='Write a directory of Markdown files (the default), a tar or zip archive of them, a SQLite database with one row per page, JSON Lines with one object per page, or a git fast-import stream with a commit for every kept revision of every page.')
+    parser.add_argument('--git-branch', default='master', metavar='BRANCH', help='Branch the --output-format git commits go on (default: master).')
+    parser.add_argument('--yaml-dumper', choices=['builtin', 'c', 'python'], default='builtin', help="How front matter is written: by the script's own formatter (the default, falling back to PyYAML for unusual titles), or always by PyYAML's C or pure-Python dumper. The C dumper may fold very long titles differently, otherwise the output is the same.")
+    parser.add_argument('--serve', type=int, metavar='PORT', help='Instead of converting the wiki, serve converted pages over HTTP on PORT until interrupted. See the README for the URLs.')
+    parser.add_argument('--serve-host', default='127.0.0.1', metavar='HOST', help='Address the server listens on (default: 127.0.0.1, local connections only).')
+    parser.add_argument('--cache-size', type=int, default=256, metavar='N', help='Number of rendered pages the server keeps in its cache.')
+    parser.add_argument('--watch', help='After converting the wiki, keep watching it and reconvert pages as they change, until interrupted. A change to the intermap or config reconverts everything. Implies --overwrite.', action='store_true')
+    parser.add_argument('--watch-delay', type=float, default=1.0, metavar='SECONDS', help='How long --watch waits for a burst of edits to end before converting, and how often it polls where inotify is not available.')
+    parser.add_argument('--batch', help='Treat input as a JSON manifest of wikis to convert, each with its own data directory, output and options, sharing one pool of workers. See the README for the format.', action='store_true')
+    parser.add_argument('--search-index', type=pathlib.Path, metavar='PATH', help='Build a full-text search index of the converted pages while converting them, and write it to PATH: a directory for the json format, a database file for sqlite. Not available with --incremental.')
+    parser.add_argument('--search-index-format', choices=['json', 'sqlite'], default='json', help='Write the search index as JSON files, one per term prefix, for a static site search script (the default), or as a SQLite FTS5 table.')
+    parser.add_argument('--backlinks', type=pathlib.Path, metavar='FILE', help='Write a JSON file listing, for each page, the pages that link to it.')
+    parser.add_argument('--backlinks-front-matter', help="Add each page's backlinks to its front matter. This needs the whole link graph before anything is written, so the wiki is converted twice.", action='store_true')
+    parser.add_argument('--orphan-report', type=pathlib.Path, metavar='FILE', help='Write a JSON report of the pages no other page links to, apart from the home page, to FILE.')
+    parser.add_argument('--link-graph', type=pathlib.Path, metavar='FILE', help='Write the graph of links between pages to FILE, in the format given by --link-graph-format.')
+    parser.add_argument('--link-graph-format', choices=['json', 'edges'], default='json', help='Write the link graph as JSON, with a list of pages and a list of links between them (the default), or as an edge list with a tab-separated source and target page per line.')
+    parser.add_argument('--page-timeout', type=float, metavar='SECONDS', help='Convert pages in supervised mode, giving up on any page that takes longer than SECONDS to read and convert. Pages that time out or fail with an error are quarantined: left unwritten and listed at the end, while the rest of the wiki is converted. The exit status is then 4 if pages failed with errors, 8 if pages timed out, or 12 for both.')
+    parser.add_argument('--quarantine-report', type=pathlib.Path, metavar='FILE', help='Convert pages in supervised mode, like --page-timeout but without a time limit unless one is given, and write a JSON report of the quarantined pages to FILE.')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='Number of worker processes used to convert pages. 0 means one per CPU. Ignored for single-file conversion.')
+    args = parser.parse_args()
+
+    input = args.input
+    output_dir = args.output_dir
+    stdout_output = None
+    if args.output_format in ('jsonl', 'git') and output_dir is None and not args.batch:
+        # Keep messages out of the JSON or fast-import stream.
+        stdout_output = sys.stdout
+        sys.stdout = sys.stderr
+    overwrite_outputs = args.overwrite or args.write_if_changed or args.incremental or args.watch
+    supress_msgs = args.silent
+    progress = None if supress_msgs else Progress(args.progress)
+    if args.yaml_dumper == 'c' and not yaml.__with_libyaml__:
+        print("WARNING: PyYAML's C dumper is not available, using the pure-Python dumper.")
+    check_links = bool(args.warn_broken_links or args.broken_link_style or args.broken_link_report)
+    link_outputs = bool(args.backlinks or args.backlinks_front_matter or args.orphan_report or args.link_graph)
+    jobs = args.jobs if args.jobs > 0 else os.cpu_count()
+    if args.debug and jobs != 1:
+        # Debug output is printed as it is generated, so it would interleave.
+        print('Debug output requested, converting pages in a single process.')
+        jobs = 1
+    supervisor = None
+    if args.page_timeout is not None or args.quarantine_report:
+        if args.page_timeout is not None and args.page_timeout <= 0:
+            sys.exit('--page-timeout must be a positive number of seconds.')
+        if args.page_timeout is not None and not timeouts_supported():
+            sys.exit('--page-timeout needs interval timers, which are not available on this platform.')
+        if args.serve is not None or args.watch or args.output_format == 'git' or (input.is_file() and not args.batch):
+            sys.exit('Supervised mode is only available for converting whole wikis, without --serve, --watch or --output-format git.')
+        supervisor = Supervisor(args.page_timeout)
+    if args.batch:
+        if args.output_dir is not None:
+            sys.exit('You may not specify an output with --batch, the manifest gives each wiki its own.')
+        if args.serve is not None or args.watch or args.profile or args.broken_link_report or args.search_index or link_outputs:
+            sys.exit('--serve, --watch, --profile, --broken-link-report, --search-index and the link graph options are not available with --batch.')
+        wikis = read_batch_manifest(input, args)
+        convert_batch(wikis, jobs, progress, supervisor)
+        if supervisor is not None:
+            finish_supervised_run(supervisor, args.quarantine_report, [wiki.name for wiki in wikis])
+        return
+    if not args.page_links:
+        page_links_relative = infer_page_links_relative(args.page_link_prefix)
+        if not supress_msgs: print(f'Inferred --page-links-relative={page_links_relative}')
+    else:
+        page_links_relative = args.page_links == "rel"
+
+    def make_main_converter(config, intermap, record_links=False, backlinks=None):
+        return make_converter(args, config, intermap, print if progress is None else progress.print,
+                              page_links_relative, record_links, backlinks)
+
+    input = input.resolve()
+
+    if input.is_file():
+        if not supress_msgs: print(f'Assuming input file {input} is a page file.')
+        if output_dir:
+            sys.exit('You may not specify an output when converting a single file.')
+        if check_links:
+            sys.exit('Link checking needs the whole wiki, it is not available for a single file.')
+        if args.search_index or link_outputs:
+            sys.exit('A search index or link graph needs the whole wiki, it is not available for a single file.')
+        config = None
+        if args.config_file:
+            config = read_config(args.config_file)
+        else:
+            print('WARNING: No config file specified.')
+        converter = make_main_converter(config, None)
+        sink = StreamSink(sys.stdout)
+        sink.yaml_dumper = args.yaml_dumper
+        sink.write(converter.convert_page_file(input))
+        if converter.profiler is not None:
+            converter.profiler.write(args.profile, converter.pass_skips)
+    else:
+        if not input.is_dir():
+            sys.exit('UseMod wiki db directory not found.')
+        if not (input / 'page').exists():
+            sys.exit('UseMod page directory not found.')
+        config_file = pathlib.Path(args.config_file) if args.config_file else input / "config"
+        def load_converter(record_links=False, backlinks=None):
+            return make_main_converter(read_config(config_file.resolve()), read_intermap(input), record_links, backlinks)
+        if (args.search_index or link_outputs) and (args.serve is not None or args.incremental or args.watch or args.output_format == 'git'):
+            sys.exit('--search-index and the link graph options are not available with --serve, --incremental, --watch or --output-format git.')
+        if args.serve is not None:
+            if output_dir is not None:
+                sys.exit('You may not specify an output when serving pages.')
+            converter = load_converter()
+            if check_links:
+                converter.index_pages(input)
+            serve(converter, input, args.serve_host, args.serve, args.cache_size, args.yaml_dumper)
+            return
+        if args.incremental and (output_dir is None or args.output_format != 'dir'):
+            sys.exit('An output directory is required for incremental conversion.')
+        if args.watch:
+            if output_dir is None or args.output_format != 'dir':
+                sys.exit('An output directory is required for --watch.')
+            if args.broken_link_report or args.profile:
+                sys.exit('--broken-link-report and --profile are not available with --watch.')
+        if args.output_format == 'git':
+            if output_dir is not None and output_dir.exists() and not overwrite_outputs:
+                sys.exit(f'Output file exists, will not overwrite: {output_dir}')
+            converter = load_converter()
+            if check_links:
+                page_index = converter.index_pages(input)
+                if not supress_msgs: print(f'Indexed {len(page_index)} pages')
+            if jobs != 1 and not supress_msgs:
+                print('Exporting history in a single process.')
+            stream = stdout_output.buffer if output_dir is None else open(output_dir, 'wb')
+            try:
+                export_history(converter, input, stream, f'refs/heads/{args.git_branch}', args.yaml_dumper, progress)
+            finally:
+                if output_dir is not None:
+                    stream.close()
+            if args.broken_link_report:
+                write_broken_link_report(args.broken_link_report, converter)
+            return
+        if args.output_format == 'dir' and output_dir is None:
+            sink = StreamSink(sys.stdout)
+        elif stdout_output is not None:
+            sink = JsonLinesSink(stream=stdout_output)
+        else:
+            if output_dir is None:
+                sys.exit(f'An output file is required for --output-format {args.output_format}.')
+            sink = open_sink(args.output_format, output_dir, overwrite_outputs, args.write_if_changed)
+        sink.yaml_dumper = args.yaml_dumper
+        if args.watch:
+            def convert_all(converter):
+                convert_wiki(converter, input, sink, jobs, args.incremental, check_links, progress)
+            try:
+                WikiWatcher(input, sink, load_converter, convert_all, config_file, check_links, args.watch_delay).run()
+            finally:
+                sink.close()
+            return
+        link_graph = None
+        if args.backlinks_front_matter:
+            if not supress_msgs: print('Collecting links for the backlinks front matter')
+            first_pass_converter = make_converter(args, read_config(config_file.resolve()), read_intermap(input),
+                                                  None, page_links_relative, record_links=True)
+            link_graph = collect_link_graph(first_pass_converter, input, jobs, supervisor)
+            converter = load_converter(backlinks=link_graph.backlinks())
+        elif link_outputs:
+            converter = load_converter(record_links=True)
+            link_graph = converter.link_graph = LinkGraph()
+        else:
+            converter = load_converter()
+        if args.search_index:
+            converter.search_index = open_search_index(args.search_index, args.search_index_format,
+                                                       overwrite_outputs, output_dir)
+        try:
+            convert_wiki(converter, input, sink, jobs, args.incremental, check_links, progress, supervisor)
+        finally:
+            sink.close()
+        if converter.search_index is not None:
+            converter.search_index.close()
+            if not supress_msgs: print(f'Search index written to {args.search_index}')
+        if link_graph is not None:
+            write_link_outputs(link_graph, args, converter.home_page)
+        if args.broken_link_report:
+            write_broken_link_report(args.broken_link_report, converter)
+            if not supress_msgs: print(f'{len(converter.broken_links)} broken links, report written to {args.broken_link_report}')
+        if converter.profiler is not None:
+            converter.profiler.write(args.profile, converter.pass_skips)
+            if not supress_msgs: print(f'Profile written to {args.profile}')
+        if supervisor is not None:
+            finish_supervised_run(supervisor, args.quarantine_report)
@@ -0,0 +1,1002 @@
+"""
+The Converter, which turns UseMod page text into Markdown.
+"""
+
+import collections
+import datetime
+import pathlib
+import re
+import threading
+import time
+from urllib.parse import urlparse
+
+from .dialect import Dialect
+from .links import PageLinks
+from .lines import LineState, usemod_lines_to_markdown
+from .output import Post
+from .pages import FS, iter_pages, page_parent_id, post_path, read_page_file
+from .profiling import Profiler
+from .search import search_entry
+
+# Selected UseMod wiki config options, with the values used when the config
+# doesn't set them.
+usemod_config_defaults = {
+    'UseSubpage':  True,  # Allow subpages
+    'FreeUpper':   True,  # Force uppercase in page name words
+    'RawHtml':     True,  # Allow <html> regions (default False)
+    'HtmlTags':    True,  # Allow unsafe HTML tags (default False)
+    'HtmlLinks':   False, # Allow raw HTML links
+    'FreeLinks':   True,  # Allow double-bracket page links
+    'SimpleLinks': False, # Allow only letters in page names
+    'NetworkFile': True,  # Allow file: links
+    'BracketText': True,  # Allow [url link-text]
+    'WikiLinks':   False, # Allow LinkPattern (otherwise use [[page]] only) (default True)
+    'BracketWiki': False, # Allow text in [WikiLnk txt]
+    'UseHeadings': True,  # Allow headings
+}
+
+def read_config(file):
+    # Returns the options of usemod_config_defaults that the UseMod config
+    # file sets.
+    config = {}
+    with open(file) as fh:
+        for line in fh:
+            m = re.match(rf'\$({"|".join(usemod_config_defaults)})\s*=\s*("?)(.*?);\2', line)
+            if m:
+                option = m[1]
+                value = m[3]
+                # All the options we use right now are Boolean, making this
+                # rather simple.
+                config[option] = value == "1"
+    return config
+
+def read_intermap(input_dir):
+    intermap = {}
+    with open((pathlib.Path(input_dir) / 'intermap').resolve()) as fh:
+        for line in fh:
+            key, url = line.strip().split(' ', 1)
+            intermap[key] = url
+    return intermap
+
+def infer_page_links_relative(page_link_prefix):
+    # Page links are relative unless the prefix is an absolute path.
+    url_parts = urlparse(page_link_prefix)
+    return not (url_parts.path and url_parts.path.startswith("/"))
+
+# Literal triggers for page passes. A pass can only match text containing
+# at least one of its triggers, so when none is present the pass is skipped.
+# Passes not listed here always run.
+pass_triggers = {
+    'raw_html': ('<html>',),
+    'html_amp': ('&',),
+    'html_lt': ('<',),
+    'html_gt': ('>',),
+    'nowiki': ('&lt;nowiki&gt;',),
+    'pre': ('&lt;pre&gt;', '&lt;code&gt;'),
+    'html_pairs': ('&lt;/',),
+    'html_singles': ('&lt;',),
+    'line_break': ('&lt;br',),
+    'html_link': ('&lt;/',),
+    'free_link': ('[[',),
+    'bracket_url_text': ('[',),
+    'bracket_interlink_text': ('[',),
+    'bracket_link_text': ('[',),
+    'bracket_anchored_link_text': ('[',),
+    'bracket_url': ('[',),
+    'bracket_interlink': ('[',),
+    'naked_url': (':',),
+    'naked_interlink': (':',),
+    'anchored_link': ('#',),
+    'horizontal_rule': ('----',),
+    'list_start': ('\n*',),
+    'adjacent_lists': ('\n*',),
+    'adjacent_numbered_lists': ('\n#',),
+    'em_tag': ('<em>',),
+    'strong_tag': ('<strong>',),
+    'toc': ('&lt;toc&gt;',),
+    'restore': (FS,),
+}
+
+# Inline link passes that scan_inline_links treats specially: those that
+# inline_link_interacts always checks, those starting with \b and the
+# interlink passes, which may leave a match as it is.
+inline_link_checked_passes = frozenset(['naked_interlink', 'anchored_link', 'naked_link'])
+inline_link_word_passes = frozenset(['naked_url', 'naked_interlink'])
+inline_link_interlink_passes = frozenset(['bracket_interlink_text', 'bracket_interlink', 'naked_interlink'])
+
+def iter_region_matches(pattern, text, start, end):
+    # Yields the matches of pattern that start between start and end, as
+    # finditer would. Starts are found with the text cut off at end, so a
+    # match that only exists if it runs on past end is missed.
+    pos = start
+    while pos < end:
+        m = pattern.search(text, pos, end)
+        if m is None:
+            return
+        m = pattern.match(text, m.start())
+        yield m
+        pos = m.end()
+
+class PageLog:
+    # What happened while converting one page: messages, warnings, broken
+    # links, passes skipped by trigger (line emphasis is counted per line),
+    # what the sink did with the output (see Sink.record) and any digests it
+    # recorded (see DirectorySink), when profiling, pass timings and, when
+    # building a search index or the link graph, the page's entry and
+    # links. Messages go to on_message as they happen, or
+    # are kept in `messages` if there is no on_message.
+
+    def __init__(self, on_message=None, profile_top=None):
+        self.on_message = on_message
+        self.messages = []
+        self.warnings = 0
+        self.broken_links = []
+        self.pass_skips = collections.Counter()
+        self.outputs = collections.Counter()
+        self.output_digests = {}
+        self.profiler = None if profile_top is None else Profiler(profile_top)
+        self.search_entry = None
+        self.links = None
+
+    def report(self, msg):
+        if self.on_message is None:
+            self.messages.append(msg)
+        else:
+            self.on_message(msg)
+
+    def warn(self, msg):
+        self.warnings = self.warnings + 1
+        self.report(f'WARNING: {msg}')
+
+class ChunkStore:
+    # Holds converted fragments of a page that later transformations must not
+    # touch. Each stored fragment is replaced in the page text by a marker,
+    # FS n FS, until restore() puts the fragments back.
+
+    # Finds every place a marker could start, including ones that share an
+    # FS with the one before, so that a marker-like run that isn't restored
+    # can't hide a real marker after it.
+    marker_pattern = re.compile(f'(?={FS}([0-9]+){FS})')
+
+    def __init__(self, debug=False):
+        self.debug = debug
+        self.chunks = []
+
+    def store(self, value):
+        self.chunks.append(value)
+        return f'{FS}{len(self.chunks) - 1}{FS}'
+
+    def restore(self, txt):
+        # Scans the text once, rather than replacing the first occurrence of
+        # each marker in turn, from the last stored chunk down to the first,
+        # as was done originally. The results are the same except where
+        # markers share an FS, which this deliberately does differently:
+        # markers are read from left to right, so a link followed by a digit
+        # and another link (FS 0 FS 1 FS 1 FS) restores both, where replacing
+        # found a marker (FS 1 FS) straddling the first two and broke both.
+        #
+        # A chunk may contain markers for chunks stored before it, e.g. a free
+        # link inside the text of a bracket link. Those are expanded in place.
+        # Markers for later or unknown chunks, and repeats of a marker that has
+        # already been restored, are left as they are.
+        restored = [False] * len(self.chunks)
+
+        def expand(txt, limit):
+            pieces = []
+            pos = 0
+            for m in self.marker_pattern.finditer(txt):
+                start = m.start()
+                if start < pos:
+                    # Inside a marker that was restored.
+                    continue
+                i = int(m[1])
+                if i >= limit or restored[i] or m[1] != str(i):
+                    continue
+                restored[i] = True
+                value = self.chunks[i]
+                end = start + len(m[1]) + 2
+                if self.debug: print (f'!restoring {txt[start:end]} => {value}')
+                pieces.append(txt[pos:start])
+                pieces.append(expand(value, i))
+                pos = end
+            if not pieces:
+                return txt
+            pieces.append(txt[pos:])
+            return ''.join(pieces)
+
+        return expand(txt, len(self.chunks))
+
+class Converter:
+    # Holds everything a conversion depends on: options, UseMod config,
+    # intermap, page index and the compiled patterns. None of that changes
+    # once the converter is built, and everything a single conversion
+    # produces besides its result goes into a PageLog, so one converter can
+    # be used by several threads at once. Logs are added to the converter's
+    # totals (broken_links, pass_skips, outputs, profiler) under a lock.
+    #
+    # config holds UseMod config options as returned by read_config. The
+    # intermap maps site names to URLs as returned by read_intermap; LocalWiki
+    # and Local default to page_link_prefix. page_links_relative is inferred
+    # from page_link_prefix if None. page_index, if given, is the set of
+    # known page IDs (see index_pages), and links to other pages are broken.
+    # search_entries, if given, is the entry_kind of a search index: each
+    # page file converted then gets a search entry in its log, and those are
+    # added to search_index, if the converter has one, along with the log.
+    # Likewise with record_links, the links of each page file converted are
+    # added to link_graph. backlinks, if given, maps page IDs (in the form of
+    # the page index) to the pages linking to them, for their front matter.
+    # inline_link_scanner says whether inline links are found in one scan of
+    # each page (see scan_inline_links) rather than by running each link pass
+    # in turn. Both give the same result.
+
+    def __init__(self, config=None, intermap=None, page_link_prefix='../', page_link_suffix='/',
+                 page_links_relative=None, home_page='HomeWiki', html_allowed=True,
+                 page_index=None, warn_broken_links=False, broken_link_style='link',
+                 profile_top=None, supress_msgs=False, debug_format=False, on_message=None,
+                 search_entries=None, record_links=False, backlinks=None, inline_link_scanner=True):
+        for option, default in usemod_config_defaults.items():
+            setattr(self, option, default)
+        if config:
+            for option, value in config.items():
+                if option not in usemod_config_defaults:
+                    raise ValueError(f'Unknown UseMod config option: {option}')
+                setattr(self, option, value)
+        self.intermap = {}
+        if intermap is not None:
+            self.intermap = dict(intermap)
+            self.intermap.setdefault('LocalWiki', page_link_prefix)
+            self.intermap.setdefault('Local', page_link_prefix)
+        self.page_link_prefix = page_link_prefix
+        self.page_link_suffix = page_link_suffix
+        if page_links_relative is None:
+            page_links_relative = infer_page_links_relative(page_link_prefix)
+        self.page_links_relative = page_links_relative
+        self.home_page = home_page
+        self.html_allowed = html_allowed  # Markdown target allows embedded HTML
+        self.page_index = None if page_index is None else frozenset(page_index)
+        self.warn_broken_links = warn_broken_links
+        self.broken_link_style = broken_link_style
+        # When profile_top is None no profiler is created, and the conversion
+        # code only checks it for None.
+        self.profile_top = profile_top
+        self.supress_msgs = supress_msgs
+        self.debug_format = debug_format
+        self.on_message = on_message
+        self.search_entries = search_entries
+        self.search_index = None
+        self.record_links = record_links
+        self.link_graph = None
+        self.backlinks = backlinks
+        self.inline_link_scanner = inline_link_scanner
+
+        self.dialect = Dialect(self)
+
+        self.lock = threading.Lock()
+        self.warnings = 0
+        self.broken_links = []
+        self.pass_skips = collections.Counter()
+        self.outputs = collections.Counter()
+        self.output_digests = {}
+        self.profiler = None if profile_top is None else Profiler(profile_top)
+
+    def settings(self):
+        # The constructor arguments that give an equivalent converter, e.g.
+        # in a worker process. on_message is left out.
+        return {
+            'config': {option: getattr(self, option) for option in usemod_config_defaults},
+            'intermap': self.intermap,
+            'page_link_prefix': self.page_link_prefix,
+            'page_link_suffix': self.page_link_suffix,
+            'page_links_relative': self.page_links_relative,
+            'home_page': self.home_page,
+            'html_allowed': self.html_allowed,
+            'page_index': self.page_index,
+            'warn_broken_links': self.warn_broken_links,
+            'broken_link_style': self.broken_link_style,
+            'profile_top': self.profile_top,
+            'supress_msgs': self.supress_msgs,
+            'debug_format': self.debug_format,
+            'search_entries': self.search_entries,
+            'record_links': self.record_links,
+            'backlinks': self.backlinks,
+            'inline_link_scanner': self.inline_link_scanner,
+        }
+
+    def new_log(self):
+        return PageLog(self.on_message, self.profile_top)
+
+    def add_log(self, log):
+        # Adds a page's log to the totals.
+        with self.lock:
+            self.warnings = self.warnings + log.warnings
+            self.broken_links.extend(log.broken_links)
+            self.pass_skips.update(log.pass_skips)
+            self.outputs.update(log.outputs)
+            if self.profiler is not None and log.profiler is not None:
+                self.profiler.merge(log.profiler.data())
+            if self.search_index is not None and log.search_entry is not None:
+                self.search_index.add(log.search_entry)
+            if self.link_graph is not None and log.links is not None:
+                self.link_graph.add(log.links)
+
+    def convert_text(self, text, page_id, parent_id=None, log=None):
+        # Returns the Markdown for a page's wiki text. Without a log, a new
+        # one is added to the totals afterwards.
+        if log is not None:
+            return self.page_to_markdown(text, page_id, parent_id, log)
+        log = self.new_log()
+        markdown_text = self.page_to_markdown(text, page_id, parent_id, log)
+        self.add_log(log)
+        return markdown_text
+
+    def convert_page_file(self, file, log=None):
+        # Converts a UseMod page file to a Post. Without a log, a new one is
+        # added to the totals afterwards.
+        file = pathlib.Path(file)
+        return self.convert_page_record(file, read_page_file(file), log)
+
+    def convert_page_record(self, file, record, log=None):
+        # Converts the PageRecord read from a page file to a Post, like
+        # convert_page_file.
+        own_log = log is None
+        if own_log:
+            log = self.new_log()
+        parent_id = page_parent_id(file)
+        timestamp = record.timestamp
+        dt = datetime.datetime.fromtimestamp(float(timestamp))
+        text = record.text
+        page_id = file.stem
+        if self.record_links:
+            source = f'{parent_id}/{page_id}' if parent_id else page_id
+            log.links = PageLinks(self.page_index_key(source), post_path(file), [])
+        start = time.perf_counter()
+        markdown_text = self.page_to_markdown(text, page_id, parent_id, log)
+        if log.profiler is not None:
+            log.profiler.record_page(file, time.perf_counter() - start, len(text))
+
+        post = self.make_post(post_path(file), parent_id, page_id, dt, timestamp, markdown_text)
+        if self.search_entries is not None:
+            log.search_entry = search_entry(post, self.search_entries)
+        if own_log:
+            self.add_log(log)
+        return post
+
+    def make_post(self, path, parent_id, page_id, dt, timestamp, txt):
+        page_title = page_id.replace('_',' ') if self.FreeLinks else page_id
+        parent_title = parent_id
+        if parent_id and self.FreeLinks:
+            parent_title = re.sub('_', ' ', parent_id)
+            page_title = f'{parent_id}/{page_title}'
+        frontmatter = {
+            'title': page_title,
+            'date': dt.isoformat()
+        }
+        # We add a parent only for sub-pages.
+        if parent_id:
+            frontmatter['wiki_parent'] = parent_title
+        if self.backlinks:
+            page_links = self.backlinks.get(self.page_index_key(f'{parent_id}/{page_id}' if parent_id else page_id))
+            if page_links:
+                frontmatter['backlinks'] = page_links
+
+        return Post(path, frontmatter, txt, timestamp)
+
+    def page_to_markdown(self, text, page_id, parent_id, log):
+
+        # For UseMod constructs, see:
+        # - http://www.usemod.com/cgi-bin/wiki.pl?TextFormattingExamples
+        # - http://www.usemod.com/cgi-bin/wiki.pl?TextFormattingRules
+        #
+        # Also see the UseMod Perl code itself. Used heavily for algorithm
+        # inspiration.
+        #
+        # For Markdown constructs, see:
+        # - https://www.markdownguide.org/
+        #
+        # Order of transformations is significant, otherwise some translated
+        # formatting will erroneously trigger later transformations. This could be
+        # alleviated by introducing a temporary marker for translated constructs.
+        #
+        # Some deliberately unsupported UseMod constructs
+        # named anchors (<a name=''>)
+        # <tt>
+
+        dialect = self.dialect
+        debug_format = self.debug_format
+        broken_link_style = self.broken_link_style
+
+        last_bracket_url_index = 0 # Counter for numbered reference links.
+        indexed_bracket_urls = {}
+
+        chunks = ChunkStore(debug_format)
+
+        def run_pass(name, repl, text):
+            return self.run_pass(log, name, repl, text)
+        def run_step(name, function, text):
+            return self.run_step(log, name, function, text)
+
+        def get_bracket_index(url):
+            nonlocal last_bracket_url_index
+            nonlocal indexed_bracket_urls
+            i = indexed_bracket_urls.get(url)
+            if i is None:
+                last_bracket_url_index = last_bracket_url_index + 1
+                indexed_bracket_urls[url] = last_bracket_url_index
+                i = last_bracket_url_index
+            return f'{i}'
+        def get_text_or_bracket_index(ref, text):
+            if text is None:
+                return get_bracket_index(ref)
+            else:
+                return text.strip()
+
+        def store_raw(html):
+            return chunks.store(html)
+
+
+        def store_markdown_link(url, link_text = None):
+            if link_text is None:
+                return store_raw(f'<{url}>')
+            else:
+                return store_raw(f'[{link_text}]({url})')
+        def store_page_link(page_ref, anchor, link_text):
+            url, link_text, missing = self.page_ref_to_link_parts(page_ref, anchor, link_text, page_id, parent_id, log)
+            if missing and broken_link_style == 'text':
+                return store_raw(link_text)
+            if missing and broken_link_style == 'mark':
+                # Like UseMod, which shows the page name followed by a '?' link.
+                return store_raw(f'{link_text}[?]({url})')
+            return store_markdown_link(url, link_text)
+        def store_link_or_image(url, link_text = None):
+            # TODO: images.
+            return store_markdown_link(url, link_text)
+
+        def transform_pre(m):
+            tag = m[1]
+            txt = m[2]
+            if debug_format: print(f'!pre({tag})')
+            return store_raw(f'<{tag}>{txt}</{tag}>')
+        def transform_raw(m):
+            if debug_format: print(f'!raw')
+            return store_raw(m[1])
+        def transform_html_link(m):
+            # <A attributes>link_text</A>
+            attr_text = m[1]
+            link_text = m[2]
+            if debug_format: print(f'!html_link("{attr_text}","{link_text}")')
+            attrs = dialect.html_link_attr.findall(attr_text)
+            if len(attrs) == 1 and attrs[0][0].upper() == 'HREF':
+                url = attrs[0][2]
+                return store_markdown_link(url, link_text)
+            # Store it unmodified and hope that the Markdown processer can handle
+            # the naked HTML.
+            return store_markdown_link(m[0])
+        def transform_free_link(m):
+            # [[PageRef]], [[PageRef text]]
+            nonlocal parent_id
+            page_ref = m[1]
+            link_text = m[2] if m.lastindex > 1 else None
+            if debug_format: print (f'!free_link("{page_ref}", "{link_text}")')
+            if link_text is None:
+                link_text = page_ref
+            else:
+                link_text = link_text.strip()
+            # trim extra spaces
+            page_ref = page_ref.strip()
+            page_ref = dialect.subpage_delim.sub('/', page_ref) # around subpage delim
+            return store_page_link(page_ref, None, link_text)
+        def transform_bracket_url(m):
+            # [url], [url text]
+            url = m[1]
+            link_text = m[2] if m.lastindex > 1 else None
+            if debug_format: print(f'!bracket_url("{url}", "{link_text}")')
+            if link_text is None:
+                link_text = get_bracket_index(url)
+            else:
+                link_text = f'[{link_text.strip()}]'
+            return store_markdown_link(url, link_text)
+        def transform_bracket_interlink(m):
+            # [InterSite:path], [InterSite:path text]
+            interlink = m[1]
+            link_text = m[3] if m.re.groups > 2 else None
+            if debug_format: print(f'!interlink("{interlink}","{link_text}")')
+            if m['site'] is None:
+                return m[0] # Not in the intermap.
+            url = self.get_interlink_url(interlink)
+            if url is None:
+                return m[0] # Can't translate it, leave it alone, could be a misfire.
+            if link_text is None:
+                link_text = get_bracket_index(interlink)
+            else:
+                link_text = f'[{link_text.strip()}]'
+            return store_markdown_link(url, link_text)
+        def transform_bracket_link(m):
+            # [PageRef], [PageRef text]
+            page_ref = m[1]
+            link_text = m[2]
+            if debug_format: print(f'!bracket_link("{page_ref}", "{link_text}")')
+            return store_page_link(page_ref, None, f'[{link_text}]')
+        def transform_bracket_anchored_link(m):
+            #  [PageRef#anchor], [PageRef#anchor text]
+            nonlocal parent_id
+            page_ref = m[1]
+            anchor = m[2]
+            link_text = m[3] if m.lastindex > 1 else None
+            if debug_format: print(f'!bracket_anchored_link("{page_ref}", "{anchor}", "{link_text}")')
+            return store_page_link(page_ref, anchor, f'[{link_text}]')
+        def transform_naked_interlink(m):
+            # InterSite:path
+            interlink = m[1]
+            if debug_format: print(f'!naked_interlink("{interlink}")')
+            if m['site'] is None:
+                return m[0] # Not in the intermap.
+            interlink, extra = self.split_url_punct(interlink)
+            url = self.get_interlink_url(interlink)
+            if url is None:
+                return m[0]
+            return store_link_or_image(url, interlink) + extra
+        def transform_naked_url(m):
+            # url
+            url = m[1]
+            if debug_format: print(f'!naked_url("{url}")')
+            url, extra = self.split_url_punct(url)
+            return store_link_or_image(url) + extra
+        def transform_anchored_link(m):
+            # PageRef#anchor
+            nonlocal parent_id
+            page_ref = m[1]
+            anchor = m[2]
+            if debug_format: print(f'!anchored_link("{page_ref}","{anchor}")')
+            return store_page_link(page_ref, anchor, None)
+        def transform_naked_link(m):
+            # PageRef
+            nonlocal parent_id
+            page_ref = m[1]
+            if debug_format: print(f'!naked_link("{page_ref}")')
+            return store_page_link(page_ref, None, None)
+
+
+
+        # Raw HTML blocks
+        if self.RawHtml:
+            if not self.html_allowed:
+                raise ValueError('Raw HTML block encountered, not supported in output.')
+            text = run_pass('raw_html', transform_raw, text)
+
+        # Quote HTML
+        text = self.quote_html(text, log)
+
+        # (Begin of first invocation of CommonMarkup.)
+
+        # <nowiki> blocks
+        def transform_nowiki(m):
+            if debug_format: print(f'!nowiki')
+            return store_raw(m[1])
+        text = run_pass('nowiki', transform_nowiki, text)
+
+        # <pre>, <code> blocks
+        text = run_pass('pre', transform_pre, text)
+
+        # Now translate allowed HTML tags back to unquoted HTML.
+        # Without HtmlTags, only b, i, strong and em are supported.
+        text = run_pass('html_pairs', r'<\1\2>\3</\1>', text)
+        if self.HtmlTags:
+            text = run_pass('html_singles', r'<\1\2>', text)
+
+        # Not implemented here: <tt>
+
+        # Line breaks.
+        #
+        # Standard Markdown uses two trailing spaces, which is nuts because they're
+        # so easy to miss in an editor - and some editor configuration will
+        # automatically remove them. Most processors accept HTML-style breaks, so
+        # use those instead.
+        text = run_pass('line_break', r'<br>', text)
+
+        if self.HtmlLinks:
+            text = run_pass('html_link', transform_html_link, text)
+
+        # Inline links, in this order of precedence:
+        # - free links [[page_name]], [[page_name | link_text]]
+        # - bracket links with text [url link-text], [interlink link-text]
+        #   and, with BracketWiki, [page text], [page#anchor text]
+        # - bracket links, no text: [url], [interlink]
+        # - naked links: url, interlink
+        # - with WikiLinks, page#anchor and page
+        inline_link_transforms = {
+            'free_link': transform_free_link,
+            'bracket_url_text': transform_bracket_url,
+            'bracket_interlink_text': transform_bracket_interlink,
+            'bracket_link_text': transform_bracket_link,
+            'bracket_anchored_link_text': transform_bracket_anchored_link,
+            'bracket_url': transform_bracket_url,
+            'bracket_interlink': transform_bracket_interlink,
+            'naked_url': transform_naked_url,
+            'naked_interlink': transform_naked_interlink,
+            'anchored_link': transform_anchored_link,
+            'naked_link': transform_naked_link,
+        }
+        text = self.convert_inline_links(log, text, inline_link_transforms, len(chunks.chunks))
+
+        # Not implemented here: RFC and ISBN patterns.
+
+        # Horizontal rules
+        #
+        # UseMod optionally supports several thicknesses. Markdown does not, so
+        # we ignore that option.
+        #
+        # Markdown best practice is to ensure a blank line before and after.
+        #
+        # Surprisingly, UseMod does not require these markers to be at the
+        # beginning of a line, or alone on a line, or anything like that.
+        #
+        # Given the latter two facts, we take a pretty ham-fisted approach.
+        text = run_pass('horizontal_rule', '\n\n---\n\n', text)
+
+        # (End of first invocation of CommonMarkup.)
+
+        # List start fix
+        #
+        # Markdown best practice requires a blank line before a list. Do this before
+        # the adjacent lists fix, because we make an exception there.
+        text = run_pass('list_start', r'\1\n\n*', text)
+
+        # Adjacent lists fix
+        #
+        # UseMod allows a blank line to separate two similar lists. Markdown weirdly
+        # interprets this as a single "loose" list, where every list item gets
+        # wrapped as a paragraph, making the list spacing weird.
+        #
+        # For bullet lists, this can be fixed by causing a line break without an
+        # empty line. The standard Markdown fix for this is two spaces at the end of
+        # the last item to indicate a line break, but that's impossible to edit.
+        # Most processors will accept HTML <br>, but you need two of them to
+        # introduce the separator between lists. This is easier to do by adjusting
+        # the wiki text before transforming to Markdown.
+        #
+        # For numbered lists, the problem cannot be fixed. There is no way to get
+        # Markdown to restart numbering for the second list, it treats them as one.
+        text = run_pass('adjacent_lists', r'*\1\n<br><br>\n*', text)
+        def check_adjacent_numbered_lists(text):
+            if dialect.adjacent_numbered_lists.search(text):
+                log.warn(f'Page contains adjacent numbered lists separated by blank lines which will misbehave in Markdown.')
+            return text
+        text = run_step('adjacent_numbered_lists', check_adjacent_numbered_lists, text)
+
+        line_state = LineState(dialect, debug_format, self.UseHeadings, log.pass_skips)
+        text = run_step('lines', lambda text: usemod_lines_to_markdown(text, line_state), text)
+
+        # List depth error fix
+        #
+        # UseMod allows a list to start at a level higher than one. In Markdown,
+        # the indentation used to indicate level gets misinterpreted.
+        # Too hard to fix.
+
+        # Markdown Emphasis
+        #
+        # UseMod's ''text'' => Markdown's *text* (italics)
+        # UseMod's '''text''' => Markdown's **text** (bold)
+        #
+        # Make sure this is done after all lists are translated,
+        # since the asterisks would be trouble otherwise.
+        text = run_pass('em_tag', r'*\1*', text)
+        text = run_pass('strong_tag', r'**\1**', text)
+
+        # <toc>
+        #
+        # You will need a Markdown processor or plugin that can translate this.
+        text = run_pass('toc', '[[toc]]', text)
+
+        if debug_format:
+            print('!===============================')
+            print(text)
+            print('!===============================')
+        return run_step('restore', chunks.restore, text)
+
+    def run_pass(self, log, name, repl, text):
+        # Applies the dialect pattern called `name` to the whole page text,
+        # recording time, match count and size change when profiling.
+        triggers = pass_triggers.get(name)
+        if triggers is not None and not any(trigger in text for trigger in triggers):
+            log.pass_skips[name] += 1
+            return text
+        pattern = getattr(self.dialect, name)
+        if log.profiler is None:
+            return pattern.sub(repl, text)
+        start = time.perf_counter()
+        result, count = pattern.subn(repl, text)
+        log.profiler.record_pass(name, time.perf_counter() - start, count, len(result) - len(text))
+        return result
+
+    def run_step(self, log, name, function, text):
+        # Like run_pass, for steps that aren't a single substitution.
+        triggers = pass_triggers.get(name)
+        if triggers is not None and not any(trigger in text for trigger in triggers):
+            log.pass_skips[name] += 1
+            return text
+        if log.profiler is None:
+            return function(text)
+        start = time.perf_counter()
+        result = function(text)
+        log.profiler.record_pass(name, time.perf_counter() - start, None, len(result) - len(text))
+        return result
+
+    def convert_inline_links(self, log, text, transforms, chunk_count):
+        # Applies the inline link passes, dialect.inline_link_passes, with
+        # the given transforms. Normally the links are found in one scan of
+        # the page, see scan_inline_links. Pages where that could give a
+        # different result, and debug output, which follows the passes, run
+        # the passes in turn instead. When profiling, the scan's time goes to
+        # inline_links, and its matches and size change to each pass as well.
+        if self.inline_link_scanner and not self.debug_format:
+            if not self.WikiLinks and '[' not in text and ':' not in text:
+                log.pass_skips['inline_links'] += 1
+                return text
+            start = time.perf_counter()
+            links = self.scan_inline_links(text, chunk_count)
+            if links is not None:
+                if log.profiler is None:
+                    return self.replace_inline_links(text, links, transforms)
+                changes = {}
+                result = self.replace_inline_links(text, links, transforms, changes)
+                log.profiler.record_pass('inline_links', time.perf_counter() - start, len(links), len(result) - len(text))
+                for name, (matches, size_change) in changes.items():
+                    log.profiler.record_pass(name, 0.0, matches, size_change, calls=0)
+                return result
+            if log.profiler is not None:
+                log.profiler.record_pass('inline_links_fallback', time.perf_counter() - start, None, 0)
+        for name in self.dialect.inline_link_passes:
+            text = self.run_pass(log, name, transforms[name], text)
+        return text
+
+    # Single-pass link scanning
+    #
+    # Run in turn, each link pass sees the links of earlier passes replaced
+    # by chunk markers. Trying all the passes' patterns at each position of
+    # the original text, in pass order, finds the same links as long as the
+    # passes don't interact: no earlier pass would match inside a link the
+    # scan finds, and no marker would change what a later pass matches next
+    # to it. scan_inline_links checks for the ways that can happen, erring
+    # on the side of caution, and gives up on the page if one is found.
+    #
+    # Interlinks to sites not in the intermap are left as text, which later
+    # passes may still match, so their text is scanned again for the later
+    # passes only.
+
+    def scan_inline_links(self, text, chunk_count):
+        # Returns (rank, start, end, pass name) for each link the inline link
+        # passes would convert, in page order, or None if the passes could
+        # interact on this page.
+        dialect = self.dialect
+        ranks = dialect.inline_link_ranks
+        if FS in text:
+            # Text that looks like a marker for a chunk that isn't stored yet
+            # would be restored as whichever link gets that chunk, which
+            # depends on the order the links are stored in.
+            for m in ChunkStore.marker_pattern.finditer(text):
+                if int(m[1]) >= chunk_count:
+                    return None
+        links = []
+        last_end = -1 # End and rank of the last link converted.
+        last_rank = None
+
+        def scan(matches, region_end):
+            # Adds the links among matches of dialect.inline_links, or of one
+            # of dialect.inline_links_after within text that ends at
+            # region_end. Returns False if the passes could interact.
+            nonlocal last_end, last_rank
+            for m in matches:
+                name = m.lastgroup
+                start, end = m.span()
+                if region_end is not None and end > region_end:
+                    return False
+                if (name in inline_link_checked_passes or text.find('[', start + 1, end) != -1) \
+                        and self.inline_link_interacts(text, name, start, end):
+                    return False
+                rank = ranks[name]
+                if name in inline_link_word_passes and start == last_end and last_rank < rank:
+                    # Right after an earlier pass's marker, which ends in a word
+                    # character, the pattern's \b wouldn't match.
+                    return False
+                if name in inline_link_interlink_passes and \
+                        not self.inline_interlink_converted(name, m[f'{name}_site'], m[m.re.groupindex[name] + 1]):
+                    # Later passes can match in the interlink's text. None
+                    # can run on past a bracket interlink's ']', and past a
+                    # naked interlink only into a marker's word characters.
+                    after = dialect.inline_links_after[name]
+                    if after is not None:
+                        if text.startswith(FS, end) or not scan(iter_region_matches(after, text, start, end), end):
+                            return False
+                    continue
+                links.append((rank, start, end, name))
+                last_end = end
+                last_rank = rank
+            return True
+
+        if not scan(dialect.inline_links.finditer(text), None):
+            return None
+        return links
+
+    def inline_link_interacts(self, text, name, start, end):
+        # Whether an earlier inline link pass could match inside the given
+        # match, or a marker right after it could extend it. Only called for
+        # inline_link_checked_passes and for matches containing a '['.
+        # The bracket link passes come before the others, so a bracket link
+        # inside the match would have been converted first.
+        rank = self.dialect.inline_link_ranks[name]
+        pos = text.find('[', start + 1, end)
+        while pos != -1:
+            m = self.dialect.inline_links.match(text, pos)
+            if m is not None and self.dialect.inline_link_ranks[m.lastgroup] < rank:
+                return True
+            pos = text.find('[', pos + 1, end)
+        if name == 'naked_interlink':
+            # A URL in the path.
+            return text.count(':', start, end) > 1 and self.dialect.naked_url.search(text, start + 1, end) is not None
+        if name == 'anchored_link':
+            # A URL or interlink in or after the anchor, or a marker the
+            # anchor's \w+ would run on into.
+            return text.find(':', start, end + 1) != -1 or text.startswith('[', end)
+        if name == 'naked_link':
+            # An anchor that only matches once a marker follows, or an
+            # interlink starting after a subpage's '/'.
+            return text.startswith('#', end) or (text.startswith(':', end) and text.find('/', start, end) != -1)
+        return False
+
+    def inline_interlink_converted(self, name, site, interlink):
+        # Whether transform_bracket_interlink or transform_naked_interlink
+        # would convert a match of the interlink pass `name`, with the given
+        # `site` and first groups, rather than leaving it as it is.
+        if site is None:
+            return False
+        if name == 'naked_interlink':
+            interlink, _ = self.split_url_punct(interlink)
+        return self.get_interlink_url(interlink) is not None
+
+    def replace_inline_links(self, text, links, transforms, changes=None):
+        # Converts the links found by scan_inline_links. The transforms are
+        # called in the order the passes would call them, which is the order
+        # numbered reference links are numbered and broken links reported in.
+        # changes, if given, gets [matches, size change] for each pass.
+        patterns = {name: getattr(self.dialect, name) for name in transforms}
+        replacements = {}
+        for rank, start, end, name in sorted(links):
+            replacement = replacements[start] = transforms[name](patterns[name].match(text, start))
+            if changes is not None:
+                change = changes.setdefault(name, [0, 0])
+                change[0] += 1
+                change[1] += len(replacement) - (end - start)
+        pieces = []
+        pos = 0
+        for rank, start, end, name in links:
+            pieces.append(text[pos:start])
+            pieces.append(replacements[start])
+            pos = end
+        pieces.append(text[pos:])
+        return ''.join(pieces)
+
+    def quote_html(self, txt, log):
+        # Allow character quotes, otherwise translate ampersands.
+        txt = self.run_pass(log, 'html_amp', '&amp;', txt)
+        txt = self.run_pass(log, 'html_lt', '&lt;', txt)
+        txt = self.run_pass(log, 'html_gt', '&gt;', txt)
+        return txt;
+
+    def split_url_punct(self, url):
+        # Remove delimiters if present
+        url, n = self.dialect.url_delimiters.subn('', url)
+        if n > 0:
+            return url, ''
+        m = self.dialect.url_punct.match(url)
+        punct = '' if m.lastindex < 2 else m[2]
+        return m[1], punct
+
+    def page_ref_to_link_parts(self, page_ref, anchor, link_text, page_id, parent_id, log):
+        if link_text is None:
+            if self.FreeLinks:
+                link_text = page_ref.replace("_"," ")
+            else:
+                link_text = page_ref
+
+        if self.FreeLinks:
+            page_ref = self.free_to_normal(page_ref)
+
+        # If the reference is to a sub-page with an implicit parent,
+        # prepend the proper parent's id. That's either the current page's id,
+        # or its parent's id if it's a sub-page.
+        if page_ref.startswith('/'):
+            page_ref = f'{parent_id if parent_id else page_id}{page_ref}'
+
+        missing = self.page_index is not None and page_ref not in self.page_index
+        if missing:
+            self.record_broken_link(page_ref, link_text, page_id, parent_id, log)
+        if log.links is not None:
+            log.links.targets.append(page_ref)
+
+        if anchor is not None:
+            page_ref = f'{page_ref}#{anchor}'
+            link_text = f'{link_text}#{anchor}'
+
+        # If the current page is a sub-page and we are generating relative links,
+        # navigate up one step.
+        if self.page_links_relative and parent_id:
+            page_ref = f'../{page_ref}'
+
+        # We generate links using a site-wide prefix and suffix.
+        url = f'{self.page_link_prefix}{page_ref}{self.page_link_suffix}'
+        return (url, link_text, missing)
+
+    # Page index
+    #
+    # With link checking on, every page and subpage ID in the wiki is
+    # collected before conversion, in the form page_ref_to_link_parts
+    # produces, so that links to missing pages can be found with a set
+    # lookup.
+
+    def index_pages(self, input_dir):
+        # Sets page_index to the pages of the wiki in input_dir. Call this
+        # before converting anything.
+        index = set()
+        for page in iter_pages(input_dir, self.UseSubpage):
+            page_id = page.page_id if page.parent_id is None else f'{page.parent_id}/{page.page_id}'
+            index.add(self.page_index_key(page_id))
+        self.page_index = frozenset(index)
+        return self.page_index
+
+    def page_index_key(self, page_id):
+        return self.free_to_normal(page_id) if self.FreeLinks else page_id
+
+    def record_broken_link(self, target, link_text, page_id, parent_id, log):
+        source = f'{parent_id}/{page_id}' if parent_id else page_id
+        log.broken_links.append({'page': source, 'target': target, 'link_text': link_text})
+        if self.warn_broken_links:
+            log.warn(f'{source} links to missing page {target}')
+
+    def get_interlink_url(self, interlink):
+        # The same interlinks tend to recur across pages, so the result is
+        # cached.
+        interlink_urls = self.dialect.interlink_urls
+        try:
+            return interlink_urls[interlink]
+        except KeyError:
+            pass
+        url = None
+        t = interlink.split(':',1)
+        if len(t) == 2: # Otherwise something odd going on, reject it.
+            site, remote_page = t
+            remote_page = remote_page.replace('&amp;','&')
+            url = self.intermap.get(site)
+            if url is not None:
+                url = url + remote_page
+        self.dialect.cache_name(interlink_urls, interlink, url)
+        return url
+
+    def free_to_normal(self, title):
+        # Capitalize letters after certain chars.
+        # Had to dig into the Perl code to find the right approach for this!
+        #
+        # Links to the same pages recur across pages, so the result is
+        # cached.
+        normal_titles = self.dialect.normal_titles
+        try:
+            return normal_titles[title]
+        except KeyError:
+            pass
+        normal = self.title_to_normal(title)
+        self.dialect.cache_name(normal_titles, title, normal)
+        return normal
+
+    def title_to_normal(self, title):
+        title = title.replace(' ', '_')
+        title = title[0:1].capitalize() + title[1:]
+        title = self.dialect.multiple_underscores.sub('_', title)
+        if title.startswith('_'):
+            title = title[1:]
+        if title.endswith('_'):
+            title = title[:-1]
+        if (self.UseSubpage):
+            title = title.replace('_/', '/')
+            title = title.replace('/_', '/')
+        if self.FreeUpper:
+            title = self.dialect.free_upper.sub(lambda m: m[1] + m[2].capitalize(), title)
+        return title
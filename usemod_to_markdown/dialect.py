@@ -0,0 +1,221 @@
+"""
+The regular expressions for a given set of UseMod options and intermap.
+"""
+
+import re
+
+from .pages import FS
+from .scanners import BlockScanner, TagScanner
+
+## Tags allowed if HtmlTags is true. Not particularly safe.
+html_single_pattern = 'br|p|hr|li|dt|dd|tr|td|th'
+html_pairs_pattern = html_single_pattern + '|b|i|u|font|big|small|sub|sup|h1|h2|h3|h4|h5|h6|cite|code|em|s|strike|strong|tt|var|div|center|blockquote|ol|ul|dl|table|caption'
+
+def literal_trie_pattern(words):
+    # Builds a regular expression matching exactly the given words, arranged
+    # as a prefix tree so that matching doesn't try each word in turn.
+    trie = {}
+    for word in words:
+        node = trie
+        for c in word:
+            node = node.setdefault(c, {})
+        node[''] = {}
+    def pattern(node):
+        branches = [re.escape(c) + pattern(child) for c, child in sorted(node.items()) if c]
+        optional = '' in node
+        if not branches:
+            return ''
+        if len(branches) == 1 and not optional:
+            return branches[0]
+        return '(?:' + '|'.join(branches) + ')' + ('?' if optional else '')
+    return pattern(trie)
+
+class Dialect:
+    # Every regular expression the converter uses, compiled once for a
+    # converter's UseMod options and intermap, so that the per-page and
+    # per-line code never has to assemble or look up a pattern. Nothing here
+    # changes after construction except the interlink URL and page name
+    # caches, so a Dialect can be shared between threads.
+
+    # Each name cache is cleared when it reaches this size, so that long
+    # runs (the server, watch mode, batch mode) don't keep every name they
+    # have ever seen.
+    name_cache_limit = 100000
+
+    def __init__(self, options):
+        # `options` has the UseMod config options as attributes, and the
+        # intermap.
+        self.intermap = options.intermap
+        # Interlink URLs by interlink text, filled in by get_interlink_url.
+        self.interlink_urls = {}
+        # Normalized page names by free link name, filled in by free_to_normal.
+        self.normal_titles = {}
+
+        ## Link patterns, which vary based on options.
+        upper_letter = '[A-Z]'
+        lower_letter = '[a-z]'
+        any_letter = '[A-Za-z' + (']' if options.SimpleLinks else '_0-9]')
+        # Main link pattern: lower between upper, then anything
+        page_name = f'{upper_letter}+{lower_letter}+{upper_letter}{any_letter}*'
+        # Optional subpage link pattern: upper, lower, then anything
+        subpage_name = f'{upper_letter}+{lower_letter}+{any_letter}*'
+        if options.UseSubpage:
+            # Loose pattern: If subpage , it may be simple
+            link_pattern = fr"((?:(?:{page_name})?\\/{subpage_name})|{page_name})"
+        else:
+            link_pattern = f'{page_name}'
+        quote_delim = '(?:"")?' # Optional quote delimiter - have never seen this used.
+        anchored_link_pattern = fr'{link_pattern}#(\w+){quote_delim}'
+        link_pattern = link_pattern + quote_delim
+        inter_site_pattern = f'{upper_letter}{any_letter}+'
+        # Sites in the intermap are matched by the `site` group. Other names
+        # that look like sites are still matched, so that they consume their
+        # text as they do in UseMod, but are left alone without looking them
+        # up.
+        known_sites = [site for site in self.intermap if re.fullmatch(inter_site_pattern, site)]
+        known_site_pattern = literal_trie_pattern(known_sites) if known_sites else '(?!)'
+        inter_link_pattern = (fr'((?:(?:(?P<site>{known_site_pattern})|{inter_site_pattern}):'
+                              fr'[^\]\s"<>{FS}]+){quote_delim})')
+        if options.FreeLinks:
+            any_letter = "[-,.()' _0-9A-Za-z]"
+        if options.UseSubpage:
+            free_link_pattern = fr'((?:(?:{any_letter}+)?/)?{any_letter}+){quote_delim}'
+        else:
+            free_link_pattern = fr'({any_letter}+){quote_delim}'
+        url_protocols = 'https?|ftp|afs|news|nntp|mid|cid|mailto|wais|prospero|telnet|gopher'
+        if options.NetworkFile:
+            url_protocols = url_protocols + '|file'
+        url_pattern = rf'((?:(?:{url_protocols}):[^\]\s"<>{FS}]+){quote_delim})'
+
+        # Block constructs and HTML. These are found by scanners (see
+        # scanners.py), which stand in for the patterns.
+        self.raw_html = BlockScanner(re.compile(r'<html>(.*?)</html>', re.S), {'<html>': '</html>'})
+        self.nowiki = BlockScanner(re.compile(r'&lt;nowiki&gt;(.*?)&lt;/nowiki&gt;', re.S),
+                                   {'&lt;nowiki&gt;': '&lt;/nowiki&gt;'})
+        self.pre = BlockScanner(re.compile(r'&lt;(pre|code)&gt;(.*?)&lt;/\1&gt;', re.S),
+                                {'&lt;pre&gt;': '&lt;/pre&gt;', '&lt;code&gt;': '&lt;/code&gt;'})
+        # Without HtmlTags, only these markup tags are supported.
+        pairs_pattern = html_pairs_pattern if options.HtmlTags else 'b|i|strong|em'
+        self.html_pairs = TagScanner(re.compile(rf'&lt;({pairs_pattern})(\s.*?)?&gt;(.*?)&lt;/\1&gt;', re.I),
+                                     re.compile(rf'&lt;({pairs_pattern})(?=\s|&gt;)', re.I))
+        if options.HtmlTags:
+            self.html_singles = TagScanner(re.compile(rf'&lt;({html_single_pattern})(\s.*?)?/?&gt;', re.I),
+                                           re.compile(rf'&lt;({html_single_pattern})(?=\s|/?&gt;)', re.I),
+                                           pair=False)
+        else:
+            self.html_singles = None
+        self.line_break = re.compile(r'&lt;br\s*/?&gt;')
+        self.html_link = TagScanner(re.compile(r'&lt;A(\s.+?)&gt;(.*?)&lt;/A&gt;', re.I),
+                                    re.compile(r'&lt;A(?=\s)', re.I), attributes='required',
+                                    close='&lt;/A&gt;')
+        self.html_link_attr = re.compile(r'(\w+)=("|\')(.*?)\2')
+
+        # Links
+        self.free_link = re.compile(fr'\[\[{free_link_pattern}(?:\|([^]]+))?\]\]')
+        self.subpage_delim = re.compile(r'\s*/\s*')
+        self.bracket_url_text = re.compile(rf'\[{url_pattern}\s+([^\]]+?)\]')
+        self.bracket_interlink_text = re.compile(rf'\[{inter_link_pattern}\s*([^\]]+?)\]')
+        self.bracket_link_text = re.compile(rf'\[{link_pattern}\s+([^\]]+?)\]')
+        self.bracket_anchored_link_text = re.compile(rf'\[{anchored_link_pattern}\s+([^\]]+?)\]')
+        self.bracket_url = re.compile(rf'\[{url_pattern}\]')
+        self.bracket_interlink = re.compile(rf'\[{inter_link_pattern}\]')
+        self.naked_url = re.compile(rf'\b{url_pattern}')
+        self.naked_interlink = re.compile(rf'\b{inter_link_pattern}')
+        self.anchored_link = re.compile(anchored_link_pattern)
+        self.naked_link = re.compile(link_pattern)
+
+        # The inline link passes, in the order they run, and all of them as
+        # one alternation for the single-pass link scanner. Trying the
+        # alternatives in pass order at each position keeps the passes'
+        # precedence. Interlinks that aren't converted are left as text
+        # that later passes may still match, so the scanner also needs the
+        # alternation of the passes after each interlink pass.
+        inline_link_passes = []
+        if options.FreeLinks:
+            inline_link_passes.append('free_link')
+        if options.BracketText:
+            inline_link_passes.extend(['bracket_url_text', 'bracket_interlink_text'])
+            if options.WikiLinks and options.BracketWiki:
+                inline_link_passes.extend(['bracket_link_text', 'bracket_anchored_link_text'])
+        inline_link_passes.extend(['bracket_url', 'bracket_interlink', 'naked_url', 'naked_interlink'])
+        if options.WikiLinks:
+            inline_link_passes.extend(['anchored_link', 'naked_link'])
+        self.inline_link_passes = tuple(inline_link_passes)
+        self.inline_link_ranks = {name: rank for rank, name in enumerate(inline_link_passes)}
+        def pass_alternation(names):
+            # Matches any of the named passes' patterns, trying them in the
+            # given order; lastgroup is the pass that matched. The `site`
+            # groups are renamed to keep group names unique. A lookahead for
+            # what the passes can start with quickly skips the positions
+            # where none can match: a bracket, a URL scheme or interlink
+            # site followed by a colon, or the start of a page name.
+            starts = set()
+            word_starts = set()
+            for name in names:
+                if name == 'naked_url':
+                    word_starts.add('a-z')
+                elif name == 'naked_interlink':
+                    word_starts.add('A-Z')
+                elif name in ('anchored_link', 'naked_link'):
+                    starts.update(['A-Z', r'\\'] if options.UseSubpage else ['A-Z'])
+                else:
+                    starts.add(r'\[')
+            word_starts = word_starts - starts
+            start_patterns = []
+            if starts:
+                start_patterns.append(f'[{"".join(sorted(starts))}]')
+            if word_starts:
+                start_patterns.append(rf'\b[{"".join(sorted(word_starts))}][A-Za-z_0-9]*:')
+            alternatives = '|'.join(
+                f'(?P<{name}>{getattr(self, name).pattern.replace("(?P<site>", f"(?P<{name}_site>")})'
+                for name in names)
+            return re.compile(f'(?={"|".join(start_patterns)})(?:{alternatives})')
+        self.inline_links = pass_alternation(inline_link_passes)
+        self.inline_links_after = {}
+        for rank, name in enumerate(inline_link_passes):
+            if 'interlink' in name:
+                later_passes = inline_link_passes[rank + 1:]
+                self.inline_links_after[name] = pass_alternation(later_passes) if later_passes else None
+
+        self.url_delimiters = re.compile(r'""$')
+        self.url_punct = re.compile(r'^(.*?)([^a-zA-Z0-9/\x80-\xff]+)?$')
+
+        # Page-wide fixes
+        self.horizontal_rule = re.compile('----+')
+        # The lookahead keeps this linear on long lines that aren't
+        # followed by a list: (.*\S.*) would backtrack through every split.
+        self.list_start = re.compile(r'^(?!\*)(?=.*\S)(.*)\n\*', re.MULTILINE)
+        self.adjacent_lists = re.compile(r'^\*(.*?)\n\s*\n\*', re.MULTILINE)
+        self.adjacent_numbered_lists = re.compile(r'^\#[^\n]*(\n\s*)+\n\#', re.MULTILINE)
+        self.em_tag = re.compile(r"<em>([^'\n]+?)</em>")
+        self.strong_tag = re.compile(r"<strong>([^'\n]+?)</strong>")
+        self.toc = re.compile('&lt;toc&gt;')
+        self.html_amp = re.compile('&(?![#a-zA-Z0-9]+;)')
+        self.html_lt = re.compile(r'\<')
+        self.html_gt = re.compile(r'\>')
+
+        # Line-by-line constructs
+        self.monospace = re.compile(r'^([ \t].*)')
+        self.indented_text = re.compile(r'^(:+)')
+        self.unordered_list_item = re.compile(r'^(\*+)')
+        self.ordered_list_item = re.compile(r'^(#+)')
+        self.strong = re.compile("('*)'''(.*?)'''")
+        self.em = re.compile("''(.*?)''")
+        self.table_line = re.compile(r'^\|\|((.*?\|\|)+)')
+        self.bold_marker = re.compile("(<b>|<strong>)")
+        self.heading = re.compile(r'^\s*(=+)\s+(#\s+)?(.*?)\s+=+(.*)$')
+
+        # Page names
+        self.multiple_underscores = re.compile('__+')
+        self.free_upper = re.compile(r'([-_.,\(\)/])([a-z])')
+
+    def cache_size(self):
+        return len(self.interlink_urls) + len(self.normal_titles)
+
+    def cache_name(self, cache, name, value):
+        # Adds a value to one of the name caches, clearing it first if it is
+        # full. Lookups racing with this just miss and compute the value
+        # again.
+        if len(cache) >= self.name_cache_limit:
+            cache.clear()
+        cache[name] = value
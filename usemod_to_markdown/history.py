@@ -0,0 +1,76 @@
+"""
+Exporting the wiki's page history, enabled by --output-format git.
+
+Every revision of every page, the kept ones and the current one, is
+converted and written as a git fast-import stream: a blob for each
+converted revision as its page is read, then a commit for each revision in
+timestamp order. Load it with `git fast-import` in a new repository.
+"""
+
+import collections
+import datetime
+
+from .output import format_post
+from .pages import count_page_files, iter_pages, post_path, read_page_revisions
+
+# A revision waiting for its commit, once its blob has been written.
+# Sorting these orders the commits by timestamp.
+HistoryCommit = collections.namedtuple('HistoryCommit', 'time path revision mark author summary title')
+
+def export_history(converter, input_dir, stream, branch='refs/heads/master', yaml_dumper='builtin',
+                   progress=None):
+    # Writes the history of the wiki in input_dir to stream, which must be
+    # binary. The blobs go out while pages are read, so only the commits'
+    # details are kept until the end.
+    if progress is not None:
+        progress.begin(count_page_files(input_dir, converter.UseSubpage))
+    # Without `done` at the end, fast-import rejects a truncated stream.
+    stream.write(b'feature done\n')
+    commits = []
+    mark = 0
+    for page in iter_pages(input_dir, converter.UseSubpage):
+        if progress is not None: progress.start_page(page.path)
+        path = post_path(page.path)
+        for revision in read_page_revisions(page.path):
+            log = converter.new_log()
+            markdown_text = converter.convert_text(revision.text, page.page_id, page.parent_id, log)
+            dt = datetime.datetime.fromtimestamp(float(revision.timestamp))
+            post = converter.make_post(path, page.parent_id, page.page_id, dt, revision.timestamp, markdown_text)
+            converter.add_log(log)
+            mark = mark + 1
+            write_data(stream, f'blob\nmark :{mark}\n'.encode('utf-8'), format_post(post, yaml_dumper))
+            commits.append(HistoryCommit(float(revision.timestamp), path, revision.revision, mark,
+                                         revision.author, revision.summary, post.frontmatter['title']))
+        if progress is not None: progress.page_done()
+    if progress is not None:
+        progress.finish()
+
+    commits.sort()
+    for commit in commits:
+        ident = f'{git_ident_name(commit.author)} <> {int(commit.time)} +0000'
+        message = commit.summary.strip() or f'Edit {commit.title}'
+        message = f'{message}\n\nUseMod revision {commit.revision} of {commit.title}\n'
+        header = f'commit {branch}\nauthor {ident}\ncommitter {ident}\n'
+        write_data(stream, header.encode('utf-8'), message)
+        stream.write(f'M 644 :{commit.mark} {git_quote_path(commit.path)}\n\n'.encode('utf-8'))
+    stream.write(b'done\n')
+    stream.flush()
+    if not converter.supress_msgs:
+        print(f'Exported {len(commits)} revisions of {len({commit.path for commit in commits})} pages')
+
+def write_data(stream, header, text):
+    # A fast-import command followed by its data, given by byte count.
+    data = text.encode('utf-8')
+    stream.write(header + f'data {len(data)}\n'.encode('utf-8') + data + b'\n')
+
+def git_ident_name(author):
+    # fast-import names can't contain angle brackets or newlines. Anonymous
+    # edits without a host or IP address get a placeholder.
+    name = ' '.join(author.replace('<', '').replace('>', '').split())
+    return name or 'Anonymous'
+
+def git_quote_path(path):
+    # Paths with special characters are written as C-style quoted strings.
+    if not any(c in path for c in '"\\\n'):
+        return path
+    return '"' + path.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
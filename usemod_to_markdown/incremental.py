@@ -0,0 +1,139 @@
+"""
+Incremental conversion, enabled by --incremental.
+
+The manifest lives in the output directory and records, for each source
+page, the output file and the size, mtime, content hash and UseMod
+timestamp of the source when it was converted. It also records a
+fingerprint of everything else that affects the output. A page is
+reconverted only if its source changed, its output is missing, or the
+fingerprint changed.
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+
+from .pages import post_path
+
+manifest_name = '.usemod-manifest.json'
+manifest_version = 1
+
+def settings_fingerprint(converter, yaml_dumper='builtin'):
+    # Covers the converter options, the UseMod config options and the
+    # intermap, the sink's YAML dumper (they fold some long values
+    # differently), as well as the converter's code itself. Options that
+    # don't affect the output are left out.
+    settings = converter.settings()
+    settings['yaml_dumper'] = yaml_dumper
+    for name in ['debug_format', 'supress_msgs', 'profile_top', 'search_entries']:
+        del settings[name]
+    # Link checking makes output and reports depend on which pages exist.
+    if settings['page_index'] is not None:
+        settings['page_index'] = sorted(settings['page_index'])
+    digest = hashlib.sha1(json.dumps(settings, sort_keys=True).encode('utf-8'))
+    for source in sorted(pathlib.Path(__file__).parent.glob('*.py')):
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+def file_digest(path):
+    return hashlib.sha1(path.read_bytes()).hexdigest()
+
+class Manifest:
+
+    def __init__(self, input_dir, output_dir, fingerprint):
+        self.input_dir = input_dir.resolve()
+        self.output_dir = output_dir
+        self.path = output_dir / manifest_name
+        self.fingerprint = fingerprint
+        self.old_pages = {}
+        self.settings_changed = True
+        if self.path.exists():
+            with open(self.path, encoding='utf-8') as fh:
+                data = json.load(fh)
+            if data.get('version') == manifest_version:
+                self.old_pages = data['pages']
+                self.settings_changed = data['fingerprint'] != self.fingerprint
+        self.pages = {}
+        self.converted = 0
+        self.unchanged = 0
+        self.removed = 0
+
+    def source_key(self, page_file):
+        return page_file.relative_to(self.input_dir).as_posix()
+
+    def output_key(self, page_file):
+        return post_path(page_file)
+
+    def changed_pages(self, pages, broken_links):
+        # Filters page files down to the pages that need converting. Entries
+        # for unchanged pages are carried over, and their broken links added
+        # to broken_links.
+        for page_file in pages:
+            source = self.source_key(page_file)
+            entry = self.old_pages.get(source)
+            if not self.settings_changed and entry is not None and self.is_current(entry, page_file):
+                self.pages[source] = entry
+                self.unchanged = self.unchanged + 1
+                broken_links.extend(entry.get('broken_links', []))
+            else:
+                # Claim the entry so a failed conversion isn't mistaken for a
+                # deleted page.
+                self.pages[source] = None
+                yield page_file
+
+    def is_current(self, entry, page_file):
+        if entry['output'] != self.output_key(page_file):
+            return False
+        if not (self.output_dir / entry['output']).exists():
+            return False
+        stat = page_file.stat()
+        if stat.st_size != entry['size']:
+            return False
+        if stat.st_mtime_ns != entry['mtime_ns']:
+            # Touched but possibly not changed.
+            if file_digest(page_file) != entry['sha1']:
+                return False
+            entry['mtime_ns'] = stat.st_mtime_ns
+        return True
+
+    def record(self, page_file, timestamp, page_broken_links):
+        stat = page_file.stat()
+        entry = {
+            'output': self.output_key(page_file),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha1': file_digest(page_file),
+            'ts': timestamp,
+        }
+        # Kept so that the broken link report is complete on runs that
+        # skip this page.
+        if page_broken_links:
+            entry['broken_links'] = page_broken_links
+        self.pages[self.source_key(page_file)] = entry
+        self.converted = self.converted + 1
+
+    def remove_deleted_pages(self, supress_msgs=False):
+        # Removes outputs whose source page no longer exists.
+        for source, entry in self.old_pages.items():
+            if source in self.pages:
+                continue
+            output = self.output_dir / entry['output']
+            if output.exists():
+                if not supress_msgs: print(f'Removing {output}, source page {source} was deleted')
+                output.unlink()
+                if output.parent != self.output_dir and not any(output.parent.iterdir()):
+                    output.parent.rmdir()
+            self.removed = self.removed + 1
+
+    def save(self):
+        pages = {source: entry for source, entry in self.pages.items() if entry is not None}
+        data = {
+            'version': manifest_version,
+            'fingerprint': self.fingerprint,
+            'pages': pages,
+        }
+        temp_path = self.path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as fh:
+            json.dump(data, fh, indent=1, sort_keys=True)
+        os.replace(temp_path, self.path)
@@ -0,0 +1,187 @@
+"""
+Line-by-line conversion of lists, tables, headings and emphasis.
+"""
+
+def usemod_lines_to_markdown(page_text, state):
+    # UseMod had a function to do line-by-line processing of things that build
+    # nested HTML contexts, like lists, tables, etc. Since we're translating to
+    # Markdown, we are not generating nested output syntax. Therefore, we could
+    # do some of these by operating on the whole page at once. However, the
+    # order in which things are transformed matters sometimes, so we have kept
+    # them here for now.
+    return ''.join(iter_markdown_lines(page_text, state))
+
+class LineState:
+    # The converter's settings for one page, and context carried from one
+    # line to the next by iter_markdown_lines. pass_skips is the page log's
+    # counter.
+
+    def __init__(self, dialect, debug, use_headings, pass_skips):
+        self.dialect = dialect
+        self.debug = debug
+        self.use_headings = use_headings
+        self.pass_skips = pass_skips
+        self.heading_numbers = []
+        self.table_mode = False
+        self.numbered_list_mode = False
+        self.list_item_count = 0
+
+def iter_markdown_lines(page_text, state):
+    # Yields the Markdown for each line of the page. Only the handler for the
+    # line's leading character runs; see get_line_handler.
+    for line in page_text.splitlines():
+        if state.debug: print(f'in : {line}')
+        handler = get_line_handler(line)
+        line = handler(line + '\n', state)
+        # Numbered lists and tables continue only on consecutive lines.
+        if handler is not convert_ordered_list_line:
+            state.numbered_list_mode = False
+        if handler is not convert_table_line:
+            state.table_mode = False
+        if state.debug: print(f'out: {line}')
+        yield line
+
+def get_line_handler(line):
+    first = line[:1]
+    if first == '|':
+        return convert_table_line if line.startswith('||') else convert_plain_line
+    handler = line_handlers.get(first)
+    if handler is None:
+        # Headings may be preceded by any whitespace, not just monospace
+        # markers.
+        handler = convert_heading_line if first.isspace() else convert_plain_line
+    return handler
+
+# TODO: Definitions
+
+def convert_plain_line(line, state):
+    return convert_emphasis(line, state)
+
+def convert_monospace_line(line, state):
+    # Monospaced text
+    #
+    # UseMod checks this later, but we have to put it before
+    # the list transformations because Markdown syntax adds
+    # spaces at start of line.
+    #
+    # UseMod is triggered by a single space and preserves the rest.
+    # Markdown requires four spaces (or a tab).
+    return convert_heading_line('    ' + line, state)
+
+def convert_indented_line(line, state):
+    # Indented text
+    #
+    # Markdown doesn't support indented text at all, but we convert that to
+    # blockquotes.
+    depth = len(line) - len(line.lstrip(':'))
+    if state.debug: print(f' !indented_text(depth {depth})')
+    prefix = '>'*depth
+    return convert_emphasis(prefix + line[depth:], state)
+
+def convert_unordered_list_line(line, state):
+    # Unordered lists
+    #
+    # UseMod lists indicate sublists by number of asterisks, and you can
+    # omit the space after them. Markdown wants you to indent sublists and
+    # requires a space afterwards.
+    depth = len(line) - len(line.lstrip('*'))
+    if state.debug: print(f' !unordered_list_item(depth {depth})')
+    prefix = '  '*(depth-1)
+    return convert_emphasis(f'{prefix}*{line[depth:]}', state)
+
+def convert_ordered_list_line(line, state):
+    # Ordered lists
+    #
+    # UseMod lists indicate sublists by number of hashes, and you can omit
+    # the space after them. Markdown wants you to indent sublists and
+    # requires a space afterwards.
+    #
+    # This must be done before headings, otherwise Markdown headings will
+    # look like numbered list.
+    depth = len(line) - len(line.lstrip('#'))
+    if state.debug: print(f' !ordered_list_item(depth {depth})')
+    prefix = '  '*(depth-1)
+    if state.numbered_list_mode:
+        state.list_item_count = state.list_item_count + 1
+    else:
+        state.list_item_count = 1
+    state.numbered_list_mode = True
+    return convert_emphasis(f'{prefix}{state.list_item_count}.{line[depth:]}', state)
+
+def convert_table_line(line, state):
+    line = convert_emphasis(line, state)
+    def transform_table_line(m):
+        fields = m[1][:-2].split('||')
+        if state.debug: print(f'!table_line({len(fields)} fields)')
+        result = f'|{"|".join(fields)}|'
+        if not state.table_mode:
+            header_separator = '|'.join('-'*len(x) for x in fields)
+            # In many processors, Markdown tables *must* have a header line
+            # to be recognized as such. Some processors will accept a header
+            # line with header labels preceding it. As a compromise, if we
+            # detect that every field of this first row has a bolding
+            # marker, we'll assume that they are header labels.
+            if all(map(state.dialect.bold_marker.search, fields)):
+                result = f'{result}\n|{header_separator}|'
+            else:
+                result = f'\n|{header_separator}|\n{result}'
+        return result
+    line, match_count = state.dialect.table_line.subn(transform_table_line, line)
+    state.table_mode = match_count != 0
+    return line
+
+def convert_heading_line(line, state):
+    # Headings
+    #
+    # UseMod is forgiving about the number of delim chars at the end, and it
+    # allows body text after the end delimiter.
+    #
+    # UseMod allows monospaced heading - one or more spaces before the
+    # heading marker. We don't try to translate that, but we'll allow and
+    # ignore the leading spaces.
+    line = convert_emphasis(line, state)
+    if not state.use_headings:
+        return line
+    def wiki_heading_number(number, depth):
+        heading_numbers = state.heading_numbers
+        if number is None: return ''
+        depth = depth -1
+        if depth <= 0: return ''
+        while len(heading_numbers) < depth-1:
+            heading_numbers.append(1)
+        if len(heading_numbers) < depth:
+            heading_numbers.append(0)
+        while len(heading_numbers) > depth:
+            heading_numbers.pop()
+        heading_numbers[-1] = heading_numbers[-1] + 1
+        number = '.'.join([str(n) for n in heading_numbers]) + '.'
+        return f'{number} '
+    def transform_heading(m):
+        depth = min(len(m[1]), 6)
+        number = m[2]
+        text = m[3]
+        rest = "\n" + m[4]
+        number = '' if number is None else wiki_heading_number(number, depth)
+        if state.debug: print(f'!heading({depth}, {number}, "{text}")')
+        return f'{"#"*depth} {number}{text}\n{rest}'
+    return state.dialect.heading.sub(transform_heading, line)
+
+def convert_emphasis(line, state):
+    # Emphasis. Translate to HTML, later to Markup.
+    if "''" in line:
+        line = state.dialect.strong.sub(r"\1<strong>\2</strong>", line)
+        line = state.dialect.em.sub(r"<em>\1</em>", line)
+    else:
+        state.pass_skips['line_emphasis'] += 1
+    return line
+
+# Line handlers by leading character. Lines starting with '||' are tables,
+# see get_line_handler.
+line_handlers = {
+    ' ': convert_monospace_line,
+    '\t': convert_monospace_line,
+    ':': convert_indented_line,
+    '*': convert_unordered_list_line,
+    '#': convert_ordered_list_line,
+    '=': convert_heading_line,
+}
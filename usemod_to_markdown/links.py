@@ -0,0 +1,106 @@
+"""
+The wiki's link graph, enabled by --backlinks, --orphan-report and
+--link-graph.
+
+While a page is converted, the pages it links to are collected in its log.
+The parent process adds them to a LinkGraph, which keeps page IDs once and
+the links between them as pairs of numbers, so it stays small next to the
+wiki's text. Once every page has been converted, the graph gives each
+page's backlinks, the pages nothing links to, and an export of the whole
+graph.
+"""
+
+import array
+import collections
+import json
+
+# The links found on one page, added to its log while it is converted.
+# page is the page's ID in the form links use (see Converter.page_index_key)
+# and path its output path; targets are the IDs it links to, in order and
+# with repeats.
+PageLinks = collections.namedtuple('PageLinks', 'page path targets')
+
+class LinkGraph:
+    # Pages are numbered as they are first seen, as a link source or
+    # target. Only pages that were converted have a path; the others are
+    # links to missing pages. A page's links to itself are left out, and
+    # several links from one page to another count once.
+
+    def __init__(self):
+        self.numbers = {}
+        self.pages = []
+        self.paths = {}
+        self.sources = array.array('L')
+        self.targets = array.array('L')
+
+    def number(self, page):
+        n = self.numbers.get(page)
+        if n is None:
+            n = self.numbers[page] = len(self.pages)
+            self.pages.append(page)
+        return n
+
+    def add(self, page_links):
+        source = self.number(page_links.page)
+        self.paths[source] = page_links.path
+        for target in dict.fromkeys(page_links.targets):
+            if target != page_links.page:
+                self.sources.append(source)
+                self.targets.append(self.number(target))
+
+    def backlinks(self):
+        # Returns {page ID: IDs of the pages linking to it}, for the pages
+        # that were converted and are linked to, in the order the linking
+        # pages were converted.
+        sources = collections.defaultdict(list)
+        for source, target in zip(self.sources, self.targets):
+            if target in self.paths:
+                sources[target].append(source)
+        return {self.pages[target]: [self.pages[source] for source in sources[target]]
+                for target in sorted(sources, key=self.pages.__getitem__)}
+
+    def orphans(self, home_page=None):
+        # The converted pages no other page links to, except the home page,
+        # as (page ID, path) sorted by ID.
+        linked = set(self.targets)
+        return sorted((self.pages[n], path) for n, path in self.paths.items()
+                      if n not in linked and self.pages[n] != home_page)
+
+    def write_backlinks(self, path):
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(self.backlinks(), fh, indent=2)
+
+    def write_orphan_report(self, path, home_page=None):
+        orphans = self.orphans(home_page)
+        report = {
+            'pages': len(self.paths),
+            'orphans': [{'page': page, 'path': page_path} for page, page_path in orphans],
+        }
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+        return orphans
+
+    def write_edges(self, path):
+        # One tab-separated source and target page ID per line.
+        with open(path, 'w', encoding='utf-8') as fh:
+            for source, target in zip(self.sources, self.targets):
+                fh.write(f'{self.pages[source]}\t{self.pages[target]}\n')
+
+    def write_json(self, path):
+        # The pages, with their output paths (null for missing pages), and
+        # the links as [source, target] pairs of positions in the page list.
+        with open(path, 'w', encoding='utf-8') as fh:
+            fh.write('{"pages": [')
+            for n, page in enumerate(self.pages):
+                node = json.dumps({'page': page, 'path': self.paths.get(n)})
+                fh.write(('\n' if n == 0 else ',\n') + node)
+            fh.write('\n],\n"links": [')
+            for n, (source, target) in enumerate(zip(self.sources, self.targets)):
+                fh.write(('\n' if n == 0 else ',\n') + f'[{source},{target}]')
+            fh.write('\n]}\n')
+
+# Graph exports by --link-graph-format.
+link_graph_writers = {
+    'json': LinkGraph.write_json,
+    'edges': LinkGraph.write_edges,
+}
@@ -0,0 +1,340 @@
+"""
+Writing converted pages: front matter, and the sinks that store posts.
+"""
+
+import collections
+import hashlib
+import io
+import json
+import os
+import re
+import sqlite3
+import tarfile
+import time
+import zipfile
+
+import yaml
+
+# A converted page. frontmatter holds title, date and, for subpages,
+# wiki_parent, and with --backlinks-front-matter the list of backlinks;
+# timestamp is the UseMod timestamp string.
+Post = collections.namedtuple('Post', 'path frontmatter markdown timestamp')
+
+def format_post(post, yaml_dumper='builtin'):
+    # Returns the whole output file, so that it can be written at once.
+    return f'---\n{format_front_matter(post.frontmatter, yaml_dumper)}---\n\n{post.markdown}'
+
+# Front matter
+#
+# Front matter only ever holds a few short strings, and PyYAML's
+# pure-Python dumper is slow for that. format_front_matter writes the common
+# cases itself, producing exactly what yaml.dump would, and hands anything
+# it isn't sure about (long or non-ASCII values, values starting with YAML
+# indicators) to PyYAML.
+#
+# yaml_dumper 'builtin' uses format_front_matter_line, 'c' and 'python'
+# always use PyYAML's libyaml-based or pure-Python dumper. The C dumper
+# folds some long quoted values differently, otherwise all three give the
+# same output.
+
+front_matter_resolver = yaml.resolver.Resolver()
+printable_ascii = re.compile('[ -~]+')
+# Values PyYAML might quote for reasons other than looking like another type.
+plain_scalar_unsafe = re.compile(r'''^[-?:,\[\]{}#&*!|>'"%@`.]|:$|: | #|^ | $''')
+
+def format_front_matter(frontmatter, yaml_dumper='builtin'):
+    dumper = yaml.Dumper
+    if yaml_dumper == 'builtin':
+        lines = [format_front_matter_line(key, frontmatter[key]) for key in sorted(frontmatter)]
+        if None not in lines:
+            return ''.join(lines)
+    elif yaml_dumper == 'c' and yaml.__with_libyaml__:
+        dumper = yaml.CDumper
+    return yaml.dump(frontmatter, Dumper=dumper, default_flow_style=False)
+
+def format_front_matter_line(key, value):
+    # Returns None if PyYAML has to decide how to write the value. Lists
+    # (of backlinks) are written in block style, one item per line.
+    if isinstance(value, list):
+        items = [format_scalar_line('- ', item) for item in value]
+        return None if None in items else f'{key}:\n' + ''.join(items)
+    return format_scalar_line(f'{key}: ', value)
+
+def format_scalar_line(prefix, value):
+    if not printable_ascii.fullmatch(value) or plain_scalar_unsafe.search(value):
+        return None
+    if front_matter_resolver.resolve(yaml.ScalarNode, value, (True, False)) == yaml.resolver.BaseResolver.DEFAULT_SCALAR_TAG:
+        line = f'{prefix}{value}\n'
+    else:
+        # It would read back as a number, date, boolean or null.
+        line = f"{prefix}'{value}'\n"
+    # PyYAML folds lines longer than 80 characters.
+    return line if len(line) <= 80 else None
+
+# Output sinks
+#
+# A sink takes converted pages (Posts) and writes them somewhere. write()
+# returns False if it declined to write the page, after warning in the
+# page's log if one is given. What happened to the page is counted in the
+# log's outputs: 'written', 'skipped' if the sink declined, or 'unchanged'
+# if the output already held what would have been written. Sinks that can
+# be written from several processes at once are parallel_safe and are
+# passed to the workers; the others are written by the parent process only.
+# Whoever collects the pages' logs passes each to the sink's add_log(), for
+# anything a sink written to by the workers needs back.
+
+class Sink:
+    parallel_safe = False
+    yaml_dumper = 'builtin'
+
+    def format(self, post):
+        return format_post(post, self.yaml_dumper)
+
+    def record(self, log, outcome):
+        if log is not None:
+            log.outputs[outcome] += 1
+
+    def add_log(self, log):
+        pass
+
+    def close(self):
+        pass
+
+class DiscardSink(Sink):
+    # Writes nothing, for conversions that only collect something from the
+    # pages' logs.
+    parallel_safe = True
+
+    def write(self, post, log=None):
+        return False
+
+class DirectorySink(Sink):
+    # One Markdown file per page, with subpages in a directory named after
+    # their parent. With if_changed, files that already hold what would be
+    # written are left alone, keeping their mtimes for tools that look at
+    # them, like site generators and rsync.
+    #
+    # To tell without reading a file, if_changed keeps the size, mtime and
+    # digest of each file it wrote or found unchanged in digest_cache_name
+    # in the output directory. A file whose size and mtime are as recorded
+    # is taken to still hold the recorded digest, the same trust rsync
+    # puts in them; any other file is compared with file_holds(). Workers
+    # record new entries in the page's log (output_digests), and they are
+    # saved by close().
+    parallel_safe = True
+
+    def __init__(self, path, overwrite=False, if_changed=False):
+        if if_changed and not overwrite:
+            raise ValueError('if_changed needs overwrite, as unchanged files are only found among existing ones')
+        self.path = path
+        # Resolved once here rather than for every post.
+        self.root = path.resolve()
+        self.overwrite = overwrite
+        self.if_changed = if_changed
+        self.made_dirs = set()
+        self.digests = self.load_digests() if if_changed else {}
+
+    def load_digests(self):
+        # {post path: [size, mtime_ns, sha1 hex digest]}, empty if there is
+        # no usable cache.
+        try:
+            with open(self.root / digest_cache_name, encoding='utf-8') as fh:
+                digests = json.load(fh)
+        except (OSError, ValueError):
+            return {}
+        return digests if isinstance(digests, dict) else {}
+
+    def write(self, post, log=None):
+        filename = self.root / post.path
+        if not self.overwrite and filename.exists():
+            if log is not None:
+                log.warn(f'Output file exists, will not overwrite: {filename}')
+            self.record(log, 'skipped')
+            return False
+        if filename.parent not in self.made_dirs:
+            filename.parent.mkdir(parents=True, exist_ok=True)
+            self.made_dirs.add(filename.parent)
+        # Encoded here, with the newlines a text mode file would have, so
+        # that it can be compared with the file's bytes.
+        text = self.format(post)
+        if os.linesep != '\n':
+            text = text.replace('\n', os.linesep)
+        data = text.encode('utf-8')
+        if not self.if_changed:
+            with open(filename, 'wb') as out_fh:
+                out_fh.write(data)
+            self.record(log, 'written')
+            return True
+        digest = hashlib.sha1(data).hexdigest()
+        if self.holds(filename, post.path, data, digest):
+            outcome = 'unchanged'
+        else:
+            with open(filename, 'wb') as out_fh:
+                out_fh.write(data)
+            outcome = 'written'
+        if log is not None:
+            stat = os.stat(filename)
+            entry = [stat.st_size, stat.st_mtime_ns, digest]
+            if self.digests.get(post.path) != entry:
+                log.output_digests[post.path] = entry
+        self.record(log, outcome)
+        return True
+
+    def holds(self, filename, path, data, digest):
+        # Whether the file already holds data, going by the digest cache if
+        # the file's size and mtime are as recorded there.
+        entry = self.digests.get(path)
+        if entry is not None:
+            try:
+                stat = os.stat(filename)
+            except FileNotFoundError:
+                return False
+            if [stat.st_size, stat.st_mtime_ns] == entry[:2]:
+                return entry[2] == digest
+        return file_holds(filename, data)
+
+    def add_log(self, log):
+        self.digests.update(log.output_digests)
+
+    def close(self):
+        if not self.if_changed:
+            return
+        path = self.root / digest_cache_name
+        temp_path = path.with_suffix('.tmp')
+        with open(temp_path, 'w', encoding='utf-8') as fh:
+            json.dump(self.digests, fh, sort_keys=True)
+        os.replace(temp_path, path)
+
+# Where DirectorySink keeps its digests, in the output directory.
+digest_cache_name = '.usemod-digests.json'
+
+# Files are compared in blocks of this size.
+compare_block_size = 64 * 1024
+
+def file_holds(path, data):
+    # Whether the file at path holds exactly data. A file of another size is
+    # ruled out without reading it, otherwise it is read a block at a time
+    # until it differs.
+    try:
+        size = os.stat(path).st_size
+    except FileNotFoundError:
+        return False
+    if size != len(data):
+        return False
+    view = memoryview(data)
+    pos = 0
+    with open(path, 'rb') as fh:
+        while True:
+            block = fh.read(compare_block_size)
+            if not block:
+                return pos == len(data)
+            if view[pos:pos + len(block)] != block:
+                return False
+            pos = pos + len(block)
+
+class StreamSink(Sink):
+    # Every post, one after the other, on a text stream such as stdout.
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, post, log=None):
+        self.stream.write(self.format(post))
+        self.record(log, 'written')
+        return True
+
+    def close(self):
+        self.stream.flush()
+
+class TarSink(Sink):
+    # A tar archive laid out like the output directory. Compressed if the
+    # file name ends in .gz, .tgz, .bz2 or .xz.
+
+    def __init__(self, path):
+        compression = ''
+        for suffix, name in [('.gz', 'gz'), ('.tgz', 'gz'), ('.bz2', 'bz2'), ('.xz', 'xz')]:
+            if path.name.endswith(suffix):
+                compression = name
+        self.archive = tarfile.open(path, f'w:{compression}')
+
+    def write(self, post, log=None):
+        data = self.format(post).encode('utf-8')
+        info = tarfile.TarInfo(post.path)
+        info.size = len(data)
+        info.mtime = float(post.timestamp)
+        info.mode = 0o644
+        self.archive.addfile(info, io.BytesIO(data))
+        self.record(log, 'written')
+        return True
+
+    def close(self):
+        self.archive.close()
+
+class ZipSink(Sink):
+    # A zip archive laid out like the output directory.
+
+    def __init__(self, path):
+        self.archive = zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED)
+
+    def write(self, post, log=None):
+        # Zip dates start in 1980.
+        date_time = max(time.localtime(float(post.timestamp))[:6], (1980, 1, 1, 0, 0, 0))
+        info = zipfile.ZipInfo(post.path, date_time)
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.external_attr = 0o644 << 16
+        self.archive.writestr(info, self.format(post))
+        self.record(log, 'written')
+        return True
+
+    def close(self):
+        self.archive.close()
+
+class SqliteSink(Sink):
+    # A SQLite database with a pages table: one row per page, with the front
+    # matter in columns and the Markdown without front matter.
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute('DROP TABLE IF EXISTS pages')
+        self.db.execute('CREATE TABLE pages (path TEXT PRIMARY KEY, title TEXT, date TEXT, wiki_parent TEXT, markdown TEXT)')
+
+    def write(self, post, log=None):
+        fm = post.frontmatter
+        self.db.execute('INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)',
+                        (post.path, fm['title'], fm['date'], fm.get('wiki_parent'), post.markdown))
+        self.record(log, 'written')
+        return True
+
+    def close(self):
+        self.db.commit()
+        self.db.close()
+
+class JsonLinesSink(Sink):
+    # One JSON object per page and line, with the same fields as the SQLite
+    # table, written to a file or, without a path, to stream.
+
+    def __init__(self, path=None, stream=None):
+        self.path = path
+        self.stream = stream if path is None else open(path, 'w', encoding='utf-8')
+
+    def write(self, post, log=None):
+        fm = post.frontmatter
+        record = {'path': post.path, 'title': fm['title'], 'date': fm['date'],
+                  'wiki_parent': fm.get('wiki_parent'), 'markdown': post.markdown}
+        self.stream.write(json.dumps(record) + '\n')
+        self.record(log, 'written')
+        return True
+
+    def close(self):
+        if self.path is None:
+            self.stream.flush()
+        else:
+            self.stream.close()
+
+# Sinks by --output-format that write to a file.
+file_sinks = {
+    'tar': TarSink,
+    'zip': ZipSink,
+    'sqlite': SqliteSink,
+    'jsonl': JsonLinesSink,
+}
@@ -0,0 +1,226 @@
+"""
+Reading UseMod page files and finding them in a wiki's data directory.
+"""
+
+import collections
+import mmap
+import os
+import pathlib
+
+# Markers used to separate data in UseMod database files.
+FS = "\xb3"
+FS1 = FS + "1"
+FS2 = FS + "2"
+FS3 = FS + "3"
+
+# A page file found by iter_pages, with its page ID and, for subpages, the
+# parent page's ID.
+PageEntry = collections.namedtuple('PageEntry', 'path page_id parent_id')
+
+def iter_pages(input_dir, use_subpages=True):
+    # Yields a PageEntry for every page file in the wiki, including
+    # subpages, as the directories are read. Uses os.scandir, whose entries
+    # already know whether they are files or directories, so nothing is
+    # stat'ed on filesystems that report entry types.
+    page_dir = (pathlib.Path(input_dir) / 'page').resolve()
+    with os.scandir(page_dir) as letter_entries:
+        letter_dirs = [entry.path for entry in letter_entries if entry.is_dir()]
+    for letter_dir in letter_dirs:
+        with os.scandir(letter_dir) as page_entries:
+            page_items = [(entry.name, entry.path, entry.is_file(), entry.is_dir()) for entry in page_entries]
+        for name, path, is_file, is_dir in page_items:
+            if is_file:
+                yield PageEntry(pathlib.Path(path), os.path.splitext(name)[0], None)
+            elif is_dir and use_subpages:
+                with os.scandir(path) as subpage_entries:
+                    subpage_items = [(entry.name, entry.path) for entry in subpage_entries]
+                for subpage_name, subpage_path in subpage_items:
+                    yield PageEntry(pathlib.Path(subpage_path), os.path.splitext(subpage_name)[0], name)
+
+def iter_page_files(input_dir, use_subpages=True):
+    # Yields the path of every page file in the wiki, including subpages.
+    for entry in iter_pages(input_dir, use_subpages):
+        yield entry.path
+
+def count_page_files(input_dir, use_subpages=True):
+    return sum(1 for _ in iter_pages(input_dir, use_subpages))
+
+def page_file_for_id(input_dir, page_id):
+    # The page file for a page ID, or 'Parent/SubPage' for a subpage. Like
+    # UseMod, pages go in a directory named after their first letter, or
+    # 'other'. Returns None for IDs that can't name a page file.
+    parts = page_id.split('/')
+    if len(parts) > 2 or any(part in ('', '.', '..') or '\\' in part for part in parts):
+        return None
+    first = page_id[:1]
+    letter = first.upper() if first.isascii() and first.isalpha() else 'other'
+    return input_dir / 'page' / letter / f'{page_id}.db'
+
+def page_parent_id(file):
+    if file.parent.parent.name != 'page':
+        return file.parent.name
+    return None
+
+def post_path(file):
+    # Where a page's post goes, relative to the output directory or archive.
+    parent_id = page_parent_id(file)
+    if parent_id is None:
+        return f'{file.stem}.md'
+    return f'{parent_id}/{file.stem}.md'
+
+# Page file parsing
+#
+# A page file holds three nested levels of key/value fields: the page
+# record (separated by FS1), its text_default section (FS2) and the
+# section's data (FS3). We only need the section's timestamp and the data's
+# text, so rather than splitting everything into dictionaries we scan the
+# raw bytes for those fields and decode just the text. The files are
+# cp1252, a single-byte encoding, so byte offsets and character offsets
+# agree.
+
+class PageFormatError(ValueError):
+    def __init__(self, file, problem):
+        super().__init__(f'Malformed UseMod page file {file}: {problem}')
+        self.file = file
+        self.problem = problem
+
+PageRecord = collections.namedtuple('PageRecord', 'text timestamp')
+
+FS1_BYTES = FS1.encode('cp1252')
+FS2_BYTES = FS2.encode('cp1252')
+FS3_BYTES = FS3.encode('cp1252')
+
+# Page files at least this big are memory-mapped rather than read.
+page_mmap_threshold = 256 * 1024
+
+def read_page_file(file):
+    with open(file, 'rb') as fh:
+        size = os.fstat(fh.fileno()).st_size
+        if size >= page_mmap_threshold:
+            with mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                return parse_page_record(buf, file)
+        return parse_page_record(fh.read(), file)
+
+def parse_page_record(buf, file=None):
+    # Accepts anything bytes-like with find() and slicing, e.g. bytes or mmap.
+    section = find_record_field(buf, 0, len(buf), FS1_BYTES, b'text_default', file, 'page')
+    ts_start, ts_end = find_record_field(buf, *section, FS2_BYTES, b'ts', file, 'text_default section')
+    data = find_record_field(buf, *section, FS2_BYTES, b'data', file, 'text_default section')
+    text_start, text_end = find_record_field(buf, *data, FS3_BYTES, b'text', file, 'data')
+
+    timestamp = buf[ts_start:ts_end].decode('cp1252', errors='replace')
+    try:
+        float(timestamp)
+    except ValueError:
+        raise PageFormatError(file, f'invalid timestamp {timestamp!r}') from None
+    try:
+        text = buf[text_start:text_end].decode('cp1252')
+    except UnicodeDecodeError as e:
+        raise PageFormatError(file, f'page text is not valid cp1252 ({e.reason})') from None
+    return PageRecord(text, timestamp)
+
+def find_record_field(buf, start, end, fs, key, file, record_name):
+    # Returns the (start, end) offsets of a field's value within the record
+    # that occupies buf[start:end]. If the key repeats, the last one wins.
+    value = None
+    for field_key, value_start, value_end in iter_record_fields(buf, start, end, fs, file, record_name):
+        if field_key == key:
+            value = (value_start, value_end)
+    if value is None:
+        raise PageFormatError(file, f'{record_name} record has no {key.decode()} field')
+    return value
+
+def iter_record_fields(buf, start, end, fs, file, record_name):
+    # Yields (key, value start, value end) for each field of the record that
+    # occupies buf[start:end]. Only the keys are copied out of the buffer.
+    pos = start
+    while True:
+        key_end = buf.find(fs, pos, end)
+        if key_end == -1:
+            raise PageFormatError(file, f'{record_name} record has a key without a value')
+        value_start = key_end + len(fs)
+        value_end = buf.find(fs, value_start, end)
+        if value_end == -1:
+            yield buf[pos:key_end], value_start, end
+            return
+        yield buf[pos:key_end], value_start, value_end
+        pos = value_end + len(fs)
+
+# Page history
+#
+# UseMod keeps the older revisions of a page in a keep file,
+# keep/<letter>/<page>.kp (subpages in a directory named after their
+# parent, as under page/). A keep file is a run of sections, each starting
+# with FS1, laid out like the page file's text_default section. The
+# current revision is only in the page file.
+
+PageRevision = collections.namedtuple('PageRevision', 'revision timestamp author summary text')
+
+def keep_file_for(page_file):
+    # The keep file for a page file. It may not exist.
+    page_file = pathlib.Path(page_file)
+    page_dir = page_file.parents[1 if page_parent_id(page_file) is None else 2]
+    return page_dir.parent / 'keep' / page_file.relative_to(page_dir).with_suffix('.kp')
+
+def read_page_revisions(page_file):
+    # Returns every revision of a page, kept ones first and the current one
+    # last, ordered by revision number. A kept revision that is also the
+    # current one is left out.
+    with open(page_file, 'rb') as fh:
+        buf = fh.read()
+    section = find_record_field(buf, 0, len(buf), FS1_BYTES, b'text_default', page_file, 'page')
+    current = parse_revision_section(buf, *section, page_file)
+    revisions = {}
+    keep_file = keep_file_for(page_file)
+    if keep_file.exists():
+        for revision in read_keep_file(keep_file):
+            revisions[revision.revision] = revision
+    revisions[current.revision] = current
+    return [revisions[n] for n in sorted(revisions)]
+
+def read_keep_file(file):
+    # Yields the text_default revisions in a keep file, in file order.
+    with open(file, 'rb') as fh:
+        buf = fh.read()
+    start = buf.find(FS1_BYTES)
+    while start != -1:
+        start = start + len(FS1_BYTES)
+        end = buf.find(FS1_BYTES, start)
+        section_end = len(buf) if end == -1 else end
+        name = find_record_field(buf, start, section_end, FS2_BYTES, b'name', file, 'kept section')
+        if buf[name[0]:name[1]] == b'text_default':
+            yield parse_revision_section(buf, start, section_end, file)
+        start = end
+
+def parse_revision_section(buf, start, end, file):
+    # Parses a text_default section, in a page file or a keep file. The
+    # author is the user name, or the host or IP address for anonymous
+    # edits, and may be empty.
+    fields = {key: (value_start, value_end) for key, value_start, value_end
+              in iter_record_fields(buf, start, end, FS2_BYTES, file, 'text_default section')}
+    def field(fields, key):
+        value_start, value_end = fields.get(key, (0, 0))
+        return buf[value_start:value_end].decode('cp1252', errors='replace')
+    if b'data' not in fields:
+        raise PageFormatError(file, 'text_default section record has no data field')
+    data = {key: (value_start, value_end) for key, value_start, value_end
+            in iter_record_fields(buf, *fields[b'data'], FS3_BYTES, file, 'data')}
+    if b'text' not in data:
+        raise PageFormatError(file, 'data record has no text field')
+
+    timestamp = field(fields, b'ts')
+    try:
+        float(timestamp)
+    except ValueError:
+        raise PageFormatError(file, f'invalid timestamp {timestamp!r}') from None
+    revision = field(fields, b'revision')
+    try:
+        revision = int(revision)
+    except ValueError:
+        raise PageFormatError(file, f'invalid revision {revision!r}') from None
+    try:
+        text = buf[data[b'text'][0]:data[b'text'][1]].decode('cp1252')
+    except UnicodeDecodeError as e:
+        raise PageFormatError(file, f'page text is not valid cp1252 ({e.reason})') from None
+    author = field(fields, b'username') or field(fields, b'host') or field(fields, b'ip')
+    return PageRevision(revision, timestamp, author, field(data, b'summary'), text)
@@ -0,0 +1,77 @@
+"""
+Per-pass profiling, enabled by --profile.
+"""
+
+import heapq
+import json
+
+class Profiler:
+    # Sums time, match count and text size change for each transformation
+    # pass over a run, and keeps the slowest pages.
+
+    def __init__(self, top_n):
+        self.top_n = top_n
+        self.passes = {}    # name -> [calls, seconds, matches, size change]
+        self.slowest = []   # heap of (seconds, page, source size)
+        self.page_count = 0
+        self.page_seconds = 0.0
+
+    def record_pass(self, name, seconds, matches, size_change, calls=1):
+        # Steps that aren't a single substitution have no match count.
+        stats = self.passes.get(name)
+        if stats is None:
+            stats = self.passes[name] = [0, 0.0, None, 0]
+        stats[0] += calls
+        stats[1] += seconds
+        if matches is not None:
+            stats[2] = (stats[2] or 0) + matches
+        stats[3] += size_change
+
+    def record_page(self, page, seconds, size):
+        self.page_count += 1
+        self.page_seconds += seconds
+        self.add_slow_page((seconds, str(page), size))
+
+    def add_slow_page(self, item):
+        if len(self.slowest) < self.top_n:
+            heapq.heappush(self.slowest, item)
+        elif self.slowest and item > self.slowest[0]:
+            heapq.heapreplace(self.slowest, item)
+
+    def data(self):
+        return {
+            'passes': self.passes,
+            'slowest': self.slowest,
+            'page_count': self.page_count,
+            'page_seconds': self.page_seconds,
+        }
+
+    def merge(self, data):
+        for name, (calls, seconds, matches, size_change) in data['passes'].items():
+            self.record_pass(name, seconds, matches, size_change, calls)
+        for item in data['slowest']:
+            self.add_slow_page(tuple(item))
+        self.page_count += data['page_count']
+        self.page_seconds += data['page_seconds']
+
+    def report(self, skips):
+        # `skips` counts passes skipped by trigger, which were not timed.
+        passes = sorted(self.passes.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            'pages': self.page_count,
+            'seconds': self.page_seconds,
+            'passes': [
+                {'name': name, 'calls': calls, 'seconds': seconds, 'matches': matches, 'size_change': size_change,
+                 'skipped': skips.get(name, 0)}
+                for name, (calls, seconds, matches, size_change) in passes
+            ],
+            'skipped_only': {name: count for name, count in skips.items() if name not in self.passes},
+            'slowest_pages': [
+                {'page': page, 'seconds': seconds, 'size': size}
+                for seconds, page, size in sorted(self.slowest, reverse=True)
+            ],
+        }
+
+    def write(self, path, skips):
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(self.report(skips), fh, indent=2)
@@ -0,0 +1,92 @@
+"""
+Progress reporting while converting a wiki.
+"""
+
+import sys
+import time
+
+class Progress:
+    # Reports pages converted. With style 'line', a summary of pages done,
+    # pages per second and, if the total is known, the time remaining is
+    # shown at most every `interval` seconds: rewritten in place on a
+    # terminal, or as a new line otherwise (e.g. in CI logs). With style
+    # 'files', a line is printed for every page instead.
+    #
+    # Other messages printed during a run must go through print(), so that
+    # they don't end up on the same line as the summary.
+
+    def __init__(self, style='line', stream=None, interval=None):
+        self.style = style
+        self.stream = sys.stdout if stream is None else stream
+        self.tty = self.stream.isatty()
+        if interval is None:
+            interval = 0.5 if self.tty else 10.0
+        self.interval = interval
+        self.on_line = False  # A summary is shown without a newline.
+        self.begin()
+
+    def begin(self, total=None):
+        self.total = total
+        self.done = 0
+        self.start = time.perf_counter()
+        self.last_shown = self.start
+
+    def start_page(self, page_file):
+        if self.style == 'files':
+            self.print(f'Converting file {page_file}')
+
+    def page_done(self):
+        self.done = self.done + 1
+        if self.style == 'line':
+            now = time.perf_counter()
+            if now - self.last_shown >= self.interval:
+                self.show(self.summary(now))
+                self.last_shown = now
+
+    def finish(self):
+        if self.style == 'line' and self.done:
+            elapsed = time.perf_counter() - self.start
+            self.show(f'{self.done} pages converted in {format_duration(elapsed)}, {self.rate(elapsed):.1f} pages/s')
+            if self.on_line:
+                self.stream.write('\n')
+                self.on_line = False
+
+    def summary(self, now):
+        elapsed = now - self.start
+        rate = self.rate(elapsed)
+        if self.total is None:
+            line = f'{self.done} pages'
+        else:
+            line = f'{self.done}/{self.total} pages'
+        line = f'{line}, {rate:.1f} pages/s'
+        if self.total is not None and rate > 0:
+            line = f'{line}, ETA {format_duration(max(self.total - self.done, 0) / rate)}'
+        return line
+
+    def rate(self, elapsed):
+        return self.done / elapsed if elapsed > 0 else 0.0
+
+    def show(self, line):
+        if self.tty:
+            # Overwrite the previous summary, clearing the rest of the line.
+            self.stream.write(f'\r{line}\x1b[K')
+            self.on_line = True
+        else:
+            self.stream.write(f'{line}\n')
+        self.stream.flush()
+
+    def print(self, msg):
+        if self.on_line:
+            self.stream.write('\r\x1b[K')
+            self.on_line = False
+        print(msg, file=self.stream)
+
+def format_duration(seconds):
+    seconds = int(seconds + 0.5)
+    if seconds < 60:
+        return f'{seconds}s'
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f'{minutes}m{seconds:02d}s'
+    hours, minutes = divmod(minutes, 60)
+    return f'{hours}h{minutes:02d}m'
@@ -0,0 +1,193 @@
+"""
+Linear-time scanners standing in for the block and HTML tag patterns.
+"""
+
+import abc
+import re
+
+# The patterns for <html>, <nowiki> and <pre> blocks, and for HTML tags,
+# are lazy matches up to a closing tag. Tried at every position, they read
+# to the end of the page (or of the line, for tags) from every opening tag
+# that is never closed, so a large page with unclosed tags takes quadratic
+# time or worse. A scanner finds the same matches, in the same order, from
+# the positions of the opening and closing tags, keeping track of the next
+# occurrence of each so that the text is read about once. Only then is the
+# pattern matched, over exactly the span found, to get its groups. A
+# scanner has the sub() and subn() of a compiled pattern, so the Dialect
+# can use one in place of its pattern.
+
+class Scanner(abc.ABC):
+
+    def __init__(self, pattern):
+        self.pattern = pattern
+
+    def sub(self, repl, text):
+        return self.subn(repl, text)[0]
+
+    def subn(self, repl, text):
+        pieces = []
+        pos = 0
+        for start, end in self.spans(text):
+            m = self.pattern.match(text, start, end)
+            pieces.append(text[pos:start])
+            pieces.append(repl(m) if callable(repl) else m.expand(repl))
+            pos = end
+        if not pieces:
+            return text, 0
+        pieces.append(text[pos:])
+        return ''.join(pieces), len(pieces) // 2
+
+    @abc.abstractmethod
+    def spans(self, text):
+        # Yields the (start, end) of each match, as finditer would find them.
+        pass
+
+class NextMatch:
+    # The next match of a pattern at or after a position, for positions
+    # that never decrease. The last match is reused until it is passed, and
+    # once nothing is found nothing will be. `accept`, if given, can reject
+    # a match, and the search goes on after it.
+
+    def __init__(self, pattern, text, accept=None):
+        self.pattern = pattern
+        self.text = text
+        self.accept = accept
+        self.found = None
+        self.exhausted = False
+
+    def at_or_after(self, pos):
+        # Returns the match, or None.
+        if self.exhausted:
+            return None
+        if self.found is not None and self.found.start() >= pos:
+            return self.found
+        m = self.pattern.search(self.text, pos)
+        while m is not None and self.accept is not None and not self.accept(m):
+            m = self.pattern.search(self.text, m.start() + 1)
+        self.found = m
+        self.exhausted = m is None
+        return m
+
+    def start(self, pos, default=-1):
+        m = self.at_or_after(pos)
+        return default if m is None else m.start()
+
+newline = re.compile('\n')
+whitespace = re.compile(r'\s')
+
+class BlockScanner(Scanner):
+    # For patterns like <html>(.*?)</html> with re.S: an opening tag
+    # followed by the nearest closing tag. `delimiters` maps each opening
+    # tag to its closing tag. An opening tag without a closing tag after it
+    # means no later one of the same kind has one either.
+
+    def __init__(self, pattern, delimiters):
+        super().__init__(pattern)
+        self.delimiters = delimiters
+
+    def spans(self, text):
+        next_open = {}
+        for open_tag in self.delimiters:
+            start = text.find(open_tag)
+            if start != -1:
+                next_open[open_tag] = start
+        pos = 0
+        while next_open:
+            for open_tag, start in list(next_open.items()):
+                if start < pos:
+                    start = text.find(open_tag, pos)
+                    if start == -1:
+                        del next_open[open_tag]
+                        continue
+                    next_open[open_tag] = start
+            if not next_open:
+                return
+            open_tag = min(next_open, key=next_open.get)
+            start = next_open[open_tag]
+            close_tag = self.delimiters[open_tag]
+            close = text.find(close_tag, start + len(open_tag))
+            if close == -1:
+                del next_open[open_tag]
+                continue
+            pos = close + len(close_tag)
+            yield start, pos
+
+class TagScanner(Scanner):
+    # For the HTML tag patterns, with re.I: an opening tag with optional
+    # attributes, and for pairs the tag's content and closing tag, all on
+    # one line. `open_pattern` finds the start of the opening tag up to the
+    # tag name, with a lookahead for what has to follow it. With
+    # `attributes` 'optional' or 'required', the attributes are \s.*? or
+    # \s.+?, followed by the first &gt; on the line. For a pair, `close`
+    # is the closing tag's pattern, or None if the closing tag repeats the
+    # opening one's name. Otherwise a single tag is matched, which may end
+    # with /&gt;.
+    #
+    # Only the first &gt; after the attributes is ever tried: a later one
+    # can only give a match if the first one does.
+
+    def __init__(self, pattern, open_pattern, attributes='optional', close=None, pair=True):
+        super().__init__(pattern)
+        self.open_pattern = open_pattern
+        self.attributes = attributes
+        self.close = None if close is None else re.compile(close, re.I)
+        self.pair = pair
+        self.gt = re.compile('&gt;', re.I)
+        self.slash_gt = re.compile('/?&gt;', re.I)
+
+    def spans(self, text):
+        next_newline = NextMatch(newline, text)
+        next_gt = NextMatch(self.gt, text)
+        next_close = {}
+        pos = 0
+        while True:
+            m = self.open_pattern.search(text, pos)
+            if m is None:
+                return
+            start = m.start()
+            tag_end = m.end()
+            if whitespace.match(text, tag_end):
+                attr_start = tag_end + 1
+                line_end = next_newline.start(attr_start, len(text))
+                if self.attributes == 'required':
+                    attr_start = attr_start + 1
+                gt = next_gt.start(attr_start)
+                if gt == -1 or gt >= line_end:
+                    pos = start + 1
+                    continue
+            elif self.pair:
+                gt = tag_end
+                line_end = next_newline.start(gt, len(text))
+            else:
+                # /&gt; or &gt;, as the open pattern's lookahead made sure.
+                gt = self.slash_gt.match(text, tag_end).end() - 4
+            if not self.pair:
+                pos = gt + 4
+                yield start, pos
+                continue
+            if self.close is not None:
+                closes = next_close.get(None)
+                if closes is None:
+                    closes = next_close[None] = NextMatch(self.close, text)
+            else:
+                tag = m[1]
+                closes = next_close.get(tag)
+                if closes is None:
+                    closes = next_close[tag] = closing_tags(tag, text)
+            close = closes.at_or_after(gt + 4)
+            if close is None or close.start() >= line_end:
+                pos = start + 1
+                continue
+            pos = close.end()
+            yield start, pos
+
+# A tag name and a closing tag's name, separated by a newline, match this if
+# a backreference to the first one with re.I would match the second.
+same_tag_name = re.compile('(.+)\n\\1', re.I)
+
+def closing_tags(tag, text):
+    # Finds the closing tags for an opening tag name. Matching the name with
+    # re.I finds every candidate, and then the backreference test keeps
+    # only the ones the pattern would accept.
+    pattern = re.compile(f'&lt;/({re.escape(tag)})&gt;', re.I)
+    return NextMatch(pattern, text, lambda m: same_tag_name.fullmatch(f'{tag}\n{m[1]}') is not None)
@@ -0,0 +1,175 @@
+"""
+Building a full-text search index while converting, enabled by
+--search-index.
+
+Each page's text is taken from its converted Markdown, without link
+targets and HTML tags, as the page is converted (in the worker processes,
+with --jobs). The index is built from these entries as they arrive and
+written when the run ends: as JSON files, one per term prefix, for a
+static site's search script, or as a SQLite FTS5 table.
+"""
+
+import collections
+import heapq
+import html
+import itertools
+import json
+import re
+import sqlite3
+import tempfile
+
+# A page's entry in the search index, made by search_entry. `terms` (a dict
+# of term counts) is only made for indexes that tokenize pages themselves,
+# and `text` only for those that don't.
+SearchEntry = collections.namedtuple('SearchEntry', 'path title date text terms')
+
+# Markdown link and image targets, HTML tags and autolinks, which aren't
+# part of the text a reader sees.
+not_text = re.compile(r'\]\([^)\s]*\)|<[^<>\n]*>')
+word = re.compile(r'[^\W_]+')
+# Longer words are nearly always encoded data or URL fragments.
+max_term_length = 40
+
+def plain_text(markdown):
+    return html.unescape(not_text.sub(' ', markdown))
+
+def page_terms(text):
+    # Terms are lowercased runs of letters and digits.
+    terms = collections.Counter(word.findall(text.lower()))
+    return {term: count for term, count in terms.items() if len(term) <= max_term_length}
+
+def search_entry(post, kind):
+    # The entry for a converted Post. kind is the entry_kind of the index
+    # it is for: 'terms' or 'text'.
+    title = post.frontmatter['title']
+    text = f'{title}\n{plain_text(post.markdown)}'
+    if kind == 'terms':
+        return SearchEntry(post.path, title, post.frontmatter['date'], None, page_terms(text))
+    return SearchEntry(post.path, title, post.frontmatter['date'], text, None)
+
+class JsonSearchIndex:
+    # An inverted index in a directory of JSON files:
+    #
+    # - index.json: the format version, the term prefix length, and the
+    #   number of documents and terms;
+    # - documents.json: a list of the pages, each with its path, title and
+    #   date, a page's document number being its position;
+    # - terms/PREFIX.json: for the terms starting with PREFIX (their first
+    #   prefix_length characters), an object mapping each term to a list of
+    #   [document, count] pairs in document order.
+    #
+    # A search script loads the index, the documents and the shards for the
+    # prefixes of its query terms. Postings are kept in memory up to
+    # max_postings, then written to a temporary file sorted by term; at the
+    # end, those runs are merged, and each shard is written as its terms
+    # come out of the merge. Documents are written as they are added.
+
+    entry_kind = 'terms'
+    version = 1
+
+    def __init__(self, path, prefix_length=2, max_postings=500000):
+        self.path = path
+        self.prefix_length = prefix_length
+        self.max_postings = max_postings
+        (path / 'terms').mkdir(parents=True, exist_ok=True)
+        # Shards left by an earlier index would otherwise be read as this
+        # one's.
+        for shard in (path / 'terms').glob('*.json'):
+            shard.unlink()
+        self.documents = open(path / 'documents.json', 'w', encoding='utf-8')
+        self.documents.write('[')
+        self.document_count = 0
+        self.postings = collections.defaultdict(list)
+        self.buffered = 0
+        self.runs = []
+
+    def add(self, entry):
+        doc = self.document_count
+        document = {'path': entry.path, 'title': entry.title, 'date': entry.date}
+        self.documents.write(('\n' if doc == 0 else ',\n') + json.dumps(document))
+        self.document_count = doc + 1
+        for term, count in entry.terms.items():
+            self.postings[term].append((doc, count))
+        self.buffered = self.buffered + len(entry.terms)
+        if self.buffered >= self.max_postings:
+            self.spill()
+
+    def spill(self):
+        # Writes the postings in memory to a run, one JSON line per term.
+        run = tempfile.TemporaryFile('w+', encoding='utf-8')
+        for term in sorted(self.postings):
+            run.write(json.dumps([term, self.postings[term]], separators=(',', ':')) + '\n')
+        run.seek(0)
+        self.runs.append(run)
+        self.postings = collections.defaultdict(list)
+        self.buffered = 0
+
+    def merged_terms(self):
+        # Yields (term, postings) in term order. Runs hold increasing
+        # document numbers and merge() takes equal terms from the runs in
+        # order, so each term's postings stay in document order.
+        if not self.runs:
+            for term in sorted(self.postings):
+                yield term, self.postings[term]
+            return
+        if self.postings:
+            self.spill()
+        lines = heapq.merge(*(map(json.loads, run) for run in self.runs), key=lambda line: line[0])
+        for term, group in itertools.groupby(lines, key=lambda line: line[0]):
+            yield term, [posting for _, postings in group for posting in postings]
+
+    def close(self):
+        self.documents.write('\n]\n')
+        self.documents.close()
+        term_count = 0
+        shards = 0
+        for prefix, terms in itertools.groupby(self.merged_terms(), key=lambda item: item[0][:self.prefix_length]):
+            with open(self.path / 'terms' / f'{prefix}.json', 'w', encoding='utf-8') as fh:
+                fh.write('{')
+                for n, (term, postings) in enumerate(terms):
+                    fh.write(('\n' if n == 0 else ',\n') + f'{json.dumps(term)}:{json.dumps(postings, separators=(",", ":"))}')
+                    term_count = term_count + 1
+                fh.write('\n}\n')
+            shards = shards + 1
+        for run in self.runs:
+            run.close()
+        index = {'version': self.version, 'prefix_length': self.prefix_length,
+                 'documents': self.document_count, 'terms': term_count, 'shards': shards}
+        with open(self.path / 'index.json', 'w', encoding='utf-8') as fh:
+            json.dump(index, fh, indent=2)
+
+class SqliteSearchIndex:
+    # A SQLite FTS5 table named search, with the path, title, date and text
+    # of each page. SQLite tokenizes the text and builds the index itself, so
+    # only the text is needed. Query it with, for example:
+    #
+    #   SELECT path, title FROM search WHERE search MATCH 'budget' ORDER BY rank
+
+    entry_kind = 'text'
+    commit_every = 500
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.execute('DROP TABLE IF EXISTS search')
+        self.db.execute('CREATE VIRTUAL TABLE search USING fts5(path UNINDEXED, title, date UNINDEXED, text)')
+        self.pending = 0
+
+    def add(self, entry):
+        self.db.execute('INSERT INTO search VALUES (?, ?, ?, ?)', (entry.path, entry.title, entry.date, entry.text))
+        self.pending = self.pending + 1
+        if self.pending >= self.commit_every:
+            # Keeps SQLite's uncommitted changes from growing with the wiki.
+            self.db.commit()
+            self.pending = 0
+
+    def close(self):
+        # Merges the index's segments, so that queries read fewer of them.
+        self.db.execute("INSERT INTO search(search) VALUES ('optimize')")
+        self.db.commit()
+        self.db.close()
+
+# Indexes by --search-index-format.
+search_indexes = {
+    'json': JsonSearchIndex,
+    'sqlite': SqliteSearchIndex,
+}
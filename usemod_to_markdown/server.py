@@ -0,0 +1,191 @@
+"""
+A local HTTP server that converts pages on request, enabled by --serve.
+
+The config, intermap and patterns are loaded once, and rendered pages are
+kept in an LRU cache, so previews don't pay for a new process each time.
+
+    GET  /pages/PageName           the page's Markdown file, with front matter
+    GET  /pages/PageName/SubPage   a subpage
+    POST /convert?page_id=PageName&parent_id=Parent
+                                   converts the UseMod text in the request
+                                   body (UTF-8) and returns the Markdown,
+                                   without front matter; not cached
+    GET  /stats                    cache hit and miss statistics as JSON
+"""
+
+import collections
+import http.server
+import json
+import threading
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from .output import format_post
+from .pages import PageFormatError, page_file_for_id
+
+class PageCache:
+    # Rendered pages by page file, least recently used first. An entry is
+    # only used while the file's identity, size and mtime are what they were
+    # when it was rendered; otherwise the page is converted again and the
+    # entry replaced.
+    #
+    # Each conversion gets a log of its own that is not added to the
+    # converter's totals, which would otherwise grow for as long as the
+    # server runs; only the number of warnings is kept.
+
+    def __init__(self, converter, size, yaml_dumper='builtin'):
+        self.converter = converter
+        self.size = size
+        self.yaml_dumper = yaml_dumper
+        self.warnings = 0
+        self.entries = collections.OrderedDict()  # file -> (signature, text)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.texts_converted = 0
+
+    def get(self, file):
+        # Raises FileNotFoundError if there is no such page file.
+        stat = file.stat()
+        signature = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        with self.lock:
+            entry = self.entries.get(file)
+            if entry is not None and entry[0] == signature:
+                self.entries.move_to_end(file)
+                self.hits = self.hits + 1
+                return entry[1]
+            self.misses = self.misses + 1
+        # Convert outside the lock, so that other requests aren't held up.
+        # Two requests for the same new page may both convert it.
+        log = self.converter.new_log()
+        text = format_post(self.converter.convert_page_file(file, log), self.yaml_dumper)
+        self.converted(log)
+        with self.lock:
+            self.entries[file] = (signature, text)
+            self.entries.move_to_end(file)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+                self.evictions = self.evictions + 1
+        return text
+
+    def convert_text(self, text, page_id, parent_id):
+        # Raw page text has no file to key it by, so it isn't cached, only
+        # counted.
+        log = self.converter.new_log()
+        markdown_text = self.converter.convert_text(text, page_id, parent_id, log)
+        self.converted(log)
+        with self.lock:
+            self.texts_converted = self.texts_converted + 1
+        return markdown_text
+
+    def converted(self, log):
+        with self.lock:
+            self.warnings = self.warnings + log.warnings
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': self.size,
+                'entries': len(self.entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else None,
+                'texts_converted': self.texts_converted,
+                'warnings': self.warnings,
+            }
+
+class ConversionServer(http.server.ThreadingHTTPServer):
+    # Requests are handled in threads, which share the converter.
+    daemon_threads = True
+
+    def __init__(self, address, converter, input_dir, cache):
+        super().__init__(address, ConversionRequestHandler)
+        self.converter = converter
+        self.input_dir = input_dir
+        self.cache = cache
+
+class ConversionRequestHandler(http.server.BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == '/stats':
+            self.send_text(200, json.dumps(self.server.cache.stats(), indent=2), 'application/json')
+        elif path.startswith('/pages/'):
+            self.send_page(unquote(path[len('/pages/'):]))
+        else:
+            self.send_text(404, 'Not found')
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path != '/convert':
+            self.send_text(404, 'Not found')
+            return
+        query = parse_qs(url.query)
+        page_id = query.get('page_id', [None])[0]
+        if not page_id:
+            self.send_text(400, 'page_id is required')
+            return
+        parent_id = query.get('parent_id', [None])[0]
+        length = int(self.headers.get('Content-Length', 0))
+        try:
+            text = self.rfile.read(length).decode('utf-8')
+        except UnicodeDecodeError:
+            self.send_text(400, 'Page text must be UTF-8')
+            return
+        try:
+            markdown_text = self.server.cache.convert_text(text, page_id, parent_id)
+        except Exception as e:
+            self.send_error_text(e)
+            return
+        self.send_text(200, markdown_text, 'text/markdown')
+
+    def send_page(self, page_id):
+        file = page_file_for_id(self.server.input_dir, page_id)
+        if file is None:
+            self.send_text(400, f'Invalid page ID: {page_id}')
+            return
+        try:
+            text = self.server.cache.get(file)
+        except FileNotFoundError:
+            self.send_text(404, f'No such page: {page_id}')
+            return
+        except PageFormatError as e:
+            self.send_text(500, str(e))
+            return
+        except Exception as e:
+            self.send_error_text(e)
+            return
+        self.send_text(200, text, 'text/markdown')
+
+    def send_error_text(self, e):
+        # A page the converter fails on shouldn't cost the client its
+        # connection.
+        self.log_error('Conversion failed: %s: %s', type(e).__name__, e)
+        self.send_text(500, f'Conversion failed: {type(e).__name__}: {e}')
+
+    def send_text(self, status, text, content_type='text/plain'):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', f'{content_type}; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if not self.server.converter.supress_msgs:
+            super().log_message(format, *args)
+
+def serve(converter, input_dir, host='127.0.0.1', port=8080, cache_size=256, yaml_dumper='builtin'):
+    # Serves until interrupted, then prints the cache statistics.
+    cache = PageCache(converter, cache_size, yaml_dumper)
+    with ConversionServer((host, port), converter, input_dir, cache) as server:
+        if not converter.supress_msgs: print(f'Serving {input_dir} on http://{host}:{server.server_port}/')
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    if not converter.supress_msgs:
+        stats = cache.stats()
+        print(f'Page cache: {stats["hits"]} hits, {stats["misses"]} misses, {stats["evictions"]} evictions')
@@ -0,0 +1,134 @@
+"""
+Supervised conversion, enabled by --page-timeout or --quarantine-report.
+
+Each page is read and converted within a time limit, and a page that raises
+an error or runs out of time is quarantined instead of ending the run: it
+is left unwritten, recorded with the stage it failed in, and the rest of
+the wiki carries on. The quarantine report lists every such page, and the
+exit status says whether there were any.
+"""
+
+import collections
+import contextlib
+import json
+import signal
+import time
+import traceback
+
+from .pages import read_page_file
+
+# A page that failed. `stage` is 'read', 'convert' or 'write', and `kind`
+# 'error' or 'timeout'.
+PageFailure = collections.namedtuple('PageFailure', 'page_file stage kind error traceback seconds')
+
+# Exit statuses of a run with quarantined pages, added together if pages
+# both raised errors and timed out.
+exit_status_errors = 4
+exit_status_timeouts = 8
+
+# Raised by the timer when a page runs out of time. It isn't an Exception,
+# so that the conversion code can't catch it by accident.
+class PageTimeout(BaseException):
+    pass
+
+def raise_page_timeout(signum, frame):
+    raise PageTimeout()
+
+def timeouts_supported():
+    return hasattr(signal, 'setitimer')
+
+@contextlib.contextmanager
+def time_limit(seconds):
+    # Raises PageTimeout in the block if it takes longer than seconds, or
+    # never if seconds is None. The timer is a signal, so this only works
+    # in a process's main thread. Regex matching checks for signals, but a
+    # few long C calls don't and finish before the timer is noticed.
+    if seconds is None:
+        yield
+        return
+    previous = signal.signal(signal.SIGALRM, raise_page_timeout)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+class Supervisor:
+    # Converts and writes pages in supervised mode, with a time limit in
+    # seconds (None for none) for reading and converting each one. Worker
+    # processes get a copy to convert their pages with; the parent's
+    # collects the failures.
+
+    def __init__(self, time_limit=None):
+        self.time_limit = time_limit
+        self.failures = []
+
+    def convert_page(self, converter, page_file, log):
+        # Returns (post, None), or (None, PageFailure) if the page failed.
+        stage = 'read'
+        start = time.perf_counter()
+        try:
+            with time_limit(self.time_limit):
+                record = read_page_file(page_file)
+                stage = 'convert'
+                return converter.convert_page_record(page_file, record, log), None
+        except (Exception, PageTimeout) as e:
+            return None, page_failure(page_file, stage, e, time.perf_counter() - start, self.time_limit)
+
+    def write_page(self, sink, post, log, page_file):
+        # Returns (whether the post was written, None), or (False,
+        # PageFailure) if writing it failed. Writes aren't timed, so that
+        # none is left half done.
+        start = time.perf_counter()
+        try:
+            return sink.write(post, log), None
+        except Exception as e:
+            return False, page_failure(page_file, 'write', e, time.perf_counter() - start)
+
+    def record(self, failure, wiki=0):
+        # Adds a failure from either method to the report, with the index of
+        # its wiki in batch mode.
+        self.failures.append((wiki, failure))
+
+    def counts(self):
+        return collections.Counter(failure.kind for _, failure in self.failures)
+
+    def exit_status(self):
+        counts = self.counts()
+        return ((exit_status_errors if counts['error'] else 0) +
+                (exit_status_timeouts if counts['timeout'] else 0))
+
+    def write_report(self, path, wiki_names=None):
+        # Writes the JSON quarantine report. In batch mode, wiki_names gives
+        # the name of each wiki.
+        counts = self.counts()
+        pages = []
+        for wiki, failure in self.failures:
+            page = {'file': str(failure.page_file), 'stage': failure.stage, 'kind': failure.kind,
+                    'error': failure.error, 'seconds': round(failure.seconds, 3),
+                    'traceback': failure.traceback}
+            if wiki_names is not None:
+                page = {'wiki': wiki_names[wiki], **page}
+            pages.append(page)
+        report = {
+            'time_limit': self.time_limit,
+            'errors': counts['error'],
+            'timeouts': counts['timeout'],
+            'pages': pages,
+        }
+        with open(path, 'w', encoding='utf-8') as fh:
+            json.dump(report, fh, indent=2)
+
+def page_failure(page_file, stage, e, seconds, limit=None):
+    if isinstance(e, PageTimeout):
+        kind = 'timeout'
+        error = f'Took longer than {limit:g}s'
+    else:
+        kind = 'error'
+        error = f'{type(e).__name__}: {e}'
+    return PageFailure(page_file, stage, kind, error, ''.join(traceback.format_exception(type(e), e, e.__traceback__)),
+                       seconds)
+
+def format_failure(failure):
+    return f'QUARANTINED: {failure.page_file} ({failure.stage}): {failure.error}'
@@ -0,0 +1,272 @@
+"""
+Watch mode, enabled by --watch: reconverts pages as the wiki is edited.
+
+After a full conversion, the page directories are watched for changes, with
+inotify on Linux and by polling file mtimes elsewhere. Changes are collected
+until none have arrived for a short delay, so a burst of edits is handled
+at once, and then only the affected pages are reconverted, or their outputs
+removed if they were deleted. A change to the intermap or UseMod config
+affects links on every page, so it causes a full rebuild, as does adding or
+removing a page while link checking is on.
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import time
+
+from .pages import PageFormatError, iter_page_files, post_path
+
+# Stands for "anything may have changed" in a set of changed paths, when
+# inotify's event queue overflowed.
+everything = None
+
+class InotifyWatcher:
+    # Reports changes to the files in a set of directories, using Linux's
+    # inotify through libc. Raises OSError if inotify isn't available.
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM  = 0x00000040
+    IN_MOVED_TO    = 0x00000080
+    IN_CREATE      = 0x00000100
+    IN_DELETE      = 0x00000200
+    IN_Q_OVERFLOW  = 0x00004000
+    IN_IGNORED     = 0x00008000
+    watch_mask = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+    event_header = struct.Struct('iIII')  # wd, mask, cookie, name length
+
+    def __init__(self):
+        name = ctypes.util.find_library('c')
+        libc = ctypes.CDLL(name, use_errno=True) if name else None
+        if libc is None or not hasattr(libc, 'inotify_init1'):
+            raise OSError('inotify is not available')
+        self.libc = libc
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.directories = {}  # watch descriptor -> directory
+
+    def add(self, directory):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.watch_mask)
+        if wd >= 0:
+            self.directories[wd] = directory
+
+    def wait(self, timeout):
+        # Returns the paths that changed within timeout seconds, or, with no
+        # timeout, as soon as something changes.
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return set()
+        changed = set()
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        pos = 0
+        while pos < len(data):
+            wd, mask, _, name_length = self.event_header.unpack_from(data, pos)
+            pos += self.event_header.size
+            name = data[pos:pos + name_length].rstrip(b'\0')
+            pos += name_length
+            if mask & self.IN_Q_OVERFLOW:
+                changed.add(everything)
+            elif mask & self.IN_IGNORED:
+                self.directories.pop(wd, None)
+            elif wd in self.directories and name:
+                changed.add(self.directories[wd] / os.fsdecode(name))
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+class PollingWatcher:
+    # Reports changes to the files in a set of directories by comparing
+    # their size and mtime every `interval` seconds. Nothing is read, only
+    # the directories listed and the entries stat'ed.
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.directories = {}  # directory -> {name: (is dir, size, mtime_ns)}
+
+    def add(self, directory):
+        if directory not in self.directories:
+            self.directories[directory] = self.scan(directory) or {}
+
+    def scan(self, directory):
+        # Returns None if the directory is gone.
+        entries = {}
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries[entry.name] = (entry.is_dir(), stat.st_size, stat.st_mtime_ns)
+        except FileNotFoundError:
+            return None
+        return entries
+
+    def wait(self, timeout):
+        # Like InotifyWatcher.wait, but only notices changes every interval.
+        while True:
+            time.sleep(self.interval if timeout is None else min(timeout, self.interval))
+            changed = set()
+            for directory, old_entries in list(self.directories.items()):
+                entries = self.scan(directory)
+                if entries is None:
+                    del self.directories[directory]
+                    entries = {}
+                else:
+                    self.directories[directory] = entries
+                for name in old_entries.keys() | entries.keys():
+                    if old_entries.get(name) != entries.get(name):
+                        changed.add(directory / name)
+            if changed or timeout is not None:
+                return changed
+
+    def close(self):
+        pass
+
+def make_watcher(interval):
+    try:
+        return InotifyWatcher()
+    except OSError:
+        return PollingWatcher(interval)
+
+class WikiWatcher:
+    # Keeps a DirectorySink's output in step with a wiki's data directory.
+    # load_converter() builds a converter from the current config and
+    # intermap; convert_wiki(converter) does a full conversion with it.
+
+    def __init__(self, input_dir, sink, load_converter, convert_wiki, config_file,
+                 check_links=False, delay=1.0):
+        self.input_dir = input_dir
+        self.page_dir = (input_dir / 'page').resolve()
+        self.sink = sink
+        self.load_converter = load_converter
+        self.convert_wiki = convert_wiki
+        self.rebuild_files = {(input_dir / 'intermap').resolve(), config_file.resolve()}
+        self.check_links = check_links
+        self.delay = delay
+        self.watcher = make_watcher(delay)
+        self.converter = None
+        self.pages = set()
+        self.watched_dirs = set()
+
+    def run(self):
+        # Converts the wiki, then watches it until interrupted. Watching
+        # starts first, so that edits made during the conversion are seen.
+        for directory in {path.parent for path in self.rebuild_files}:
+            self.watcher.add(directory)
+        self.rebuild()
+        kind = 'inotify' if isinstance(self.watcher, InotifyWatcher) else 'polling'
+        if not self.converter.supress_msgs: print(f'Watching {self.input_dir} for changes ({kind}), press Ctrl-C to stop.')
+        pending = set()
+        try:
+            while True:
+                # Block until something changes, then wait for the burst of
+                # changes to end.
+                changed = self.watcher.wait(self.delay if pending else None)
+                if changed:
+                    pending |= changed
+                elif pending:
+                    self.update(pending)
+                    pending = set()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.watcher.close()
+
+    def rebuild(self):
+        self.converter = self.load_converter()
+        old_pages = self.pages
+        self.pages = self.watch_page_tree()
+        self.remove_outputs(old_pages - self.pages)
+        self.convert_wiki(self.converter)
+
+    def watch_page_tree(self):
+        # Watches the page directory, its letter directories and, with
+        # subpages, the parent page directories. Returns all page files.
+        use_subpages = self.converter.UseSubpage
+        self.watch_directory(self.page_dir)
+        for letter_dir in self.page_dir.iterdir():
+            if letter_dir.is_dir():
+                self.watch_directory(letter_dir)
+                if use_subpages:
+                    for page_item in letter_dir.iterdir():
+                        if page_item.is_dir():
+                            self.watch_directory(page_item)
+        return {file for file in iter_page_files(self.input_dir, use_subpages) if file.suffix == '.db'}
+
+    def update(self, changed):
+        if everything in changed or changed & self.rebuild_files:
+            if not self.converter.supress_msgs: print('Intermap or config changed, converting all pages.')
+            self.rebuild()
+            return
+        # Broken links are only reported at the end of a run, which a watch
+        # never reaches, so they aren't kept from one update to the next.
+        self.converter.broken_links.clear()
+        page_files = set()
+        for path in changed:
+            depth = len(path.relative_to(self.page_dir).parts) if self.page_dir in path.parents else 0
+            if depth == 0:
+                continue
+            if path.is_dir():
+                # A new letter or subpage directory: watch it and take in
+                # anything written to it before the watch started.
+                if path not in self.watched_dirs and (depth == 1 or (depth == 2 and self.converter.UseSubpage)):
+                    page_files |= self.watch_new_directory(path, depth)
+            elif path.suffix == '.db' and (depth == 2 or (depth == 3 and self.converter.UseSubpage)):
+                page_files.add(path)
+        changed_pages = {file for file in page_files if file.is_file()}
+        deleted_pages = {file for file in page_files if not file.exists() and file in self.pages}
+        if self.check_links and (changed_pages - self.pages or deleted_pages):
+            # The page index changed, which can change links on any page.
+            if not self.converter.supress_msgs: print('Pages were added or removed, converting all pages.')
+            self.rebuild()
+            return
+        self.pages = (self.pages | changed_pages) - deleted_pages
+        self.remove_outputs(deleted_pages)
+        for page_file in sorted(changed_pages):
+            self.convert_page(page_file)
+        if not self.converter.supress_msgs and (changed_pages or deleted_pages):
+            print(f'Watch: {len(changed_pages)} pages converted, {len(deleted_pages)} removed')
+
+    def convert_page(self, page_file):
+        log = self.converter.new_log()
+        try:
+            post = self.converter.convert_page_file(page_file, log)
+        except PageFormatError as e:
+            # Possibly caught halfway through being written, in which case
+            # the rest of the write brings it back here.
+            log.warn(str(e))
+        else:
+            self.sink.write(post, log)
+        self.converter.add_log(log)
+        self.sink.add_log(log)
+
+    def watch_directory(self, directory):
+        self.watcher.add(directory)
+        self.watched_dirs.add(directory)
+
+    def watch_new_directory(self, directory, depth):
+        self.watch_directory(directory)
+        page_files = set()
+        for item in directory.iterdir():
+            if item.is_file() and item.suffix == '.db':
+                page_files.add(item)
+            elif item.is_dir() and depth == 1 and self.converter.UseSubpage:
+                page_files |= self.watch_new_directory(item, 2)
+        return page_files
+
+    def remove_outputs(self, page_files):
+        for page_file in sorted(page_files):
+            output = self.sink.path / post_path(page_file)
+            if output.exists():
+                if not self.converter.supress_msgs: print(f'Removing {output}, source page was deleted')
+                output.unlink()
+                if output.parent != self.sink.path and not any(output.parent.iterdir()):
+                    output.parent.rmdir()